@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Record the Indications and Usage sentences of the DailyMed labels behind the 2021-06-27 CSV outputs.
+
+Usage
+-----
+$ python build_corpus.py                                   # writes data/indications_2021-06-27.txt
+$ python build_corpus.py --cache /path/to/cache --output corpus.txt
+$ python build_corpus.py --spl /path/to/dm_spl_release_human_rx_part1.zip /path/to/dm_spl_release_human_rx_part2.zip
+
+The therapies of the CSV are looked up on the NCI targeted therapies fact sheet, and the 'INDICATIONS AND USAGE' section of each of their DailyMed labels is split into sentences (with nltk, as in the notebook). Every unique sentence is written once, so the benchmarks run with no network access. Give --cache to keep the downloaded pages on disk (see http_cache).
+Without access to cancer.gov and DailyMed, give --spl with DailyMed's downloadable SPL archives instead: the labels whose drug label (e.g. 'TECENTRIQ- atezolizumab injection, solution') is in the CSV are read from the archives (see dailymed_spl.SPLArchive).
+"""
+
+import os
+import csv
+import argparse
+from urllib.parse import urljoin
+from biomarker_nlp import biomarker_extraction
+from biomarker_nlp import http_cache
+from biomarker_nlp import dailymed_spl
+from vectors_report import CSV_PATH
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'indications_2021-06-27.txt') # The frozen corpus
+FACT_SHEET_URL = 'https://www.cancer.gov/about-cancer/treatment/types/targeted-therapies/targeted-therapies-fact-sheet'
+
+def read_corpus(path = CORPUS_PATH):
+  """Return the sentences of a corpus file: one per line, without the empty lines and the lines starting with '#'."""
+
+  with open(path, 'r', encoding = 'utf-8') as fh:
+    return [line.strip() for line in fh if line.strip() and not line.startswith('#')]
+
+
+def label_urls(dailyMedURL):
+  """Return the drug information pages of a DailyMed link, which is either one of them or a search page."""
+
+  if 'dailymed/search' in dailyMedURL:
+    return [urljoin('https://dailymed.nlm.nih.gov', url) for url in biomarker_extraction.drug_info_url(dailyMedURL)]
+  return [dailyMedURL]
+
+
+def fact_sheet_labels(therapies):
+  """Yield the DailyMed pages of the therapies that are on the NCI targeted therapies fact sheet."""
+
+  for link in biomarker_extraction.targeted_therapy_url(url = FACT_SHEET_URL):
+    record = biomarker_extraction.nci_drug_record(url = urljoin('https://www.cancer.gov', link))
+    if record['name'].lower() not in therapies or len(record['dailyMed']) == 0:
+      continue
+    print(record['name'])
+    for url in label_urls(record['dailyMed'][0]):
+      yield url
+
+
+def archive_labels(paths, drugLabels):
+  """Yield the SPLLabel of the SPL archives whose drug label is one of drugLabels (lower case)."""
+
+  for label in dailymed_spl.SPLArchive(paths).labels():
+    if label.brand_label().lower() in drugLabels:
+      print(label.brand_label())
+      yield label
+
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.split('\n')[0])
+  parser.add_argument('--csv', default = CSV_PATH, help = 'the CSV outputs whose therapies are recorded (default: the bundled 2021-06-27 outputs)')
+  parser.add_argument('--output', default = CORPUS_PATH, help = 'the corpus file (default: %(default)s)')
+  parser.add_argument('--cache', help = 'a directory where the downloaded pages are kept')
+  parser.add_argument('--spl', nargs = '+', help = 'DailyMed SPL archives to read the labels from, instead of the web pages')
+  args = parser.parse_args()
+
+  from nltk import tokenize
+  if args.cache:
+    http_cache.set_default_cache(http_cache.HTTPCache(cacheDir = args.cache))
+
+  with open(args.csv, 'r', encoding = 'utf-8', errors = 'replace') as fh:
+    rows = list(csv.DictReader(fh))
+  therapies = set(row['therapy_label'].lower() for row in rows)
+  drugLabels = set(row['drug_label'].lower() for row in rows if row['drug_label'])
+
+  if args.spl:
+    labels = archive_labels(args.spl, drugLabels)
+  else:
+    labels = fact_sheet_labels(therapies)
+  sentences = {}
+  for label in labels:
+    content = biomarker_extraction.section_content(label, section = 'INDICATIONS AND USAGE')
+    if content:
+      for st in tokenize.sent_tokenize(content):
+        st = ' '.join(st.split())
+        if len(st) > 0:
+          sentences[st] = None
+
+  with open(args.output, 'w', encoding = 'utf-8') as fh:
+    fh.write('# Indications and Usage sentences of the DailyMed labels behind "2021-06-27 FDA-approved targeted therapy labels.csv", one per line.\n')
+    if args.spl:
+      fh.write('# Recorded with build_corpus.py from the SPL archives %s.\n' % ', '.join(os.path.basename(path) for path in args.spl))
+    else:
+      fh.write('# Recorded with build_corpus.py from %d therapies.\n' % len(therapies))
+    for st in sentences:
+      fh.write(st + '\n')
+  print('%d sentences written to %s' % (len(sentences), args.output))
+
+
+if __name__ == '__main__':
+  main()
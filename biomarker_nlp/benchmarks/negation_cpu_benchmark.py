@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure the throughput of NegBERT cue detection and scope resolution on the CPU.
+
+Usage
+-----
+$ python negation_cpu_benchmark.py --cue-model /path/to/modelCue --scope-model /path/to/modelScope
+$ python negation_cpu_benchmark.py --cue-model modelCue --scope-model modelScope --threads 1 2 4 8 --batch-sizes 8 32 --json cpu.json
+
+The models are loaded onto the CPU (a GPU is never used) and run over the sentences of the frozen Indications corpus. For every number of torch threads and batch size, the number of sentences per second of cue detection (all the sentences) and of scope resolution (the sentences with a cue) is reported, to size CPU-only hardware.
+"""
+
+import sys
+import json
+import time
+import argparse
+from build_corpus import CORPUS_PATH, read_corpus
+
+def run(sentences, modelCue, modelScope, batchSize):
+  """Return the seconds of cue detection over the sentences and of scope resolution over the negated ones, and the number of negated sentences."""
+
+  start = time.perf_counter()
+  dl = CustomData(sentences).get_cue_dataloader(batch_size = batchSize)
+  cueIndex = [cues for batch in modelCue.predict(dl) for cues in batch]
+  cueSeconds = time.perf_counter() - start
+
+  negated = [j for j, cues in enumerate(cueIndex) if 1 in cues]
+  scopeSeconds = 0.0
+  if len(negated) > 0:
+    start = time.perf_counter()
+    dl = CustomData([sentences[j] for j in negated], cues = [cueIndex[j] for j in negated]).get_scope_dataloader(batch_size = batchSize)
+    modelScope.predict(dl)
+    scopeSeconds = time.perf_counter() - start
+  return cueSeconds, scopeSeconds, len(negated)
+
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.split('\n')[0])
+  parser.add_argument('--cue-model', required = True, help = 'the NegBERT cue model')
+  parser.add_argument('--scope-model', required = True, help = 'the NegBERT scope model')
+  parser.add_argument('--corpus', default = CORPUS_PATH, help = 'the corpus file, one sentence per line (default: %(default)s)')
+  parser.add_argument('--repeat', type = int, default = 3, help = 'the number of times the corpus is run (default: 3)')
+  parser.add_argument('--threads', type = int, nargs = '+', default = [1, 2, 4], help = 'the torch intra-op thread counts (default: 1 2 4)')
+  parser.add_argument('--batch-sizes', type = int, nargs = '+', default = [8, 32], help = 'the batch sizes (default: 8 32)')
+  parser.add_argument('--json', help = 'write the results to this JSON file')
+  args = parser.parse_args()
+
+  from biomarker_nlp import negation_negbert
+  # the NegBERT models are unpickled with the classes of negation_negbert in the __main__ namespace, as in the notebook
+  globals().update({name: value for name, value in vars(negation_negbert).items() if not name.startswith('_')})
+  set_threads(inter_op = 1)
+  modelCue = load_model(args.cue_model, device = 'cpu')
+  modelScope = load_model(args.scope_model, device = 'cpu')
+
+  sentences = read_corpus(args.corpus) * args.repeat
+  # warm up
+  run(sentences[:8], modelCue, modelScope, 8)
+
+  results = []
+  print('%d sentences on the CPU' % len(sentences))
+  for threads in args.threads:
+    set_threads(intra_op = threads)
+    for batchSize in args.batch_sizes:
+      cueSeconds, scopeSeconds, negated = run(sentences, modelCue, modelScope, batchSize)
+      result = {'threads': threads,
+                'batch_size': batchSize,
+                'sentences': len(sentences),
+                'negated_sentences': negated,
+                'cue_sentences_per_second': round(len(sentences) / cueSeconds, 2),
+                'scope_sentences_per_second': round(negated / scopeSeconds, 2) if scopeSeconds > 0 else None,
+                'sentences_per_second': round(len(sentences) / (cueSeconds + scopeSeconds), 2)}
+      results.append(result)
+      print('threads: %2d   batch size: %3d   cue: %8.1f sentences/s   scope: %8s sentences/s   overall: %8.1f sentences/s' % (threads, batchSize, result['cue_sentences_per_second'], result['scope_sentences_per_second'], result['sentences_per_second']))
+
+  if args.json:
+    with open(args.json, 'w', encoding = 'utf-8') as fh:
+      json.dump({'python': sys.version.split()[0], 'results': results}, fh, indent = 2)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare gene_protein_chemical with the full scispacy pipelines and in NER-only mode.
+
+Usage
+-----
+$ python ner_only_benchmark.py                       # the example sentences below
+$ python ner_only_benchmark.py --sentences sents.txt --repeat 3
+
+The sentences file has one sentence per line. Each mode is run on the same sentences after the models are warmed, and the number of sentences per second is reported with the speedup. The entities found in both modes are compared, since the entity recognizers of the scispacy models do not read the output of their tagger and parser.
+"""
+
+import argparse
+import time
+from biomarker_nlp import biomarker_extraction
+from biomarker_nlp import model_registry
+
+SENTENCES = ["Patients with EGFR or ALK genomic tumor aberrations should have disease progression on FDA-approved therapy for NSCLC harboring these aberrations prior to receiving TECENTRIQ.",
+             "TECENTRIQ, in combination with cobimetinib and vemurafenib, is indicated for the treatment of patients with BRAF V600 mutation-positive unresectable or metastatic melanoma.",
+             "BAVENCIO in combination with axitinib is indicated for the first-line treatment of patients with advanced renal cell carcinoma (RCC).",
+             "Avastin, in combination with paclitaxel and cisplatin or paclitaxel and topotecan, is indicated for the treatment of patients with persistent, recurrent, or metastatic cervical cancer.",
+             "This indication is approved under accelerated approval based on tumor response rate and durability of response."]
+
+def run(sentences, nerOnly):
+  """Return the seconds taken by gene_protein_chemical over the sentences, and its results."""
+
+  model_registry.registry.ner_only = nerOnly
+  start = time.perf_counter()
+  results = [biomarker_extraction.gene_protein_chemical(text = st, gene= 1, protein = 1, chemical = 1) for st in sentences]
+  return time.perf_counter() - start, results
+
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.split('\n')[0])
+  parser.add_argument('--sentences', help = 'a text file with one sentence per line (default: built-in examples)')
+  parser.add_argument('--repeat', type = int, default = 20, help = 'the number of times the sentences are run (default: 20)')
+  args = parser.parse_args()
+
+  sentences = SENTENCES
+  if args.sentences:
+    with open(args.sentences, 'r', encoding = 'utf-8') as fh:
+      sentences = [line.strip() for line in fh if line.strip()]
+  sentences = sentences * args.repeat
+
+  model_registry.registry.warm()
+  fullTime, fullResults = run(sentences, nerOnly = False)
+  nerTime, nerResults = run(sentences, nerOnly = True)
+
+  print('sentences:            %d' % len(sentences))
+  print('full pipelines:       %.1f sentences/s' % (len(sentences) / fullTime))
+  print('NER-only:             %.1f sentences/s' % (len(sentences) / nerTime))
+  print('speedup:              %.2fx' % (fullTime / nerTime))
+  print('identical entities:   %s' % (fullResults == nerResults))
+
+
+if __name__ == '__main__':
+  main()
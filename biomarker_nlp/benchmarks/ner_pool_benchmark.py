@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure how gene_protein_chemical scales with the number of worker processes of NERPool.
+
+Usage
+-----
+$ python ner_pool_benchmark.py                                   # 1, 2, 4, ... up to the number of CPUs
+$ python ner_pool_benchmark.py --sentences sents.txt --workers 1 8 16 32 --chunksize 64
+
+The sentences file has one sentence per line. The models are loaded once in this process and shared with the workers. For every worker count, the number of sentences per second and the speedup over the first worker count are reported, and the results are checked against a single-process run.
+"""
+
+import os
+import argparse
+import time
+from biomarker_nlp import biomarker_extraction
+from biomarker_nlp import model_registry
+from biomarker_nlp import ner_pool
+from ner_only_benchmark import SENTENCES
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.split('\n')[0])
+  parser.add_argument('--sentences', help = 'a text file with one sentence per line (default: built-in examples)')
+  parser.add_argument('--repeat', type = int, default = 200, help = 'the number of times the sentences are run (default: 200)')
+  parser.add_argument('--workers', type = int, nargs = '+', help = 'the worker counts to run (default: powers of 2 up to the number of CPUs)')
+  parser.add_argument('--chunksize', type = int, default = ner_pool.CHUNK_SIZE, help = 'the sentences sent to a worker at a time (default: %d)' % ner_pool.CHUNK_SIZE)
+  args = parser.parse_args()
+
+  sentences = SENTENCES
+  if args.sentences:
+    with open(args.sentences, 'r', encoding = 'utf-8') as fh:
+      sentences = [line.strip() for line in fh if line.strip()]
+  sentences = sentences * args.repeat
+  workerCounts = args.workers or [2 ** i for i in range(os.cpu_count().bit_length()) if 2 ** i <= os.cpu_count()]
+
+  model_registry.registry.warm()
+  expected = list(biomarker_extraction.gene_protein_chemical_batch(sentences))
+
+  print('sentences: %d, chunk size: %d' % (len(sentences), args.chunksize))
+  baseline = None
+  for workers in workerCounts:
+    with ner_pool.NERPool(workers = workers, chunksize = args.chunksize) as pool:
+      start = time.perf_counter()
+      results = list(pool.map(sentences))
+      seconds = time.perf_counter() - start
+    baseline = baseline or seconds
+    print('workers: %3d   %8.1f sentences/s   speedup: %5.2fx   identical: %s' % (workers, len(sentences) / seconds, baseline / seconds, results == expected))
+
+
+if __name__ == '__main__':
+  main()
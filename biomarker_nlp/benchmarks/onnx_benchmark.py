@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the outputs, latency and throughput of the NegBERT cue and scope models on the CPU with PyTorch and with ONNX Runtime.
+
+Usage
+-----
+$ python onnx_benchmark.py --cue-model /path/to/modelCue --scope-model /path/to/modelScope
+$ python onnx_benchmark.py --cue-model modelCue --scope-model modelScope --output-dir models/ --batch-sizes 1 8 32 --threads 4 --json onnx.json
+
+The models are loaded onto the CPU and exported to ONNX graphs with negation_negbert.export_onnx (to --output-dir, e.g. to serve them, or to a temporary directory), which checks the graphs against the models. Over the sentences of the frozen Indications corpus, the largest difference of the cue and scope logits of the two backends and the number of sentences whose negation scopes differ are reported. Then, for each backend and batch size, negation_scope_batch is called on the corpus one batch at a time, and the sentences per second and the p50 and p95 latency of a call are reported.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from build_corpus import CORPUS_PATH, read_corpus
+
+def percentile(values, p):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def max_difference(dl, model, onnxModel):
+  """Return the largest absolute difference of the logits of a model and of its ONNX Runtime copy over a dataloader."""
+
+  difference = 0.0
+  with torch.no_grad():
+    for b_input_ids, b_input_mask, b_mymasks in dl:
+      expected = model.model(b_input_ids, token_type_ids = None, attention_mask = b_input_mask)[0].numpy()
+      actual = onnxModel.model(b_input_ids, token_type_ids = None, attention_mask = b_input_mask)[0].numpy()
+      difference = max(difference, float(np.abs(actual - expected).max()))
+  return difference
+
+
+def parity(sentences, modelCue, modelScope, onnxCue, onnxScope):
+  """Return the largest differences of the cue and scope logits over the sentences, and the number of sentences whose negation scopes differ."""
+
+  from biomarker_nlp import negation_cue_scope
+  cueDifference = max_difference(CustomData(sentences).get_cue_dataloader(batch_size = 32), modelCue, onnxCue)
+  cueIndex = [cues for batch in modelCue.predict(CustomData(sentences).get_cue_dataloader(batch_size = 32)) for cues in batch]
+  negated = [j for j, cues in enumerate(cueIndex) if 1 in cues]
+  scopeDifference = 0.0
+  if len(negated) > 0:
+    dl = CustomData([sentences[j] for j in negated], cues = [cueIndex[j] for j in negated]).get_scope_dataloader(batch_size = 32)
+    scopeDifference = max_difference(dl, modelScope, onnxScope)
+  expected = negation_cue_scope.negation_scope_batch(sentences, modelCue, modelScope)
+  actual = negation_cue_scope.negation_scope_batch(sentences, onnxCue, onnxScope)
+  return cueDifference, scopeDifference, sum(1 for e, a in zip(expected, actual) if e != a)
+
+
+def measure(sentences, modelCue, modelScope, batchSize, repeat):
+  """Call negation_scope_batch on the sentences one batch at a time and return the measures."""
+
+  from biomarker_nlp import negation_cue_scope
+  batches = [sentences[i:i + batchSize] for i in range(0, len(sentences), batchSize)]
+  # warm up
+  negation_cue_scope.negation_scope_batch(batches[0], modelCue, modelScope, batch_size = batchSize)
+  latencies = []
+  start = time.perf_counter()
+  for r in range(repeat):
+    for batch in batches:
+      callStart = time.perf_counter()
+      negation_cue_scope.negation_scope_batch(batch, modelCue, modelScope, batch_size = batchSize)
+      latencies.append(time.perf_counter() - callStart)
+  seconds = time.perf_counter() - start
+  return {'batch_size': batchSize,
+          'sentences': len(sentences) * repeat,
+          'sentences_per_second': round(len(sentences) * repeat / seconds, 2),
+          'p50_ms': round(1000 * percentile(latencies, 50), 3),
+          'p95_ms': round(1000 * percentile(latencies, 95), 3)}
+
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.split('\n')[0])
+  parser.add_argument('--cue-model', required = True, help = 'the NegBERT cue model')
+  parser.add_argument('--scope-model', required = True, help = 'the NegBERT scope model')
+  parser.add_argument('--output-dir', help = 'write the ONNX graphs to this directory, as modelCue.onnx and modelScope.onnx')
+  parser.add_argument('--corpus', default = CORPUS_PATH, help = 'the corpus file, one sentence per line (default: %(default)s)')
+  parser.add_argument('--repeat', type = int, default = 3, help = 'the number of times the corpus is run (default: 3)')
+  parser.add_argument('--batch-sizes', type = int, nargs = '+', default = [1, 8, 32], help = 'the batch sizes (default: 1 8 32)')
+  parser.add_argument('--threads', type = int, help = 'the number of intra-op threads of torch and ONNX Runtime (default: that of torch)')
+  parser.add_argument('--json', help = 'write the results to this JSON file')
+  args = parser.parse_args()
+
+  from biomarker_nlp import negation_negbert
+  # the NegBERT models are unpickled with the classes of negation_negbert in the __main__ namespace, as in the notebook
+  globals().update({name: value for name, value in vars(negation_negbert).items() if not name.startswith('_')})
+  # the ONNX Runtime sessions take the number of threads of torch when they are created
+  set_threads(intra_op = args.threads, inter_op = 1)
+  modelCue = load_model(args.cue_model, device = 'cpu')
+  modelScope = load_model(args.scope_model, device = 'cpu')
+
+  tmpDir = None
+  outputDir = args.output_dir
+  if outputDir is None:
+    tmpDir = tempfile.TemporaryDirectory()
+    outputDir = tmpDir.name
+  os.makedirs(outputDir, exist_ok = True)
+  for model, name in [(modelCue, 'modelCue.onnx'), (modelScope, 'modelScope.onnx')]:
+    start = time.perf_counter()
+    export_onnx(model, os.path.join(outputDir, name))
+    print('exported %s in %.1f s (%.1f MB)' % (name, time.perf_counter() - start, os.path.getsize(model.onnx_path) / 2 ** 20))
+  backends = {'torch': (modelCue, modelScope), 'onnx': (onnx_model(modelCue), onnx_model(modelScope))}
+
+  sentences = read_corpus(args.corpus)
+  cueDifference, scopeDifference, differentScopes = parity(sentences, modelCue, modelScope, *backends['onnx'])
+  print('%d sentences   largest logit difference, cue: %.2e   scope: %.2e   sentences with other scopes: %d' % (len(sentences), cueDifference, scopeDifference, differentScopes))
+
+  results = []
+  for backend, (cue, scope) in backends.items():
+    for batchSize in args.batch_sizes:
+      result = measure(sentences, cue, scope, batchSize, args.repeat)
+      result['backend'] = backend
+      results.append(result)
+      print('%-6s batch size: %3d   %8.1f sentences/s   p50: %9.2f ms   p95: %9.2f ms' % (backend, batchSize, result['sentences_per_second'], result['p50_ms'], result['p95_ms']))
+
+  if args.json:
+    with open(args.json, 'w', encoding = 'utf-8') as fh:
+      json.dump({'python': sys.version.split()[0],
+                 'threads': torch.get_num_threads(),
+                 'corpus': os.path.basename(args.corpus),
+                 'parity': {'cue_max_logit_difference': cueDifference, 'scope_max_logit_difference': scopeDifference, 'sentences_with_other_scopes': differentScopes},
+                 'results': results}, fh, indent = 2)
+  if tmpDir is not None:
+    tmpDir.cleanup()
+
+
+if __name__ == '__main__':
+  main()
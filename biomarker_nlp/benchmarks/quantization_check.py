@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the F1, latency and memory of the fp32 and int8 (dynamic quantization) NegBERT cue and scope models.
+
+Usage
+-----
+$ python quantization_check.py --cue-model /path/to/modelCue --scope-model /path/to/modelScope --bioscope /path/to/abstracts.xml /path/to/full_papers.xml
+$ python quantization_check.py --cue-model modelCue --scope-model modelScope --bioscope abstracts.xml --output-dir models/ --json quantization.json
+
+The models are quantized with negation_negbert.quantize_model and saved (to --output-dir, e.g. to serve them, or to a temporary directory). The fp32 and the int8 models are then each measured in their own process, on the CPU, so that the peak resident memory is their own:
+- F1: CueModel.evaluate and ScopeModel.evaluate on the test split of each bioscope file (the split is the same for both, see --seed).
+- Latency: the sentences per second of negation_scope_batch over the frozen Indications corpus.
+- Size: the size of the saved models and the peak RSS of the process.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import resource
+import subprocess
+from build_corpus import CORPUS_PATH, read_corpus
+
+def load_negbert():
+  from biomarker_nlp import negation_negbert
+  # the NegBERT models are unpickled with the classes of negation_negbert in the __main__ namespace, as in the notebook
+  globals().update({name: value for name, value in vars(negation_negbert).items() if not name.startswith('_')})
+
+
+def test_dataloaders(bioscope, seed):
+  """Return the cue and scope test dataloaders of the bioscope files, as lists of (name, dataloader)."""
+
+  cueDls, scopeDls = [], []
+  for path in bioscope:
+    name = os.path.splitext(os.path.basename(path))[0]
+    # the splits of Data are drawn with numpy
+    np.random.seed(seed)
+    random.seed(seed)
+    torch.manual_seed(seed)
+    data = Data(path, dataset_name = 'bioscope')
+    cueDls += [(name, dl) for dl in data.get_cue_dataloader()[2]]
+    scopeDls += [(name, dl) for dl in data.get_scope_dataloader()[2]]
+  return cueDls, scopeDls
+
+
+def measure(cueModel, scopeModel, bioscope, sentences, seed, batchSize):
+  """Measure a cue and scope model pair in this process and return its measures."""
+
+  from biomarker_nlp import negation_cue_scope
+  load_negbert()
+  set_threads(inter_op = 1)
+  modelCue = load_model(cueModel, device = 'cpu')
+  modelScope = load_model(scopeModel, device = 'cpu')
+
+  result = {'quantized': getattr(modelCue, 'quantized', False),
+            'cue_model_mb': round(os.path.getsize(cueModel) / 2 ** 20, 1),
+            'scope_model_mb': round(os.path.getsize(scopeModel) / 2 ** 20, 1)}
+
+  cueDls, scopeDls = test_dataloaders(bioscope, seed)
+  result['cue_f1'] = {name: round(float(modelCue.evaluate(dl, name)['F1']), 4) for name, dl in cueDls}
+  result['scope_f1'] = {name: round(float(modelScope.evaluate(dl, name)['F1']), 4) for name, dl in scopeDls}
+
+  # warm up
+  negation_cue_scope.negation_scope_batch(sentences[:8], modelCue, modelScope, batch_size = batchSize)
+  start = time.perf_counter()
+  negation_cue_scope.negation_scope_batch(sentences, modelCue, modelScope, batch_size = batchSize)
+  seconds = time.perf_counter() - start
+  result['sentences_per_second'] = round(len(sentences) / seconds, 2)
+  # ru_maxrss is in KB on Linux
+  result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+  return result
+
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.split('\n')[0])
+  parser.add_argument('--cue-model', required = True, help = 'the fp32 NegBERT cue model')
+  parser.add_argument('--scope-model', required = True, help = 'the fp32 NegBERT scope model')
+  parser.add_argument('--bioscope', nargs = '+', required = True, help = 'the bioscope files the models are evaluated on')
+  parser.add_argument('--output-dir', help = 'save the quantized models to this directory, as modelCue_int8 and modelScope_int8')
+  parser.add_argument('--corpus', default = CORPUS_PATH, help = 'the corpus file, one sentence per line (default: %(default)s)')
+  parser.add_argument('--repeat', type = int, default = 3, help = 'the number of times the corpus is run (default: 3)')
+  parser.add_argument('--batch-size', type = int, default = 32, help = 'the batch size of negation_scope_batch (default: 32)')
+  parser.add_argument('--seed', type = int, default = 2019, help = 'the seed of the test splits (default: 2019)')
+  parser.add_argument('--json', help = 'write the results to this JSON file')
+  parser.add_argument('--child', action = 'store_true', help = argparse.SUPPRESS) # measure one model pair in this process and print its measures
+  args = parser.parse_args()
+
+  sentences = read_corpus(args.corpus) * args.repeat
+
+  if args.child:
+    json.dump(measure(args.cue_model, args.scope_model, args.bioscope, sentences, args.seed, args.batch_size), sys.stdout)
+    return
+
+  tmpDir = None
+  outputDir = args.output_dir
+  if outputDir is None:
+    tmpDir = tempfile.TemporaryDirectory()
+    outputDir = tmpDir.name
+  os.makedirs(outputDir, exist_ok = True)
+
+  load_negbert()
+  pairs = [('fp32', args.cue_model, args.scope_model),
+           ('int8', os.path.join(outputDir, 'modelCue_int8'), os.path.join(outputDir, 'modelScope_int8'))]
+  for fp32Path, int8Path in zip(pairs[0][1:], pairs[1][1:]):
+    torch.save(quantize_model(load_model(fp32Path, device = 'cpu')), int8Path)
+    print('quantized %s to %s' % (fp32Path, int8Path))
+
+  results = []
+  for name, cueModel, scopeModel in pairs:
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--cue-model', cueModel, '--scope-model', scopeModel,
+               '--bioscope'] + args.bioscope + ['--corpus', args.corpus, '--repeat', str(args.repeat),
+               '--batch-size', str(args.batch_size), '--seed', str(args.seed)]
+    # evaluate prints its reports, which are left out of the measures
+    output = subprocess.run(command, check = True, stdout = subprocess.PIPE, universal_newlines = True).stdout
+    result = json.loads(output.strip().split('\n')[-1])
+    result['model'] = name
+    results.append(result)
+    print('%s   cue F1: %s   scope F1: %s   %8.1f sentences/s   cue: %7.1f MB   scope: %7.1f MB   peak RSS: %8.1f MB' % (name, result['cue_f1'], result['scope_f1'], result['sentences_per_second'], result['cue_model_mb'], result['scope_model_mb'], result['peak_rss_mb']))
+
+  if args.json:
+    with open(args.json, 'w', encoding = 'utf-8') as fh:
+      json.dump({'python': sys.version.split()[0], 'corpus': os.path.basename(args.corpus), 'sentences': len(sentences), 'results': results}, fh, indent = 2)
+  if tmpDir is not None:
+    tmpDir.cleanup()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure the throughput, latency and memory of each extraction mode over the frozen Indications corpus.
+
+Usage
+-----
+$ python throughput_benchmark.py                                           # every mode, data/indications_2021-06-27.txt
+$ python throughput_benchmark.py --modes gene_protein_chemical sent_subtree --repeat 5 --json results.json
+$ python throughput_benchmark.py --cue-model /path/to/modelCue --scope-model /path/to/modelScope
+
+No network access is needed. Each mode runs in its own process, after its models are loaded and warmed on a few sentences, so that its peak resident memory is its own. For each mode, the number of sentences per second, the p50 and p95 latency of one call and the peak RSS are reported. With --json, the results are written with the corpus hash and the versions of Python and the models, so that runs can be compared to track regressions.
+
+The modes are:
+- gene_protein_chemical: one call per sentence, genes, proteins and drugs.
+- gene_protein_chemical_batch: one call per --batch-size sentences (a call's latency is that of a batch).
+- sent_subtree: one call per sentence.
+- combination_drugs: one call per sentence.
+- sentence: the per-sentence path of the notebook: genes and proteins, first-line, metastatic, combination drugs and, if the NegBERT models are given, the negation scope and its entities.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import platform
+import argparse
+import resource
+import subprocess
+from biomarker_nlp import biomarker_extraction
+from biomarker_nlp import model_registry
+from build_corpus import CORPUS_PATH, read_corpus
+
+MODES = ['gene_protein_chemical', 'gene_protein_chemical_batch', 'sent_subtree', 'combination_drugs', 'sentence']
+WARMUP = 5 # Sentences run before the timing starts
+
+def sentence_path(st, modelCue = None, modelScope = None):
+  """The per-sentence path of the notebook (brand names and diseases are not known here, so generic ones are used)."""
+
+  geneProteinDic = biomarker_extraction.gene_protein_chemical(text = st, gene= 1, protein = 1, chemical = 0)
+  biomarker_extraction.is_firstline(text = st, medicine = 'TECENTRIQ', disease = 'cancer')
+  biomarker_extraction.is_metastatic(text = st, disease = 'cancer')
+  biomarker_extraction.combination_drugs(st)
+  if modelCue is not None and modelScope is not None:
+    from biomarker_nlp import negation_cue_scope
+    negScopeStr = negation_cue_scope.negation_scope(text = st, modelCue = modelCue, modelScope = modelScope)
+    if len(negScopeStr) > 0:
+      biomarker_extraction.gene_protein_chemical(text = ' '.join(negScopeStr), gene= 1, protein = 1, chemical = 1)
+  return geneProteinDic
+
+
+def calls(mode, sentences, batchSize, modelCue = None, modelScope = None):
+  """Return the calls of a mode over the sentences, each as (function, number of sentences)."""
+
+  if mode == 'gene_protein_chemical':
+    return [(lambda st = st: biomarker_extraction.gene_protein_chemical(text = st), 1) for st in sentences]
+  if mode == 'gene_protein_chemical_batch':
+    batches = [sentences[i:i + batchSize] for i in range(0, len(sentences), batchSize)]
+    return [(lambda b = b: list(biomarker_extraction.gene_protein_chemical_batch(b, batch_size = batchSize)), len(b)) for b in batches]
+  if mode == 'sent_subtree':
+    return [(lambda st = st: biomarker_extraction.sent_subtree(st), 1) for st in sentences]
+  if mode == 'combination_drugs':
+    return [(lambda st = st: biomarker_extraction.combination_drugs(st), 1) for st in sentences]
+  if mode == 'sentence':
+    return [(lambda st = st: sentence_path(st, modelCue, modelScope), 1) for st in sentences]
+  raise ValueError("Unknown mode " + mode + ". Please choose one of " + ', '.join(MODES) + ".")
+
+
+def percentile(values, p):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def measure(mode, sentences, repeat, batchSize, cueModel = None, scopeModel = None):
+  """Run a mode in this process and return its measures."""
+
+  modelCue = modelScope = None
+  if cueModel and scopeModel:
+    from biomarker_nlp import negation_negbert
+    # the NegBERT models are unpickled with the classes of negation_negbert in the __main__ namespace, as in the notebook
+    globals().update({name: value for name, value in vars(negation_negbert).items() if not name.startswith('_')})
+    modelCue = load_model(cueModel)
+    modelScope = load_model(scopeModel)
+
+  model_registry.registry.warm()
+  for function, n in calls(mode, sentences[:WARMUP], batchSize, modelCue, modelScope):
+    function()
+
+  latencies = []
+  count = 0
+  start = time.perf_counter()
+  for r in range(repeat):
+    for function, n in calls(mode, sentences, batchSize, modelCue, modelScope):
+      callStart = time.perf_counter()
+      function()
+      latencies.append(time.perf_counter() - callStart)
+      count += n
+  seconds = time.perf_counter() - start
+  return {'mode': mode,
+          'sentences': count,
+          'calls': len(latencies),
+          'seconds': round(seconds, 4),
+          'sentences_per_second': round(count / seconds, 2),
+          'p50_ms': round(1000 * percentile(latencies, 50), 3),
+          'p95_ms': round(1000 * percentile(latencies, 95), 3),
+          # ru_maxrss is in KB on Linux
+          'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+          'negation': modelCue is not None}
+
+
+def environment(corpus):
+  """Return what a run depends on: the corpus, Python and the versions of the models and of spacy."""
+
+  versions = {}
+  for package in ['spacy', 'scispacy'] + model_registry.MODELS:
+    try:
+      from importlib.metadata import version
+      versions[package] = version(package)
+    except Exception:
+      versions[package] = None
+  with open(corpus, 'rb') as fh:
+    corpusHash = hashlib.sha256(fh.read()).hexdigest()
+  return {'corpus': os.path.basename(corpus),
+          'corpus_sha256': corpusHash,
+          'python': platform.python_version(),
+          'machine': platform.machine(),
+          'cpus': os.cpu_count(),
+          'ner_only': model_registry.registry.ner_only,
+          'versions': versions,
+          'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.split('\n')[0])
+  parser.add_argument('--corpus', default = CORPUS_PATH, help = 'the corpus file, one sentence per line (default: %(default)s)')
+  parser.add_argument('--modes', nargs = '+', default = MODES, choices = MODES, help = 'the modes to run (default: all)')
+  parser.add_argument('--repeat', type = int, default = 3, help = 'the number of times the corpus is run (default: 3)')
+  parser.add_argument('--batch-size', type = int, default = 64, help = 'the batch size of gene_protein_chemical_batch (default: 64)')
+  parser.add_argument('--cue-model', help = 'the NegBERT cue model, for the negation of the sentence mode')
+  parser.add_argument('--scope-model', help = 'the NegBERT scope model, for the negation of the sentence mode')
+  parser.add_argument('--json', help = 'write the results to this JSON file')
+  parser.add_argument('--child', action = 'store_true', help = argparse.SUPPRESS) # run one mode in this process and print its measures
+  args = parser.parse_args()
+
+  sentences = read_corpus(args.corpus)
+
+  if args.child:
+    json.dump(measure(args.modes[0], sentences, args.repeat, args.batch_size, args.cue_model, args.scope_model), sys.stdout)
+    return
+
+  results = []
+  print('%d sentences, %d repeats' % (len(sentences), args.repeat))
+  for mode in args.modes:
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--modes', mode, '--corpus', args.corpus,
+               '--repeat', str(args.repeat), '--batch-size', str(args.batch_size)]
+    if args.cue_model and args.scope_model:
+      command += ['--cue-model', args.cue_model, '--scope-model', args.scope_model]
+    result = json.loads(subprocess.run(command, check = True, stdout = subprocess.PIPE).stdout)
+    results.append(result)
+    print('%-28s %9.1f sentences/s   p50: %8.2f ms   p95: %8.2f ms   peak RSS: %8.1f MB' % (mode, result['sentences_per_second'], result['p50_ms'], result['p95_ms'], result['peak_rss_mb']))
+
+  if args.json:
+    with open(args.json, 'w', encoding = 'utf-8') as fh:
+      json.dump({'environment': environment(args.corpus), 'results': results}, fh, indent = 2)
+
+
+if __name__ == '__main__':
+  main()
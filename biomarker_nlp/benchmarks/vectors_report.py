@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Report the memory and the accuracy of the NER models with shared and pruned word vectors.
+
+Usage
+-----
+$ python vectors_report.py                                         # the example sentences of ner_only_benchmark.py
+$ python vectors_report.py --sentences sents.txt --rows 100000 20000 5000
+
+The sentences file has one sentence per line. Each configuration (the vectors as shipped, shared between the models, and shared and pruned to each number of rows) runs in its own process, which loads the three models and runs gene_protein_chemical over the sentences. For each one, the peak resident memory of the process is reported, with:
+- the share of the entities of the shipped models that are still found (and the share of new entities),
+- the recall of the biomarkers of the 2021-06-27 CSV outputs: the gene and protein labels of the CSV that appear in a sentence and are found in it.
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import argparse
+import resource
+import subprocess
+from biomarker_nlp import biomarker_extraction
+from biomarker_nlp import model_registry
+from ner_only_benchmark import SENTENCES
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '2021-06-27 FDA-approved targeted therapy labels.csv') # The bundled outputs
+
+def measure(sentences, shareVectors, vectorRows):
+  """Load the models with the vectors configuration, run the sentences and return the entities and the peak memory (in MB)."""
+
+  model_registry.registry.share_vectors = shareVectors
+  model_registry.registry.vector_rows = vectorRows
+  model_registry.registry.warm()
+  results = list(biomarker_extraction.gene_protein_chemical_batch(sentences))
+  # ru_maxrss is in KB on Linux
+  return {'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 'results': results}
+
+
+def csv_biomarkers(path):
+  """Return the gene and protein labels of the CSV outputs."""
+
+  with open(path, 'r', encoding = 'utf-8', errors = 'replace') as fh:
+    return set(row['geneProtein_label'] for row in csv.DictReader(fh) if row['geneProtein_label'] not in ('', '*'))
+
+
+def entities(result):
+  return set((key, e) for key, values in result.items() for e in values)
+
+
+def compare(sentences, baseline, results, biomarkers):
+  """Return the agreement of results with the baseline results and the recall of the CSV biomarkers."""
+
+  kept = new = total = 0
+  found = expected = 0
+  for st, base, result in zip(sentences, baseline, results):
+    kept += len(entities(base) & entities(result))
+    new += len(entities(result) - entities(base))
+    total += len(entities(base))
+    geneProtein = set(result.get('gene', []) + result.get('protein', []))
+    for b in biomarkers:
+      if re.search(r'(?<!\w)' + re.escape(b) + r'(?!\w)', st):
+        expected += 1
+        found += b in geneProtein
+  return {'entities_kept': round(kept / total, 4) if total > 0 else 1.0,
+          'entities_new': round(new / total, 4) if total > 0 else 0.0,
+          'csv_biomarker_recall': round(found / expected, 4) if expected > 0 else None,
+          'csv_biomarker_mentions': expected}
+
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.split('\n')[0])
+  parser.add_argument('--sentences', help = 'a text file with one sentence per line (default: built-in examples)')
+  parser.add_argument('--rows', type = int, nargs = '*', default = [20000], help = 'the numbers of vector rows to prune to (default: 20000)')
+  parser.add_argument('--csv', default = CSV_PATH, help = 'the CSV outputs whose biomarkers are looked for (default: the bundled 2021-06-27 outputs)')
+  parser.add_argument('--json', help = 'also write the report to this JSON file')
+  parser.add_argument('--config', help = argparse.SUPPRESS) # 'shipped', 'shared' or a number of rows; run by the report in a child process
+  args = parser.parse_args()
+
+  sentences = SENTENCES
+  if args.sentences:
+    with open(args.sentences, 'r', encoding = 'utf-8') as fh:
+      sentences = [line.strip() for line in fh if line.strip()]
+
+  if args.config is not None:
+    if args.config == 'shipped':
+      measured = measure(sentences, False, None)
+    elif args.config == 'shared':
+      measured = measure(sentences, True, None)
+    else:
+      measured = measure(sentences, True, int(args.config))
+    json.dump(measured, sys.stdout)
+    return
+
+  biomarkers = csv_biomarkers(args.csv)
+  report = []
+  baseline = None
+  for config in ['shipped', 'shared'] + [str(rows) for rows in args.rows]:
+    command = [sys.executable, os.path.abspath(__file__), '--config', config]
+    if args.sentences:
+      command += ['--sentences', args.sentences]
+    measured = json.loads(subprocess.run(command, check = True, stdout = subprocess.PIPE).stdout)
+    baseline = baseline or measured['results']
+    row = {'vectors': config if config in ('shipped', 'shared') else 'shared, ' + config + ' rows', 'peak_rss_mb': round(measured['peak_rss_mb'], 1)}
+    row.update(compare(sentences, baseline, measured['results'], biomarkers))
+    report.append(row)
+    print('%-22s peak RSS: %8.1f MB   entities kept: %6.2f%%   new: %6.2f%%   CSV biomarker recall: %s' % (row['vectors'], row['peak_rss_mb'], 100 * row['entities_kept'], 100 * row['entities_new'], row['csv_biomarker_recall']))
+
+  if args.json:
+    with open(args.json, 'w', encoding = 'utf-8') as fh:
+      json.dump(report, fh, indent = 2)
+
+
+if __name__ == '__main__':
+  main()
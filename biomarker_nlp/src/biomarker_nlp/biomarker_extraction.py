@@ -1,28 +1,234 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import requests
 import lxml.html
 import re
-import scispacy
-import spacy
-import en_ner_craft_md
-import en_ner_jnlpba_md
-import en_ner_bionlp13cg_md
-nlp_craft = en_ner_craft_md.load()
-nlp_jnlpha = en_ner_jnlpba_md.load()
-nlp_bionlp13cg = en_ner_bionlp13cg_md.load()
+import itertools
+from biomarker_nlp import http_cache
+from biomarker_nlp import heading_match
+from biomarker_nlp import model_registry
+from biomarker_nlp import result_cache
+
+# the NER models are loaded by model_registry on first use
+MODEL_ALIASES = {'nlp_craft': model_registry.GENE_MODEL,
+                 'nlp_jnlpha': model_registry.PROTEIN_MODEL,
+                 'nlp_bionlp13cg': model_registry.CHEMICAL_MODEL}
+
+ENTITY_MODELS = [('gene', model_registry.GENE_MODEL, 'GGP'),
+                 ('protein', model_registry.PROTEIN_MODEL, 'PROTEIN'),
+                 ('chemical', model_registry.CHEMICAL_MODEL, 'SIMPLE_CHEMICAL')] # (key, model, entity label) of gene_protein_chemical
+
+COMBINATION_PATTERN = re.compile(r'\b(in combination with|used with)\b', re.IGNORECASE) # Sentences without it are not parsed by sent_subtree
+COMBINATION_PHRASES = [[{'LOWER': 'in'}, {'LOWER': 'combination'}, {'LOWER': 'with'}],
+                       [{'LOWER': 'used'}, {'LOWER': 'with'}]] # Matcher patterns of phrases_only; the headword is 'combination' or 'used'
+COMBINATION_HEADWORDS = ['combination', 'used'] # By default, every token containing one of them is a headword
+_combinationMatchers = {}
+
+def __getattr__(name):
+  # biomarker_extraction.nlp_craft, nlp_jnlpha and nlp_bionlp13cg load their model when they are first accessed
+  if name in MODEL_ALIASES:
+    return model_registry.registry.get(MODEL_ALIASES[name])
+  raise AttributeError("module 'biomarker_extraction' has no attribute '" + name + "'")
+
+
+class LabelPage:
+  """A drug's DailyMed label information page that is downloaded and parsed only once.
+
+  The page is requested and parsed into an lxml tree when the object is created. The brand label, NDC codes, whole sections and disease subsections are then extracted from that same tree, so a label can be queried any number of times without another round-trip or DOM build.
+  Every DailyMed function in this module (disease_content, section_content, drug_brand_label and ndc_code) accepts a LabelPage in place of the URL link.
+
+  Parameters
+  ----------
+  dailyMedURL : str
+      An URL link to a drug's DailyMed information page and quoted ("") as a string.
+  html : str, optional
+      The HTML of the page if it was already downloaded, by default None.
+      If None, the page is downloaded from dailyMedURL.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import biomarker_extraction
+
+  Example
+
+  >>> url = "https://dailymed.nlm.nih.gov/dailymed/drugInfo.cfm?setid=939b5d1f-9fb2-4499-80ef-0607aa6b114e"
+  >>> labelPage = biomarker_extraction.LabelPage(url)
+  >>> labelPage.brand_label()
+  'AVASTIN- bevacizumab injection, solution'
+  >>> biomarker_extraction.ndc_code(dailyMedURL = labelPage)
+  '50242-060-01, 50242-060-10, 50242-061-01, 50242-061-10'
+
+  """
+
+  def __init__(self, dailyMedURL, html = None):
+    self.url = dailyMedURL
+    if html is None:
+      html = http_cache.fetch(dailyMedURL)
+    self.page = lxml.html.fromstring(html)
+    self._sections = None
+
+  def _build_index(self):
+    # walk the page once: the heading and text of every section, and the subsections of 'INDICATIONS AND USAGE'
+    self._sections = []
+    self._subsections = []
+    for li in self.page.xpath("//li[a]"):
+      headings = [a.text for a in li.findall('a') if a.text]
+      contents = [div.text_content() for div in li.findall('div')]
+      self._sections.append({'headings': [heading_match.normalize_heading(h) for h in headings], 'contents': contents})
+      if any('INDICATIONS AND USAGE' in h for h in headings):
+        for div in li.xpath("div/div[h2]"):
+          self._subsections.append({'title': div.find('h2').text_content(),
+                                    'header': div.xpath(".//h2")[0].text_content(),
+                                    'content': div.text_content()})
+    self._lookups = {}
+
+  def section_index(self):
+    """Return the sections of the page as a dictionary of normalized headings (see normalize_heading of heading_match) and text contents.
+
+    The index is built in one walk over the page the first time it is needed, together with the subsections of 'INDICATIONS AND USAGE'.
+    """
+
+    if self._sections is None:
+      self._build_index()
+    index = {}
+    for section in self._sections:
+      for heading in section['headings']:
+        index[heading] = (index[heading] + ' ' if heading in index else '') + ' '.join(section['contents']).strip()
+    return index
+
+  def disease_subsections(self, diseases):
+    """Return the 'INDICATIONS AND USAGE' subsections of each disease, as dictionaries with the keys "title", "header" and "content".
+
+    The subheadings are matched against all the diseases in one pass with a DiseaseMatcher of heading_match (overlapping matches are resolved longest first, so 'Small Cell Lung Cancer' does not find the 'Non-Small Cell Lung Cancer' subsection).
+
+    Parameters
+    ----------
+    diseases : list or DiseaseMatcher
+        The names of the diseases, or a DiseaseMatcher already compiled from them (to reuse it across labels).
+
+    Returns
+    -------
+    dict
+        Return the diseases mapped to their subsections in document order.
+    """
+
+    if self._sections is None:
+      self._build_index()
+    matcher = diseases if isinstance(diseases, heading_match.DiseaseMatcher) else heading_match.DiseaseMatcher(diseases)
+    matched = matcher.match_headings([s['title'] for s in self._subsections])
+    return {d: [self._subsections[i] for i in indices] for d, indices in matched.items()}
+
+  def disease_contents(self, diseases, header = False):
+    """Extract the subsection of every disease from the 'INDICATIONS AND USAGE' section in one pass. See disease_contents."""
+
+    contents = {}
+    for disease, dailyMedDisContent in self.disease_subsections(diseases).items():
+      # extract text content of the matched disease
+      if len(dailyMedDisContent)>0:
+        dailyMedDisContentStr = ' '.join(disContent['content'] for disContent in dailyMedDisContent).strip()
+        if header == False:
+          dailyMedDisContentStr = dailyMedDisContentStr.replace(dailyMedDisContent[0]['header'], "")
+        contents[disease] = dailyMedDisContentStr
+      else: contents[disease] = None
+    return contents
+
+  def disease_content(self, disease, header = False):
+    """Extract subsection for a particular disease from the 'INDICATIONS AND USAGE' section. See disease_content."""
+
+    if self._sections is None:
+      self._build_index()
+    key = ('disease', heading_match.normalize_heading(disease), header)
+    if key not in self._lookups:
+      self._lookups[key] = self.disease_contents([disease], header = header)[disease]
+    return self._lookups[key]
+
+  def section_content(self, section):
+    """Extract a whole section text content excluding the section heading. See section_content."""
+
+    if self._sections is None:
+      self._build_index()
+    key = ('section', heading_match.normalize_heading(section))
+    if key not in self._lookups:
+      # the sections whose heading contains the section name
+      contents = []
+      for secContent in self._sections:
+        if any(key[1] in h for h in secContent['headings']):
+          contents.extend(secContent['contents'])
+      self._lookups[key] = ' '.join(contents).strip() if len(contents) > 0 else None
+    return self._lookups[key]
+
+  def brand_label(self):
+    """Extract the drug label. See drug_brand_label."""
+
+    # extract the brand label
+    therBrName = self.page.xpath("//span[@id='drug-label']/text()")
+    if len(therBrName) > 0:
+      drugLabel = therBrName[0]
+    else: drugLabel = ""
+    return drugLabel
+
+  def ndc_code(self):
+    """Extract the NDC code(s) in a string. See ndc_code."""
+
+    # extract the NDC codes
+    codeList = []
+    NDCCode = self.page.xpath("//span[@id='item-code-s']/text()")
+    if NDCCode:
+      NDCCode = NDCCode[0]
+      NDCCodeList = NDCCode.split(',')
+      for c in range(len(NDCCodeList)):
+        NDCCodeList[c] = NDCCodeList[c].replace('\n', '')
+        NDCCodeList[c] = NDCCodeList[c].replace(' ', '')
+      codeList.extend(NDCCodeList)
+
+    # extract the NDC code (view more)
+    NDCCodeMore = self.page.xpath("//span[@id='item-code-s']//div[@class = 'more-codes']/span/text()")
+    if NDCCodeMore:
+      NDCCodeMore = NDCCodeMore[0]
+      NDCCodeMoreList = NDCCodeMore.split(',')
+      for m in range(len(NDCCodeMoreList)):
+        NDCCodeMoreList[m] = NDCCodeMoreList[m].replace('\n', '')
+        NDCCodeMoreList[m] = NDCCodeMoreList[m].replace(' ', '')
+      
+      codeList.extend(NDCCodeMoreList)
+    ndcCode = ', '.join(x for x in codeList if x)
+
+    return ndcCode
+
+
+def label_page(dailyMedURL):
+  """Return the parsed DailyMed page for a URL link, or the label itself if a LabelPage (or an SPLLabel of dailymed_spl) is given.
+
+  Parameters
+  ----------
+  dailyMedURL : str, LabelPage or SPLLabel
+      An URL link to a drug's DailyMed information page, a LabelPage that was already created from it, or an SPLLabel read from a DailyMed SPL archive.
+
+  Returns
+  -------
+  LabelPage or SPLLabel
+      Return the downloaded and parsed DailyMed page, or the given label.
+  """
+
+  if isinstance(dailyMedURL, str):
+    return LabelPage(dailyMedURL)
+  return dailyMedURL
+
 
 def disease_content(dailyMedURL, disease, header = False):
   """Extract subsection for a particular disease from a drug's DailyMed 'INDICATIONS AND USAGE' section.
 
-  Parse the URL link using the lxml library. Locate the subsection that discusses the disease in the 'INDICATIONS AND USAGE' section from the HTML's tree structure. 
+  Parse the URL link using the lxml library (or reuse the LabelPage that was already parsed). Locate the subsection that discusses the disease in the 'INDICATIONS AND USAGE' section from the HTML's tree structure. 
   If the header argument is set to False, only the text content will be extracted. If the header argument is set to True, the whole subsection including the subheading and its text content will be extracted.
+  Subheadings are compared after normalizing case, dashes and white space, and a disease is not matched right after 'Non' (e.g. 'Small Cell Lung Cancer' does not match 'Non-Small Cell Lung Cancer'). The page's sections are indexed once, so repeated calls on the same LabelPage are dictionary lookups.
+  To extract the subsections of several diseases, disease_contents matches them all in one pass.
 
   Parameters
   ----------
-  dailyMedURL : str
-      An URL link to a drug's DailyMed information page and quoted ("") as a string.
+  dailyMedURL : str or LabelPage
+      An URL link to a drug's DailyMed information page and quoted ("") as a string, or a LabelPage of that page.
   disease : str
       The name of a disease whose text information will be extracted from the 'INDICATIONS AND USAGE' section.
   header : bool, optional
@@ -58,42 +264,57 @@ def disease_content(dailyMedURL, disease, header = False):
   
   
   """
-   
-  # parse the drug information page's link
-  dailyMedRp = requests.get(dailyMedURL)
-  dailyMedPage = lxml.html.fromstring(dailyMedRp.text)
 
-  # locate the 'INDICATIONS AND USAGE' section in DailyMed and extract the text content by certain cancer type. 
-  usagePath = "//li[a[contains(text(),'INDICATIONS AND USAGE')]]/div/div[h2[contains(translate(text(),'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'" + disease.lower() + "')]]"
-  dailyMedDisContent = dailyMedPage.xpath(usagePath)
+  # parse the drug information page's link, unless it was already parsed
+  return label_page(dailyMedURL).disease_content(disease, header = header)
 
-  # extract text content of the matched disease
-  if len(dailyMedDisContent)>0:
-    dailyMedDisContentStr = ""                     
-    for disContent in dailyMedDisContent:
-      dailyMedDisContentStr = dailyMedDisContentStr + disContent.text_content() + ' '                              
-    dailyMedDisContentStr = dailyMedDisContentStr.strip()
 
+def disease_contents(dailyMedURL, diseases, header = False):
+  """Extract the subsection of every disease from a drug's DailyMed 'INDICATIONS AND USAGE' section in one pass.
 
-    if header == False:
-      headerPath = "//li[a[contains(text(),'INDICATIONS AND USAGE')]]/div/div[h2[contains(translate(text(),'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'" + disease.lower() + "')]]//h2"
-      headerContent = dailyMedPage.xpath(headerPath)
-      dailyMedDisContentStr = dailyMedDisContentStr.replace(headerContent[0].text_content(), "")
-      return dailyMedDisContentStr
-    else: return dailyMedDisContentStr
-  
-  else: return None
+  The disease names (and their variants, see disease_variants of heading_match) are compiled once into an Aho-Corasick automaton that is run over each subheading of the section, instead of one search of the page per disease. Overlapping matches are resolved longest first, so the 'Non-Small Cell Lung Cancer' subsection is given to 'Non-small cell lung cancer' and not to 'Small cell lung cancer'.
+
+  Parameters
+  ----------
+  dailyMedURL : str, LabelPage or SPLLabel
+      An URL link to a drug's DailyMed information page and quoted ("") as a string, or a LabelPage of that page.
+  diseases : list or DiseaseMatcher
+      The names of the diseases, or a DiseaseMatcher of heading_match already compiled from them.
+  header : bool, optional
+      Extract the subheadings, by default False. See disease_content.
+
+  Returns
+  -------
+  dict
+      Return the diseases mapped to their subsection text, or to None if no associated subsection is found.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import biomarker_extraction
+
+  Example
+
+  >>> url = "https://dailymed.nlm.nih.gov/dailymed/drugInfo.cfm?setid=939b5d1f-9fb2-4499-80ef-0607aa6b114e"
+  >>> biomarker_extraction.disease_contents(dailyMedURL = url, diseases = ['Cervical cancer', 'Small cell lung cancer'])
+  {'Cervical cancer': '\\nAvastin, in combination with paclitaxel and cisplatin or paclitaxel and topotecan, is indicated for the treatment of patients with persistent, recurrent, or metastatic cervical cancer.', 'Small cell lung cancer': None}
+
+  """
+
+  # parse the drug information page's link, unless it was already parsed
+  return label_page(dailyMedURL).disease_contents(diseases, header = header)
 
 
 def section_content(dailyMedURL, section):
   """Extract a whole section text content from the drug's DailyMed information page excluding the section heading.
 
-  Parse the URL link using the lxml library. Locate the section using the section's heading from the HTML's tree structure. Extract the text content of the section excluding the heading.
+  Parse the URL link using the lxml library (or reuse the LabelPage that was already parsed). Locate the section using the section's heading from the HTML's tree structure. Extract the text content of the section excluding the heading.
 
   Parameters
   ----------
-  dailyMedURL : str
-      An URL link to a drug DailyMed information page and quoted ("") as a string.
+  dailyMedURL : str or LabelPage
+      An URL link to a drug DailyMed information page and quoted ("") as a string, or a LabelPage of that page.
   section : str
       The header of the section.
 
@@ -126,37 +347,21 @@ def section_content(dailyMedURL, section):
   --------
   disease_content
   """
-  
-  # parse the drug information page's link
-  dailyMedRp = requests.get(dailyMedURL)
-  dailyMedPage = lxml.html.fromstring(dailyMedRp.text)
-
-  # locate the section in DailyMed and extract the text content. 
-  usagePath = "//li[a[contains(translate(text(),'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'" + section.lower() + "')]]/div"
-  dailyMedSecContent = dailyMedPage.xpath(usagePath)
-
-  # extract text content of the section
-  if len(dailyMedSecContent)>0:
-    dailyMedSecContentStr = ""                     
-    for secContent in dailyMedSecContent:
-      dailyMedSecContentStr = dailyMedSecContentStr + secContent.text_content() + ' '                              
-    dailyMedSecContentStr = dailyMedSecContentStr.strip()
-
-    return dailyMedSecContentStr
 
-  else: return None
+  # parse the drug information page's link, unless it was already parsed
+  return label_page(dailyMedURL).section_content(section)
 
 
 def drug_brand_label(dailyMedURL):
   """Extract drug label at the drug dailyMed label information page.
 
-  Parse the URL link using the lxml library. Locate and extract the drug label from the HTML's tree structure. 
+  Parse the URL link using the lxml library (or reuse the LabelPage that was already parsed). Locate and extract the drug label from the HTML's tree structure. 
 
   Parameters
   ----------
-  dailyMedURL : str
+  dailyMedURL : str or LabelPage
       An URL link to a drug DailyMed information page
-      and quoted ("") as a string.
+      and quoted ("") as a string, or a LabelPage of that page.
 
   Returns
   -------
@@ -181,28 +386,20 @@ def drug_brand_label(dailyMedURL):
   ndc_code
   """
 
-  # parse the drug information page's link
-  dailyMedRp = requests.get(dailyMedURL)
-  dailyMedPage = lxml.html.fromstring(dailyMedRp.text)
-
-  # extract the brand label
-  therBrName = dailyMedPage.xpath("//span[@id='drug-label']/text()")
-  if len(therBrName) > 0:
-    drugLabel = therBrName[0]
-  else: drugLabel = ""
-  return drugLabel
+  # parse the drug information page's link, unless it was already parsed
+  return label_page(dailyMedURL).brand_label()
 
 
 def ndc_code(dailyMedURL):
   """Extract NDC code(s) from the drug dailyMed label information page.
 
-  Parse the URL link using the lxml library. Locate and extract the NDC codes from the HTML's tree structure. It returns all the codes found in a string. The codes are separated by commas. 
+  Parse the URL link using the lxml library (or reuse the LabelPage that was already parsed). Locate and extract the NDC codes from the HTML's tree structure. It returns all the codes found in a string. The codes are separated by commas. 
 
   Parameters
   ----------
-  dailyMedURL : str
+  dailyMedURL : str or LabelPage
       An URL link to a drug DailyMed information page
-      and quoted ("") as a string.
+      and quoted ("") as a string, or a LabelPage of that page.
 
   Returns
   -------
@@ -223,40 +420,17 @@ def ndc_code(dailyMedURL):
 
   """
 
-  # parse the drug information page's link
-  dailyMedRp = requests.get(dailyMedURL)
-  dailyMedPage = lxml.html.fromstring(dailyMedRp.text)
-
-  # extract the NDC codes
-  codeList = []
-  NDCCode = dailyMedPage.xpath("//span[@id='item-code-s']/text()")
-  if NDCCode:
-    NDCCode = NDCCode[0]
-    NDCCodeList = NDCCode.split(',')
-    for c in range(len(NDCCodeList)):
-      NDCCodeList[c] = NDCCodeList[c].replace('\n', '')
-      NDCCodeList[c] = NDCCodeList[c].replace(' ', '')
-    codeList.extend(NDCCodeList)
-
-  # extract the NDC code (view more)
-  NDCCodeMore = dailyMedPage.xpath("//span[@id='item-code-s']//div[@class = 'more-codes']/span/text()")
-  if NDCCodeMore:
-    NDCCodeMore = NDCCodeMore[0]
-    NDCCodeMoreList = NDCCodeMore.split(',')
-    for m in range(len(NDCCodeMoreList)):
-      NDCCodeMoreList[m] = NDCCodeMoreList[m].replace('\n', '')
-      NDCCodeMoreList[m] = NDCCodeMoreList[m].replace(' ', '')
-    
-    codeList.extend(NDCCodeMoreList)
-  ndcCode = ', '.join(x for x in codeList if x)
-
-  return ndcCode
-
-
-def gene_protein_chemical(text, gene= 1, protein = 1, chemical = 1):
+  # parse the drug information page's link, unless it was already parsed
+  return label_page(dailyMedURL).ndc_code()
+
+
+def gene_protein_chemical(text, gene= 1, protein = 1, chemical = 1, prefilter = None):
   """Extract gene, protein, and drug labels from a string.
 
   The function uses three pre-trained NER models from scispacy. Please see https://allenai.github.io/scispacy/. We use en_ner_craft_md model to recognize genes. Entities labeled with "GGP" in this model are categorized as genes. We use the en_ner_jnlpba_md model to recognize proteins. Entities labeled with "PROTEIN" in this model are categorized as proteins. We use en_ner_bionlp13cg_md model to recognize drugs. Entities labeled with "SIMPLE_CHEMICAL" in this model are categorized as drugs.
+  Only the models that are needed are loaded, the first time they are needed, and in NER-only mode only their entity recognizers run (see model_registry).
+  If a ResultCache was set with set_default_cache of result_cache, the entities of a sentence that was already seen are served from the cache.
+  With a prefilter, a sentence without any gene, protein or drug candidate (see gazetteer) is not run and has no entities.
 
   Parameters
   ----------
@@ -271,6 +445,8 @@ def gene_protein_chemical(text, gene= 1, protein = 1, chemical = 1):
   chemical : int, optional
       Extract simple chemicals, by default 1. 
       0: do not extract simple chemicals. 1: extract simple chemicals. 
+  prefilter : Gazetteer, optional
+      The gazetteer of gazetteer that decides which sentences are run, by default None (every sentence is run). In audit mode, every sentence is run and the filter records what it would have dropped.
 
   Returns
   -------
@@ -310,7 +486,25 @@ def gene_protein_chemical(text, gene= 1, protein = 1, chemical = 1):
   {'gene': ['EGFR', 'ALK genomic']}
   
   """
-  
+
+  # sentences without a candidate are not run, except in audit mode (see gazetteer)
+  if prefilter is not None:
+    kept = prefilter.has_candidates(text)
+    if kept or prefilter.audit:
+      geneProteinChemicalDic = gene_protein_chemical(text, gene = gene, protein = protein, chemical = chemical)
+    else:
+      geneProteinChemicalDic = {key: [] for key, model, label in _entity_models(gene, protein, chemical)}
+    prefilter.record(text, geneProteinChemicalDic, kept)
+    return geneProteinChemicalDic
+
+  # serve the entities from the sentence cache if there is one (see result_cache)
+  if result_cache.default_cache is not None:
+    return _cached_entities([text], gene, protein, chemical, lambda texts, **flags: [_gene_protein_chemical(texts[0], **flags)])[0]
+  return _gene_protein_chemical(text, gene = gene, protein = protein, chemical = chemical)
+
+
+def _gene_protein_chemical(text, gene = 1, protein = 1, chemical = 1):
+  # run the models on the text; see gene_protein_chemical
   geneProteinChemicalDic = {}
   geneList = []
   proteinList = []
@@ -318,7 +512,7 @@ def gene_protein_chemical(text, gene= 1, protein = 1, chemical = 1):
 
   # extract genes
   if gene== 1:
-    doc = nlp_craft(text)
+    doc = model_registry.registry.get(model_registry.GENE_MODEL)(text, disable = model_registry.registry.ner_disabled(model_registry.GENE_MODEL))
     # filter gene and gene product
     for entity in doc.ents:
       if entity.label_=='GGP':
@@ -328,7 +522,7 @@ def gene_protein_chemical(text, gene= 1, protein = 1, chemical = 1):
 
   # extract proteins
   if protein == 1:
-    doc = nlp_jnlpha(text)
+    doc = model_registry.registry.get(model_registry.PROTEIN_MODEL)(text, disable = model_registry.registry.ner_disabled(model_registry.PROTEIN_MODEL))
     # filter protein
     for entity in doc.ents:
       if entity.label_=='PROTEIN':
@@ -338,7 +532,7 @@ def gene_protein_chemical(text, gene= 1, protein = 1, chemical = 1):
 
   # extract drugs (SIMPLE_CHEMICAL)
   if chemical == 1:
-    doc = nlp_bionlp13cg(text)
+    doc = model_registry.registry.get(model_registry.CHEMICAL_MODEL)(text, disable = model_registry.registry.ner_disabled(model_registry.CHEMICAL_MODEL))
     # filter drug (SIMPLE_CHEMICAL)
     for entity in doc.ents:
       if entity.label_=='SIMPLE_CHEMICAL':
@@ -349,15 +543,259 @@ def gene_protein_chemical(text, gene= 1, protein = 1, chemical = 1):
   return geneProteinChemicalDic
 
 
-def sent_subtree(text):
+def gene_protein_chemical_batch(texts, gene = 1, protein = 1, chemical = 1, batch_size = 256, n_process = 1, prefilter = None):
+  """Extract gene, protein, and drug labels from many strings, streaming them through each model with nlp.pipe.
+
+  The same models and entity labels as gene_protein_chemical are used, and the results are the same, but the texts are processed in batches by each model instead of one pipeline call per text. Texts are read lazily, so a generator over a whole label corpus can be given.
+  In NER-only mode (see model_registry), each text is tokenized once and shared by the three entity recognizers (see entity_spans_batch).
+  If a ResultCache was set with set_default_cache of result_cache, the texts are looked up batch_size at a time and only the texts that were never seen are run.
+  With a prefilter, the texts without any gene, protein or drug candidate (see gazetteer) are not run and have no entities.
+
+  Parameters
+  ----------
+  texts : iterable
+      The strings, e.g. the sentences of a label.
+  gene : int, optional
+      Extract genes, by default 1.
+      0: do not extract genes. 1: extract genes. 
+  protein : int, optional
+      Extract proteins, by default 1.
+      0: do not extract proteins. 1: extract proteins. 
+  chemical : int, optional
+      Extract simple chemicals, by default 1. 
+      0: do not extract simple chemicals. 1: extract simple chemicals. 
+  batch_size : int, optional
+      The number of texts given to a model at a time, by default 256.
+  n_process : int, optional
+      The number of processes of each model's nlp.pipe, by default 1.
+  prefilter : Gazetteer, optional
+      The gazetteer of gazetteer that decides which texts are run, by default None (every text is run). In audit mode, every text is run and the filter records what it would have dropped.
+
+  Yields
+  ------
+  dic
+      One dictionary per text, in the order of the texts, as returned by gene_protein_chemical.
+
+  See Also
+  --------
+  gene_protein_chemical
+
+  Examples
+  --------
+  Import the module
+  
+  >>> from biomarker_nlp import biomarker_extraction
+  
+  Example
+  
+  >>> sentences = ["Patients with EGFR or ALK genomic tumor aberrations should have disease progression on FDA-approved therapy for NSCLC harboring these aberrations prior to receiving TECENTRIQ."]
+  >>> list(biomarker_extraction.gene_protein_chemical_batch(sentences, gene= 1, protein = 1, chemical = 0, batch_size = 64))
+  [{'gene': ['EGFR', 'ALK genomic'], 'protein': ['EGFR', 'TECENTRIQ']}]
+
+  """
+
+  # only the texts with a candidate are run, a batch at a time, except in audit mode (see gazetteer)
+  if prefilter is not None:
+    texts = iter(texts)
+    chunk = list(itertools.islice(texts, batch_size))
+    while len(chunk) > 0:
+      kept = [prefilter.has_candidates(text) for text in chunk]
+      results = gene_protein_chemical_batch([text for text, k in zip(chunk, kept) if k or prefilter.audit], gene = gene, protein = protein, chemical = chemical, batch_size = batch_size, n_process = n_process)
+      for text, k in zip(chunk, kept):
+        if k or prefilter.audit:
+          geneProteinChemicalDic = next(results)
+        else:
+          geneProteinChemicalDic = {key: [] for key, model, label in _entity_models(gene, protein, chemical)}
+        prefilter.record(text, geneProteinChemicalDic, k)
+        yield geneProteinChemicalDic
+      chunk = list(itertools.islice(texts, batch_size))
+    return
+
+  # with the sentence cache, the texts are looked up a batch at a time and only the misses are run
+  if result_cache.default_cache is not None:
+    texts = iter(texts)
+    chunk = list(itertools.islice(texts, batch_size))
+    while len(chunk) > 0:
+      compute = lambda missing, **flags: list(_gene_protein_chemical_batch(missing, batch_size = batch_size, n_process = n_process, **flags))
+      for geneProteinChemicalDic in _cached_entities(chunk, gene, protein, chemical, compute):
+        yield geneProteinChemicalDic
+      chunk = list(itertools.islice(texts, batch_size))
+    return
+
+  for geneProteinChemicalDic in _gene_protein_chemical_batch(texts, gene = gene, protein = protein, chemical = chemical, batch_size = batch_size, n_process = n_process):
+    yield geneProteinChemicalDic
+
+
+def _gene_protein_chemical_batch(texts, gene = 1, protein = 1, chemical = 1, batch_size = 256, n_process = 1):
+  # run the models on the texts; see gene_protein_chemical_batch
+  tasks = _entity_models(gene, protein, chemical)
+  if len(tasks) == 0:
+    for text in texts:
+      yield {}
+    return
+
+  # in NER-only mode, every text is tokenized once for all the models
+  if model_registry.registry.ner_only:
+    for spans in entity_spans_batch(texts, gene = gene, protein = protein, chemical = chemical, batch_size = batch_size, n_process = n_process):
+      yield {key: [span['text'] for span in spans if span['label'] == label] for key, model, label in tasks}
+    return
+
+  # every model reads its own copy of the text stream, in step with the others
+  streams = itertools.tee(texts, len(tasks))
+  docStreams = [model_registry.registry.get(model).pipe(stream, batch_size = batch_size, n_process = n_process, disable = model_registry.registry.ner_disabled(model))
+                for (key, model, label), stream in zip(tasks, streams)]
+  for docs in zip(*docStreams):
+    geneProteinChemicalDic = {}
+    for (key, model, label), doc in zip(tasks, docs):
+      geneProteinChemicalDic[key] = [entity.text for entity in doc.ents if entity.label_ == label]
+    yield geneProteinChemicalDic
+
+
+def _entity_models(gene, protein, chemical):
+  # the (key, model, entity label) to run, in the key order of gene_protein_chemical
+  flags = {'gene': gene, 'protein': protein, 'chemical': chemical}
+  return [task for task in ENTITY_MODELS if flags[task[0]] == 1]
+
+
+def _cached_entities(texts, gene, protein, chemical, compute):
+  # look up the entities of every text and model in the sentence cache; the texts with a miss are run with compute(texts, gene, protein, chemical) and stored
+  cache = result_cache.default_cache
+  tasks = _entity_models(gene, protein, chemical)
+  identities = {model: model_registry.registry.identity(model) for key, model, label in tasks}
+  results = []
+  missing = []
+  for i, text in enumerate(texts):
+    geneProteinChemicalDic = {}
+    for key, model, label in tasks:
+      value = cache.get('ner:' + label, identities[model], text)
+      if value is not None:
+        geneProteinChemicalDic[key] = value
+    results.append(geneProteinChemicalDic)
+    if len(geneProteinChemicalDic) < len(tasks):
+      missing.append(i)
+
+  if len(missing) > 0:
+    for i, geneProteinChemicalDic in zip(missing, compute([texts[i] for i in missing], gene = gene, protein = protein, chemical = chemical)):
+      for key, model, label in tasks:
+        cache.put('ner:' + label, identities[model], texts[i], geneProteinChemicalDic[key])
+      results[i] = geneProteinChemicalDic
+  return [{key: dic[key] for key, model, label in tasks} for dic in results]
+
+
+def _token_copies(nlp, docs):
+  # a copy of each tokenized Doc in the vocabulary of the model, so that the model's word vectors are used
+  from spacy.tokens import Doc
+  for doc in docs:
+    yield Doc(nlp.vocab, words = [token.text for token in doc], spaces = [bool(token.whitespace_) for token in doc])
+
+
+def entity_spans_batch(texts, gene = 1, protein = 1, chemical = 1, batch_size = 256, n_process = 1):
+  """Recognize genes, proteins, and drugs in many strings, tokenizing each string only once.
+
+  Each text is tokenized once, by the tokenizer of the first model (the scispacy models share the same tokenizer). Each model's entity recognizer is then applied to a copy of the tokens in its own vocabulary, without the rest of its pipeline. The entities of the three models are merged into one list per text, ordered by their position.
+
+  Parameters
+  ----------
+  texts : iterable
+      The strings, e.g. the sentences of a label.
+  gene : int, optional
+      Recognize genes ("GGP"), by default 1.
+  protein : int, optional
+      Recognize proteins ("PROTEIN"), by default 1.
+  chemical : int, optional
+      Recognize simple chemicals ("SIMPLE_CHEMICAL"), by default 1.
+  batch_size : int, optional
+      The number of texts processed at a time, by default 256.
+  n_process : int, optional
+      The number of processes used for tokenization, by default 1.
+
+  Yields
+  ------
+  list
+      One list per text, in the order of the texts, of dictionaries with the keys "text", "label", "start" and "end" (the character offsets of the entity in the text).
+
+  See Also
+  --------
+  entity_spans, gene_protein_chemical_batch
+
+  """
+
+  tasks = _entity_models(gene, protein, chemical)
+  if len(tasks) == 0:
+    for text in texts:
+      yield []
+    return
+
+  # tokenize every text once (all the components of the first model are disabled)
+  first = model_registry.registry.get(tasks[0][1])
+  tokenized = first.pipe(texts, batch_size = batch_size, n_process = n_process, disable = first.pipe_names)
+
+  # each entity recognizer reads its own copy of the tokens, in step with the others
+  streams = itertools.tee(tokenized, len(tasks))
+  docStreams = []
+  for (key, model, label), stream in zip(tasks, streams):
+    nlp = model_registry.registry.get(model)
+    docStreams.append(nlp.get_pipe('ner').pipe(_token_copies(nlp, stream), batch_size = batch_size))
+
+  for docs in zip(*docStreams):
+    spans = []
+    for (key, model, label), doc in zip(tasks, docs):
+      spans.extend({'text': entity.text, 'label': entity.label_, 'start': entity.start_char, 'end': entity.end_char}
+                   for entity in doc.ents if entity.label_ == label)
+    yield sorted(spans, key = lambda span: (span['start'], span['end']))
+
+
+def entity_spans(text, gene = 1, protein = 1, chemical = 1):
+  """Recognize genes, proteins, and drugs in a string with one shared tokenization, as labeled spans with character offsets.
+
+  Parameters
+  ----------
+  text : str
+      A single string.
+  gene : int, optional
+      Recognize genes ("GGP"), by default 1.
+  protein : int, optional
+      Recognize proteins ("PROTEIN"), by default 1.
+  chemical : int, optional
+      Recognize simple chemicals ("SIMPLE_CHEMICAL"), by default 1.
+
+  Returns
+  -------
+  list
+      Return a list of dictionaries with the keys "text", "label", "start" and "end", ordered by position. See entity_spans_batch.
+
+  Examples
+  --------
+  Import the module
+  
+  >>> from biomarker_nlp import biomarker_extraction
+  
+  Example
+  
+  >>> txt = "Patients with EGFR or ALK genomic tumor aberrations should have disease progression on FDA-approved therapy for NSCLC harboring these aberrations prior to receiving TECENTRIQ."
+  >>> biomarker_extraction.entity_spans(text = txt, gene= 1, protein = 1, chemical = 0)
+  [{'text': 'EGFR', 'label': 'GGP', 'start': 14, 'end': 18}, {'text': 'EGFR', 'label': 'PROTEIN', 'start': 14, 'end': 18}, {'text': 'ALK genomic', 'label': 'GGP', 'start': 22, 'end': 33}, {'text': 'TECENTRIQ', 'label': 'PROTEIN', 'start': 165, 'end': 174}]
+
+  """
+
+  return next(entity_spans_batch([text], gene = gene, protein = protein, chemical = chemical, batch_size = 1))
+
+
+def sent_subtree(text, doc = None, phrases_only = False):
   """Extract the subtree of the patterns 'in combination with' and 'used with' based on dependency parsing. 
 
-  The function uses pattern match to recognize two patterns ('in combination with' and 'used with') from a sentence. Once such a pattern is recognized, the sentence is parsed as a dependency tree by scispacy's nlp_bionlp13cg model which is based on Stanford Dependency Converter. The "combination" or "used" is used as a headword to extract its subtree. 
+  The function uses pattern match to recognize two patterns ('in combination with' and 'used with') from a sentence. Once such a pattern is recognized, the sentence is parsed as a dependency tree by scispacy's nlp_bionlp13cg model which is based on Stanford Dependency Converter. The "combination" or "used" is used as a headword to extract its subtree. Only the parser of the model runs, and only on sentences with one of the patterns. 
+  By default, as in earlier versions, every token of the sentence that contains "combination" or "used" is a headword, including those outside the patterns (e.g. "used" in "should be used with caution"). With phrases_only, only the headwords of the patterns themselves are used, which are found with a spacy Matcher that is compiled once; this returns fewer subtrees for some sentences. A Doc that was already parsed earlier in the pipeline can be given to skip the parse.
 
   Parameters
   ----------
   text : str
       A single sentence.
+  doc : spacy.tokens.Doc, optional
+      The sentence already parsed by a model with a dependency parser, by default None.
+      If None, the sentence is parsed by nlp_bionlp13cg when one of the patterns is present.
+  phrases_only : bool, optional
+      Only use the headwords of the patterns, by default False.
 
   Returns
   -------
@@ -391,37 +829,108 @@ def sent_subtree(text):
 
   """
 
-  # pattern match
-  patterns = [r'\b(?i)'+'in combination with'+r'\b',
-          r'\b(?i)'+'used with'+r'\b']
-
-  subPatterns = ['combination', 'used']
-
   schemes = []
-  doc = nlp_bionlp13cg(text)
-  flag = 0
   # if no pattern present in sentence
-  for pat in patterns:
-      
-      if re.search(pat, text) != None:
-          flag = 1
-          break
+  if COMBINATION_PATTERN.search(text) is None:
+    return schemes
+  if doc is None:
+    doc = _combination_parse(text, ['parser'])
 
-  if flag == 0:
-      return schemes
+  # the subtree of each headword
+  for token in _combination_heads(doc, phrases_only):
+    subtree = [t.text for t in token.subtree]
+    subtreeSent = ' '.join(word for word in subtree)
+    schemes.append(subtreeSent)
+  return schemes
 
-  # iterating over sentence tokens
-  for token in doc:
 
-      for pat in subPatterns:
-              
-          # if we get a pattern match
-          if re.search(pat, token.text) != None:
+def combination_drugs(text, doc = None, phrases_only = False, single_pass = False):
+  """Extract the drugs used in combination with the therapy, e.g. 'cobimetinib' and 'vemurafenib' in 'in combination with cobimetinib and vemurafenib'.
 
-              subtree = [t.text for t in token.subtree]
-              subtreeSent = ' '.join(word for word in subtree)
-              schemes.append(subtreeSent)
-  return schemes  
+  By default, as the extraction program did before, the subtrees of sent_subtree are joined and the simple chemicals ("SIMPLE_CHEMICAL") that gene_protein_chemical recognizes in them are returned.
+  With single_pass, the sentence is parsed once by scispacy's nlp_bionlp13cg model, with its dependency parser and its entity recognizer, and the simple chemicals recognized in the whole sentence that start inside a subtree are returned, so the subtrees are not run through NER again. This is faster, but the entities are recognized in the context of the whole sentence instead of the joined subtrees, so the drugs can differ for some sentences.
+
+  Parameters
+  ----------
+  text : str
+      A single sentence.
+  doc : spacy.tokens.Doc, optional
+      The sentence already processed by nlp_bionlp13cg's parser (and, with single_pass, its entity recognizer), by default None.
+  phrases_only : bool, optional
+      Only use the subtrees of the headwords of the patterns, see sent_subtree, by default False.
+  single_pass : bool, optional
+      Read the drugs from the entities of the whole sentence, by default False.
+
+  Returns
+  -------
+  list
+      Return a list of unique drugs in the order they appear. If there is no combination pattern, return an empty list.
+
+  See Also
+  --------
+  sent_subtree
+
+  Examples
+  --------
+  Import the module
+  
+  >>> from biomarker_nlp import biomarker_extraction
+  
+  Example
+  
+  >>> txt = "TECENTRIQ, in combination with cobimetinib and vemurafenib, is indicated for the treatment of patients with BRAF V600 mutation-positive unresectable or metastatic melanoma."
+  >>> biomarker_extraction.combination_drugs(text = txt)
+  ['cobimetinib', 'vemurafenib']
+
+  """
+
+  drugs = []
+  if COMBINATION_PATTERN.search(text) is None:
+    return drugs
+
+  if not single_pass:
+    subTree = sent_subtree(text, doc = doc, phrases_only = phrases_only)
+    if len(subTree) > 0:
+      subTreeConca = ' '.join(tree for tree in subTree)
+      for drug in gene_protein_chemical(text = subTreeConca, gene = 0, protein = 0, chemical = 1).get('chemical'):
+        if drug not in drugs:
+          drugs.append(drug)
+    return drugs
+
+  if doc is None:
+    doc = _combination_parse(text, ['parser', 'ner'])
+  for token in _combination_heads(doc, phrases_only):
+    subtree = set(t.i for t in token.subtree)
+    for entity in doc.ents:
+      if entity.label_ == 'SIMPLE_CHEMICAL' and entity.start in subtree and entity.text not in drugs:
+        drugs.append(entity.text)
+  return drugs
+
+
+def _combination_parse(text, keep):
+  # run only the components in keep of nlp_bionlp13cg
+  nlp = model_registry.registry.get(model_registry.CHEMICAL_MODEL)
+  return nlp(text, disable = model_registry.registry.disabled(model_registry.CHEMICAL_MODEL, keep))
+
+
+def _combination_heads(doc, phrases_only = False):
+  # the headwords ('combination' or 'used') in the Doc: every token that contains one, or with phrases_only those of the patterns, with a Matcher compiled once per vocabulary
+  if not phrases_only:
+    return [token for token in doc for headword in COMBINATION_HEADWORDS if headword in token.text]
+
+  from spacy.matcher import Matcher
+  vocab, matcher = _combinationMatchers.get(id(doc.vocab), (None, None))
+  if vocab is not doc.vocab:
+    matcher = Matcher(doc.vocab)
+    matcher.add('COMBINATION', None, *COMBINATION_PHRASES)
+    _combinationMatchers[id(doc.vocab)] = (doc.vocab, matcher)
+
+  heads = []
+  for matchId, start, end in matcher(doc):
+    head = doc[start + 1] if end - start == 3 else doc[start]
+    if head.i not in [h.i for h in heads]:
+      heads.append(head)
+  return heads
 
 
 def is_firstline(text, medicine, disease):
@@ -577,6 +1086,32 @@ def is_metastatic(text, disease):
     return False
 
 
+def therapy_links(page):
+  """Extract the targeted therapies' links from a parsed targeted therapies fact sheet.
+
+  The same as targeted_therapy_url, for a page that was already downloaded and parsed, e.g. by crawler.
+
+  Parameters
+  ----------
+  page : lxml.html.HtmlElement
+      The parsed fact sheet.
+
+  Returns
+  -------
+  list
+      Return a list of targeted therapies' URL links.
+
+  See Also
+  --------
+  targeted_therapy_url
+  """
+
+  # get the links of FDA-approved targeted therapies
+  therapy_links = page.xpath("//section[h2[@id = 'what-targeted-therapies-have-been-approved-for-specific-types-of-cancer']]//p//a/@href")
+
+  return therapy_links
+
+
 def targeted_therapy_url(url):
   """Extract the targeted therapies' link from NCI page.
 
@@ -606,13 +1141,16 @@ def targeted_therapy_url(url):
 
   """
   
-  rp = requests.get(url)
-  page = lxml.html.fromstring(rp.text)
+  page = lxml.html.fromstring(http_cache.fetch(url))
 
-  # get the links of FDA-approved targeted therapies
-  therapy_links = page.xpath("//section[h2[@id = 'what-targeted-therapies-have-been-approved-for-specific-types-of-cancer']]//p//a/@href")
+  return therapy_links(page)
 
-  return therapy_links
+
+def _therapy_name(therPage):
+  # extract the therapy's name
+  therapy_name = therPage.xpath("//article/div/h1/text()")
+
+  return therapy_name
 
 
 def targeted_therapy_name(url):
@@ -645,13 +1183,46 @@ def targeted_therapy_name(url):
 
 
   # get the targeted therapy URL and parse it
-  therRp = requests.get(url)
-  therPage = lxml.html.fromstring(therRp.text)
+  therPage = lxml.html.fromstring(http_cache.fetch(url))
 
-  # extract the therapy's name
-  therapy_name = therPage.xpath("//article/div/h1/text()")
+  return _therapy_name(therPage)
 
-  return therapy_name
+
+def _therapy_diseases(therPage):
+  # extract the corresponding diseases (only for bold text, note that there are a few non-bold diseases left)
+  diseases = therPage.xpath("//article//div[h2[contains(text(),'Use in Cancer')]]/ul/li/strong")
+
+  # clear (remove punctuations)
+  punc = '''!()-[]{};:'"\, <>./?@#$%^&*_~'''
+  diseaseList = []
+
+  for disease in diseases:
+      
+    # get the disease in string
+    # remove punctuation at the end of the disease
+    dis = str(disease.text_content())
+    if dis[-1] in punc:
+      dis = dis.replace(dis[-1], "")  
+      
+    # add the diseases to the list
+    diseaseList.append(dis)
+          
+  # remove duplicates (keep the order of the page)
+  diseaseList = list(dict.fromkeys(diseaseList))
+
+  return diseaseList
+
+
+def _non_bold_diseases(therPage):
+  # the diseases without bold text are the leading words of their list item, up to the first qualifier
+  items = therPage.xpath("//article//div[h2[contains(text(),'Use in Cancer')]]/ul/li[not(strong)]")
+  diseaseList = []
+  for item in items:
+    dis = re.split(r"\s+(?:that|in|whose|with|who|which)\s+|[,.:;(]", (item.text or "").strip())[0].strip()
+    if dis:
+      diseaseList.append(dis)
+
+  return diseaseList
 
 
 def therapy_disease(url):
@@ -683,31 +1254,16 @@ def therapy_disease(url):
   """
   
   # get the targeted therapy URL and parse it
-  therRp = requests.get(url)
-  therPage = lxml.html.fromstring(therRp.text)
+  therPage = lxml.html.fromstring(http_cache.fetch(url))
 
-  # extract the corresponding diseases (only for bold text, note that there are a few non-bold diseases left)
-  diseases = therPage.xpath("//article//div[h2[contains(text(),'Use in Cancer')]]/ul/li/strong")
+  return _therapy_diseases(therPage)
 
-  # clear (remove punctuations)
-  punc = '''!()-[]{};:'"\, <>./?@#$%^&*_~'''
-  diseaseList = []
+def _dailymed_links(therPage):
+  # obtain DailyMed link
+  dailyMed = therPage.xpath("//article//div/p/a[text() = 'FDA label information for this drug is available at DailyMed.']/@href")
 
-  for disease in diseases:
-      
-    # get the disease in string
-    # remove punctuation at the end of the disease
-    dis = str(disease.text_content())
-    if dis[-1] in punc:
-      dis = dis.replace(dis[-1], "")  
-      
-    # add the diseases to the list
-    diseaseList.append(dis)
-          
-  # remove duplicates
-  diseaseList = list(set(diseaseList))
+  return dailyMed
 
-  return diseaseList
 
 def drug_search_url(url):
   """Extract the URL link about the search outcome of drug label information. DailyMed URL link (drug information vs multiple research results).
@@ -741,10 +1297,155 @@ def drug_search_url(url):
   """
 
   # get the targeted therapy URL and parse it
-  therRp = requests.get(url)
-  therPage = lxml.html.fromstring(therRp.text)
+  therPage = lxml.html.fromstring(http_cache.fetch(url))
 
-  # obtain DailyMed link
-  dailyMed = therPage.xpath("//article//div/p/a[text() = 'FDA label information for this drug is available at DailyMed.']/@href")
+  return _dailymed_links(therPage)
+
+
+def drug_info_links(searchPage):
+  """Extract the URL links to the drug information pages listed on a parsed DailyMed search result page.
+
+  The same as drug_info_url, for a page that was already downloaded and parsed, e.g. by crawler.
+
+  Parameters
+  ----------
+  searchPage : lxml.html.HtmlElement
+      The parsed DailyMed search result page.
+
+  Returns
+  -------
+  list
+      Return a list of DailyMed drug information URL links.
+
+  See Also
+  --------
+  drug_info_url
+  """
+
+  # multiple drug search page, get each drug link
+  drugInfoLinks = []
+  searchResults = searchPage.xpath("//div[@class = 'results-info']")
+  for result in searchResults:
+    dailyMedDrugURL = result.xpath(".//a[@class='drug-info-link']/@href")
+
+    # check it is a link to drug information page
+    if len(dailyMedDrugURL) > 0 and 'dailymed/drugInfo' in dailyMedDrugURL[0]:
+      drugInfoLinks.append('https://dailymed.nlm.nih.gov' + dailyMedDrugURL[0])
+
+  return drugInfoLinks
+
+
+def drug_info_url(url):
+  """Extract the URL links to the drug information pages listed on a DailyMed search result page.
+
+  When the DailyMed link on the therapy's NCI page is a search for the drug (it contains 'dailymed/search'), the page lists one result for each label of the drug. Extract the link to the drug information page of every result. 
+
+  Parameters
+  ----------
+  url : str
+      An URL link to a DailyMed search result page.
+
+  Returns
+  -------
+  list
+      Return a list of DailyMed drug information URL links.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import biomarker_extraction
+  
+  Example
+  
+  >>> url = "https://dailymed.nlm.nih.gov/dailymed/search.cfm?labeltype=all&query=BEVACIZUMAB&pagesize=20&page=1"
+  >>> biomarker_extraction.drug_info_url(url = url)[0]
+  'https://dailymed.nlm.nih.gov/dailymed/drugInfo.cfm?setid=939b5d1f-9fb2-4499-80ef-0607aa6b114e'
+
+  See Also
+  --------
+  drug_search_url
+  """
+
+  # get the DailyMed search URL and parse it
+  searchPage = lxml.html.fromstring(http_cache.fetch(url))
+
+  return drug_info_links(searchPage)
+
+
+def nci_drug_record(url, nonBold = False):
+  """Extract the therapy's name, associated diseases and DailyMed link from a single download of its NCI page.
+
+  The NCI page is requested and parsed once, and the results of targeted_therapy_name, therapy_disease and drug_search_url are read from the same tree. 
+  By default, the diseases are those of therapy_disease (in bold text). If nonBold is True, the diseases of the 'Use in Cancer' list that are not in bold text are added. For these, the leading words of the list item are taken, up to the first qualifier such as "that" or "in" or a punctuation mark.
+
+  Parameters
+  ----------
+  url : str
+      An URL link to a targeted therapy's NCI page.
+  nonBold : bool, optional
+      Add the diseases that are not in bold text, by default False.
+
+  Returns
+  -------
+  dic
+      Return a dictionary with the keys "url", "name" (the therapy's name, or a zero-length string ("") if it is not found), "diseases" (a list of disease's name, the bold ones first, in the order they appear) and "dailyMed" (a list with the DailyMed URL link, if there is one).
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import biomarker_extraction
+  
+  Example
+  
+  >>> url = "https://www.cancer.gov/about-cancer/treatment/drugs/atezolizumab"
+  >>> biomarker_extraction.nci_drug_record(url = url)
+  {'url': 'https://www.cancer.gov/about-cancer/treatment/drugs/atezolizumab', 'name': 'Atezolizumab', 'diseases': ['Breast cancer', 'Urothelial carcinoma', 'Non-small cell lung cancer', 'Hepatocellular carcinoma', 'Melanoma', 'Small cell lung cancer'], 'dailyMed': ['https://dailymed.nlm.nih.gov/dailymed/drugInfo.cfm?setid=6fa682c9-a312-4932-9831-f286908660ee&audience=consumer']}
+
+  See Also
+  --------
+  targeted_therapy_name, therapy_disease, drug_search_url
+  """
+
+  # get the targeted therapy URL and parse it
+  therPage = lxml.html.fromstring(http_cache.fetch(url))
+
+  return nci_record(url, therPage, nonBold = nonBold)
+
+
+def nci_record(url, therPage, nonBold = False):
+  """Extract the therapy's name, associated diseases and DailyMed link from its parsed NCI page.
+
+  The same as nci_drug_record, for a page that was already downloaded and parsed, e.g. by crawler.
+
+  Parameters
+  ----------
+  url : str
+      The URL link of the NCI page, returned as "url".
+  therPage : lxml.html.HtmlElement
+      The parsed NCI page.
+  nonBold : bool, optional
+      Add the diseases that are not in bold text, by default False.
+
+  Returns
+  -------
+  dic
+      Return a dictionary with the keys "url", "name", "diseases" and "dailyMed", see nci_drug_record.
+
+  See Also
+  --------
+  nci_drug_record
+  """
 
-  return dailyMed
\ No newline at end of file
+  therName = _therapy_name(therPage)
+  diseaseList = _therapy_diseases(therPage)
+  if nonBold:
+    for dis in _non_bold_diseases(therPage):
+      if dis.lower() not in [d.lower() for d in diseaseList]:
+        diseaseList.append(dis)
+
+  return {'url': url,
+          'name': therName[0] if len(therName) > 0 else "",
+          'diseases': diseaseList,
+          'dailyMed': _dailymed_links(therPage)}
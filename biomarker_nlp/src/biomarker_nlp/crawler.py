@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import concurrent.futures
+from urllib.parse import urlparse
+import aiohttp
+import lxml.html
+from biomarker_nlp import http_cache
+from biomarker_nlp import http_session
+from biomarker_nlp import biomarker_extraction
+
+FACT_SHEET_URL = "https://www.cancer.gov/about-cancer/treatment/types/targeted-therapies/targeted-therapies-fact-sheet"
+WEB_GOV = 'https://www.cancer.gov'
+
+class Crawler:
+  """Concurrent crawler of the targeted therapies fact sheet, the therapies' NCI pages and their DailyMed labels.
+
+  The crawl resolves the whole graph that the extraction program walks one page at a time: the therapy links on the fact sheet, the name, diseases and DailyMed link on each therapy's NCI page, the drug information links on every DailyMed search result page and finally the label pages themselves.
+  All the pages of one level are requested together, with at most perHostLimit requests in flight to the same host. Requests share the per-host rate limit and the retry policy (429 and 5xx with exponential backoff) of http_session. Pages go through the default HTTPCache of http_cache (or the given cache), so a cached page is not requested again.
+
+  Parameters
+  ----------
+  perHostLimit : int, optional
+      The maximum number of concurrent requests to one host, by default 4.
+  cache : HTTPCache, optional
+      The cache to use, by default None. If None, the default cache of http_cache is used (if it was set).
+  timeout : int, optional
+      The number of seconds before a request is abandoned, by default 60.
+
+  Attributes
+  ----------
+  errors : list
+      A list of (URL link, exception) for the pages that could not be requested, or that are not in an offline cache. These pages are skipped.
+
+  See Also
+  --------
+  crawl
+  """
+
+  def __init__(self, perHostLimit = 4, cache = None, timeout = 60):
+    self.perHostLimit = perHostLimit
+    self.cache = cache
+    self.timeout = timeout
+    self.errors = []
+    self._hostLimits = {}
+
+  def _host_limit(self, url):
+    host = urlparse(url).netloc
+    if host not in self._hostLimits:
+      self._hostLimits[host] = asyncio.Semaphore(self.perHostLimit)
+    return self._hostLimits[host]
+
+  async def fetch(self, session, url):
+    """Return the text of the page at the URL link, or None if it could not be requested."""
+
+    cache = self.cache if self.cache is not None else http_cache.default_cache
+    headers = {}
+    if cache is not None:
+      try:
+        text = cache.cached(url)
+      except LookupError as e:
+        # offline and not cached: skip the page, as a page that could not be requested
+        self.errors.append((url, e))
+        return None
+      if text is not None:
+        return text
+      headers = cache.revalidation_headers(url)
+
+    for retry in range(http_session.RETRIES + 1):
+      delay = http_session.BACKOFF_FACTOR * 2 ** retry
+      await http_session.rate_limiter.async_wait(url)
+      try:
+        async with self._host_limit(url):
+          async with session.get(url, headers = headers) as rp:
+            # retry 429 and 5xx responses with exponential backoff (or as long as the server asks)
+            if rp.status in http_session.RETRY_STATUS and retry < http_session.RETRIES:
+              retryAfter = rp.headers.get('Retry-After', '')
+              if retryAfter.isdigit():
+                delay = max(delay, int(retryAfter))
+            else:
+              content = await rp.read()
+              if cache is not None:
+                return cache.update(url, rp.status, rp.headers, content)
+              return http_cache.decode(content, http_cache.page_encoding(rp.headers, content))
+      except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        if retry == http_session.RETRIES:
+          self.errors.append((url, e))
+          return None
+      await asyncio.sleep(delay)
+
+  async def _page(self, session, url):
+    text = await self.fetch(session, url)
+    if text is None:
+      return None
+    return lxml.html.fromstring(text)
+
+  async def label_pages(self, session, dailyMedURL):
+    """Return the LabelPage of a DailyMed drug information link, or of every label listed on a DailyMed search result link."""
+
+    # make sure the dailymed url is valid
+    dailyMedResult = urlparse(dailyMedURL)
+    if not all([dailyMedResult.scheme, dailyMedResult.netloc, dailyMedResult.path]):
+      return []
+
+    # multiple drug selection page
+    if 'dailymed/search' in dailyMedURL:
+      searchPage = await self._page(session, dailyMedURL)
+      if searchPage is None:
+        return []
+      drugInfoURLs = biomarker_extraction.drug_info_links(searchPage)
+    elif 'dailymed/drugInfo' in dailyMedURL:
+      drugInfoURLs = [dailyMedURL]
+    else:
+      return []
+
+    htmls = await asyncio.gather(*[self.fetch(session, u) for u in drugInfoURLs])
+    return [biomarker_extraction.LabelPage(u, html = h) for u, h in zip(drugInfoURLs, htmls) if h is not None]
+
+  async def crawl(self, url = FACT_SHEET_URL):
+    """Crawl the fact sheet at the URL link. See crawl."""
+
+    timeout = aiohttp.ClientTimeout(total = self.timeout)
+    connector = aiohttp.TCPConnector(limit_per_host = self.perHostLimit)
+    async with aiohttp.ClientSession(timeout = timeout, connector = connector) as session:
+
+      # get the links of FDA-approved targeted therapies
+      factSheet = await self._page(session, url)
+      if factSheet is None:
+        return []
+      links = []
+      for i in biomarker_extraction.therapy_links(factSheet):
+        # make sure the URL is complete and valid
+        link = i if WEB_GOV in i else WEB_GOV + i
+        result = urlparse(link)
+        if all([result.scheme, result.netloc, result.path]) and link not in links:
+          links.append(link)
+
+      # NCI pages
+      therPages = await asyncio.gather(*[self._page(session, link) for link in links])
+      therapies = []
+      therapyNames = []
+      for link, therPage in zip(links, therPages):
+        if therPage is None:
+          continue
+        record = biomarker_extraction.nci_record(link, therPage)
+
+        # check duplicate therapy
+        if record['name'] and record['name'].lower() not in therapyNames:
+          therapyNames.append(record['name'].lower())
+          therapies.append({'therapy': record['name'],
+                            'url': link,
+                            'diseases': record['diseases'],
+                            'dailyMedURL': record['dailyMed'][0] if len(record['dailyMed']) > 0 else None,
+                            'labels': []})
+
+      # DailyMed pages
+      labels = await asyncio.gather(*[self.label_pages(session, t['dailyMedURL']) for t in therapies if t['dailyMedURL']])
+      for therapy, labelPages in zip([t for t in therapies if t['dailyMedURL']], labels):
+        therapy['labels'] = labelPages
+
+    return therapies
+
+
+def crawl(url = FACT_SHEET_URL, perHostLimit = 4, cache = None, timeout = 60):
+  """Crawl the targeted therapies fact sheet, every therapy's NCI page and its DailyMed labels concurrently.
+
+  The whole fact sheet → NCI drug page → DailyMed label graph is resolved with asyncio, at most perHostLimit requests at a time per host, so the crawl takes about as long as the slowest few requests of each level instead of the sum of all of them.
+  Therapies are deduplicated by name in the order they appear on the fact sheet. The parsed label pages are returned as LabelPage objects and can be passed directly to the extraction functions of biomarker_extraction.
+
+  Parameters
+  ----------
+  url : str, optional
+      An URL link to a targeted therapies fact sheet, by default the NCI fact sheet.
+  perHostLimit : int, optional
+      The maximum number of concurrent requests to one host, by default 4.
+  cache : HTTPCache, optional
+      The cache to use, by default None. If None, the default cache of http_cache is used (if it was set).
+  timeout : int, optional
+      The number of seconds before a request is abandoned, by default 60.
+
+  Returns
+  -------
+  list
+      Return a list with one dictionary per therapy. The keys are "therapy" (the name), "url" (the NCI page), "diseases", "dailyMedURL" (None if the NCI page has no DailyMed link) and "labels" (a list of LabelPage).
+
+  Notes
+  -----
+  The function starts its own event loop. In a notebook, where an event loop is already running, that loop runs in another thread, so the function can be called the same way; ``await Crawler().crawl(url)`` also works there.
+
+  Examples
+  --------
+  Install the necessary package
+
+  >>> # If using Colab Notebook, use !pip
+  $ pip install aiohttp
+
+  Import the module
+
+  >>> from biomarker_nlp import crawler, biomarker_extraction
+
+  Example
+
+  >>> therapies = crawler.crawl(perHostLimit = 4)
+  >>> therapies[0]['therapy'], therapies[0]['diseases'][:2]
+  ('Atezolizumab', ['Breast cancer', 'Urothelial carcinoma'])
+  >>> labelPage = therapies[0]['labels'][0]
+  >>> biomarker_extraction.drug_brand_label(dailyMedURL = labelPage)
+  'TECENTRIQ- atezolizumab injection, solution'
+
+  """
+
+  crawl = Crawler(perHostLimit = perHostLimit, cache = cache, timeout = timeout).crawl(url)
+  try:
+    asyncio.get_running_loop()
+  except RuntimeError:
+    return asyncio.run(crawl)
+  # an event loop is already running (e.g. in a notebook), and asyncio.run cannot be called from it
+  with concurrent.futures.ThreadPoolExecutor(max_workers = 1) as executor:
+    return executor.submit(asyncio.run, crawl).result()
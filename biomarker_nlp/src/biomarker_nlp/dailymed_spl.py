@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import re
+import zipfile
+from urllib.parse import urlparse, parse_qs
+from lxml import etree
+from biomarker_nlp import http_cache
+from biomarker_nlp import heading_match
+
+V3 = '{urn:hl7-org:v3}'
+NS = {'v3': 'urn:hl7-org:v3'}
+SPL_SERVICE_URL = 'https://dailymed.nlm.nih.gov/dailymed/services/v2/spls/%s.xml'
+NDC_CODE_SYSTEM = '2.16.840.1.113883.6.69'
+INDICATIONS_AND_USAGE = '34067-9'
+SECTION_CODES = {'BOXED WARNING': '34066-1',
+                 'INDICATIONS AND USAGE': INDICATIONS_AND_USAGE,
+                 'INDICATIONS & USAGE': INDICATIONS_AND_USAGE,
+                 'DOSAGE AND ADMINISTRATION': '34068-7',
+                 'DOSAGE FORMS AND STRENGTHS': '43678-2',
+                 'CONTRAINDICATIONS': '34070-3',
+                 'WARNINGS AND PRECAUTIONS': '43685-7',
+                 'ADVERSE REACTIONS': '34084-4',
+                 'USE IN SPECIFIC POPULATIONS': '43684-0',
+                 'DESCRIPTION': '34089-3',
+                 'CLINICAL PHARMACOLOGY': '34090-1',
+                 'CLINICAL STUDIES': '34092-7'} # LOINC codes of the SPL sections
+
+def _clean(element):
+  # text content of an element on a single line
+  return re.sub(r'\s+', ' ', element.xpath('string()')).strip()
+
+
+def _title(section):
+  title = section.find('v3:title', NS)
+  if title is None:
+    return ""
+  return _clean(title)
+
+
+def _code(section):
+  code = section.find('v3:code', NS)
+  if code is None:
+    return None
+  return code.get('code')
+
+
+def _product_label(product):
+  # DailyMed's label format: brand name, generic name and dosage form
+  name = product.find('v3:name', NS)
+  generic = product.find('v3:asEntityWithGeneric/v3:genericMedicine/v3:name', NS)
+  form = product.find('v3:formCode', NS)
+  drugLabel = _clean(name).upper() if name is not None else ""
+  if generic is not None:
+    drugLabel += '- ' + _clean(generic).lower()
+  if form is not None and form.get('displayName'):
+    drugLabel += ' ' + form.get('displayName').lower()
+  return drugLabel
+
+
+def _section_lines(section):
+  # the text of a section (without its title), one paragraph or list item per line, followed by its subsections
+  lines = []
+  for child in section:
+    tag = etree.QName(child).localname if isinstance(child.tag, str) else ''
+    if tag == 'text':
+      for block in child:
+        if not isinstance(block.tag, str):
+          continue
+        if etree.QName(block).localname == 'list':
+          lines.extend(_clean(item) for item in block.findall('v3:item', NS))
+        else:
+          lines.append(_clean(block))
+    elif tag == 'component':
+      for subsection in child.findall('v3:section', NS):
+        title = _title(subsection)
+        if title:
+          lines.append(title)
+        lines.extend(_section_lines(subsection))
+  return [line for line in lines if line]
+
+
+def _page_text(title, lines):
+  # the text of a section laid out as the text content of its DailyMed page: the title, then a paragraph or list item per line
+  if title:
+    lines = [title] + lines
+  return '\n'.join(lines)
+
+
+class SPLLabel:
+  """A drug label in DailyMed's Structured Product Labeling (SPL) XML format.
+
+  SPLLabel exposes the same extraction methods as LabelPage (brand_label, ndc_code, section_content and disease_content), so a label read from a downloaded SPL archive can be given to disease_content, section_content, drug_brand_label and ndc_code of biomarker_extraction in place of a DailyMed URL link.
+  The XML is read once with lxml.etree.iterparse. Every top-level section is stored as text with its LOINC code, title and subsections as soon as it has been read, and its elements are then cleared, so memory stays flat on huge labels.
+  Sections are located by their LOINC codes (see SECTION_CODES) and the subsections of a section by the document structure. The text is laid out as on the DailyMed page, so both give the same contents to the extraction functions: paragraphs, list items and subheadings one per line (the page can also have blank lines between its subsections), and a disease subsection without its subheading starts with the line break that followed it.
+
+  Parameters
+  ----------
+  xml : bytes, str or file
+      The SPL XML document of the label, or a binary file object to read it from.
+
+  Attributes
+  ----------
+  setid : str
+      The set id of the label, which is shared by all the versions of the label.
+  version : int
+      The version number of the label.
+  sections : list
+      The top-level sections in document order. Each section is a dictionary with the keys "code" (the LOINC code), "title", "lines" and "subsections" (a list of dictionaries with the keys "code", "title" and "lines").
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import dailymed_spl, biomarker_extraction
+
+  Example
+
+  >>> label = dailymed_spl.SPLLabel(open('/path/to/label.xml', 'rb'))
+  >>> biomarker_extraction.drug_brand_label(dailyMedURL = label)
+  'AVASTIN- bevacizumab injection, solution'
+  >>> label.section_content('34066-1') # boxed warning
+  >>> label.section_content('BOXED WARNING')
+
+  """
+
+  def __init__(self, xml):
+    if isinstance(xml, str):
+      xml = xml.encode('utf-8')
+    if isinstance(xml, bytes):
+      xml = io.BytesIO(xml)
+    self.setid = None
+    self.version = None
+    self.sections = []
+    self._brandLabel = ""
+    self._ndcCodes = []
+    self._parse(xml)
+
+  def _parse(self, xmlFile):
+    for event, element in etree.iterparse(xmlFile, events = ('end',), tag = (V3 + 'setId', V3 + 'versionNumber', V3 + 'section')):
+      parent = element.getparent()
+      if element.tag == V3 + 'setId':
+        if parent.tag == V3 + 'document':
+          self.setid = element.get('root')
+        continue
+      if element.tag == V3 + 'versionNumber':
+        if parent.tag == V3 + 'document':
+          self.version = int(element.get('value'))
+        continue
+
+      # only top-level sections are read; their subsections are still in the tree at this point
+      if parent.getparent() is None or parent.getparent().tag != V3 + 'structuredBody':
+        continue
+      self.sections.append({'code': _code(element),
+                            'title': _title(element),
+                            'lines': _section_lines(element),
+                            'subsections': [{'code': _code(sub), 'title': _title(sub), 'lines': _section_lines(sub)}
+                                            for sub in element.findall('v3:component/v3:section', NS)]})
+      self._read_products(element)
+
+      # free the section and everything read before it
+      element.clear()
+      while parent.getprevious() is not None:
+        del parent.getparent()[0]
+
+  def _read_products(self, section):
+    # the drug label and the package NDC codes of the SPL product data elements
+    if not self._brandLabel:
+      for path in ('.//v3:manufacturedProduct/v3:manufacturedProduct', './/v3:manufacturedProduct/v3:manufacturedMedicine'):
+        product = section.find(path, NS)
+        if product is not None:
+          self._brandLabel = _product_label(product)
+          break
+    for code in section.iterfind('.//v3:containerPackagedProduct/v3:code', NS):
+      if code.get('codeSystem') == NDC_CODE_SYSTEM and code.get('code') not in self._ndcCodes:
+        self._ndcCodes.append(code.get('code'))
+
+  def find_sections(self, section):
+    """Return the top-level sections for a LOINC code (e.g. '34067-9') or a section name (e.g. 'INDICATIONS AND USAGE').
+
+    A section name in SECTION_CODES is located by its LOINC code. Any other name is matched against the section titles, case-insensitively.
+    """
+
+    code = section if re.match(r'^\d+-\d$', section) else SECTION_CODES.get(section.upper())
+    if code is not None:
+      found = [s for s in self.sections if s['code'] == code]
+      if len(found) > 0 or code == section:
+        return found
+    return [s for s in self.sections if section.lower() in s['title'].lower()]
+
+  def disease_subsections(self, diseases):
+    """Return the 'INDICATIONS AND USAGE' subsections of each disease, matched in one pass. See disease_subsections of LabelPage."""
+
+    matcher = diseases if isinstance(diseases, heading_match.DiseaseMatcher) else heading_match.DiseaseMatcher(diseases)
+    subsections = [sub for usage in self.find_sections(INDICATIONS_AND_USAGE) for sub in usage['subsections']]
+    matched = matcher.match_headings([sub['title'] for sub in subsections])
+    return {d: [subsections[i] for i in indices] for d, indices in matched.items()}
+
+  def disease_contents(self, diseases, header = False):
+    """Extract the subsection of every disease from the 'INDICATIONS AND USAGE' section in one pass. See disease_contents of biomarker_extraction."""
+
+    contents = {}
+    for disease, subsections in self.disease_subsections(diseases).items():
+      if len(subsections) > 0:
+        # the text as the DailyMed page gives it (see disease_contents of LabelPage): the subheading is taken out of the text, before its line break
+        content = ' '.join(_page_text(subsection['title'], subsection['lines']) for subsection in subsections).strip()
+        if header == False:
+          content = content.replace(subsections[0]['title'], "")
+        contents[disease] = content
+      else: contents[disease] = None
+    return contents
+
+  def disease_content(self, disease, header = False):
+    """Extract subsection for a particular disease from the 'INDICATIONS AND USAGE' section. See disease_content of biomarker_extraction."""
+
+    return self.disease_contents([disease], header = header)[disease]
+
+  def section_content(self, section):
+    """Extract a whole section text content excluding the section heading. See section_content of biomarker_extraction."""
+
+    contents = [_page_text(None, s['lines']) for s in self.find_sections(section)]
+    if len(contents) > 0:
+      return ' '.join(contents).strip()
+    return None
+
+  def brand_label(self):
+    """Extract the drug label in DailyMed's format, e.g. 'AVASTIN- bevacizumab injection, solution'. See drug_brand_label of biomarker_extraction."""
+
+    return self._brandLabel
+
+  def ndc_code(self):
+    """Extract the package NDC code(s) in a string, separated by commas. See ndc_code of biomarker_extraction."""
+
+    return ', '.join(self._ndcCodes)
+
+
+def _read_header(xmlFile):
+  # read the set id and version of an SPL document, stopping as soon as both are found
+  setid, version = None, None
+  for event, element in etree.iterparse(xmlFile, events = ('end',), tag = (V3 + 'setId', V3 + 'versionNumber')):
+    if element.tag == V3 + 'setId':
+      setid = element.get('root')
+    else:
+      version = int(element.get('value'))
+    if setid is not None and version is not None:
+      break
+  return setid, version
+
+
+class SPLArchive:
+  """Read the labels of DailyMed's downloadable SPL ZIP archives from local disk, without network access.
+
+  DailyMed publishes its full SPL catalog as ZIP archives (e.g. dm_spl_release_human_rx_part1.zip) in which each label is an inner ZIP with its XML document and images. Single-label ZIP files and archives of plain XML documents can also be read.
+  When the archive is opened, every member is indexed by the set id and version of its label, reading only the beginning of each XML document. Labels are then read one at a time from the archives in memory, so tens of thousands of labels can be streamed without extracting the archives to disk.
+  When a set id appears in more than one member (e.g. a full release and later updates), only its highest version is kept.
+
+  Parameters
+  ----------
+  paths : str or list
+      The path(s) to the SPL ZIP archive(s).
+
+  Attributes
+  ----------
+  index : dict
+      The set ids mapped to (version, archive path, member name, inner XML name or None).
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import dailymed_spl, biomarker_extraction
+
+  Example
+
+  >>> archive = dailymed_spl.SPLArchive(['/path/to/dm_spl_release_human_rx_part1.zip', '/path/to/dm_spl_release_human_rx_part2.zip'])
+  >>> len(archive)
+  45000
+  >>> for label in archive.labels():
+  ...     indications = biomarker_extraction.section_content(label, section = 'INDICATIONS AND USAGE')
+  >>> label = archive.label('939b5d1f-9fb2-4499-80ef-0607aa6b114e')
+  >>> biomarker_extraction.disease_content(label, disease = 'Cervical Cancer')
+  '\\nAvastin, in combination with paclitaxel and cisplatin or paclitaxel and topotecan, is indicated for the treatment of patients with persistent, recurrent, or metastatic cervical cancer.'
+
+  """
+
+  def __init__(self, paths):
+    if isinstance(paths, str):
+      paths = [paths]
+    self.paths = list(paths)
+    self.index = {}
+    for path in self.paths:
+      with zipfile.ZipFile(path) as archive:
+        for member in archive.namelist():
+          for setid, version, inner in self._member_headers(archive, member):
+            if setid is not None and (setid not in self.index or version > self.index[setid][0]):
+              self.index[setid] = (version, path, member, inner)
+
+  def _member_headers(self, archive, member):
+    lower = member.lower()
+    if lower.endswith('.xml'):
+      with archive.open(member) as fh:
+        setid, version = _read_header(fh)
+      yield setid, version, None
+    elif lower.endswith('.zip'):
+      with zipfile.ZipFile(io.BytesIO(archive.read(member))) as innerArchive:
+        for inner in innerArchive.namelist():
+          if inner.lower().endswith('.xml'):
+            with innerArchive.open(inner) as fh:
+              setid, version = _read_header(fh)
+            yield setid, version, inner
+
+  def __len__(self):
+    return len(self.index)
+
+  def setids(self):
+    """Return the set ids of the labels in the archive(s)."""
+
+    return list(self.index)
+
+  def _label(self, archive, member, inner):
+    if inner is None:
+      with archive.open(member) as fh:
+        return SPLLabel(fh)
+    with zipfile.ZipFile(io.BytesIO(archive.read(member))) as innerArchive:
+      with innerArchive.open(inner) as fh:
+        return SPLLabel(fh)
+
+  def label(self, setid):
+    """Return the SPLLabel of a set id (its highest version)."""
+
+    version, path, member, inner = self.index[setid]
+    with zipfile.ZipFile(path) as archive:
+      return self._label(archive, member, inner)
+
+  def labels(self):
+    """Yield the SPLLabel of every set id, one at a time, reading each archive once in order."""
+
+    for path in self.paths:
+      members = [(member, inner) for version, p, member, inner in self.index.values() if p == path]
+      with zipfile.ZipFile(path) as archive:
+        for member, inner in members:
+          yield self._label(archive, member, inner)
+
+
+def spl_label(dailyMedURL):
+  """Download the SPL XML of a DailyMed drug information link and return its SPLLabel.
+
+  The set id of the link is looked up in DailyMed's web services, so the LOINC-coded sections of the label can be read instead of the HTML page. The request goes through http_cache like every other page.
+
+  Parameters
+  ----------
+  dailyMedURL : str
+      An URL link to a drug's DailyMed information page, with its setid parameter.
+
+  Returns
+  -------
+  SPLLabel
+      Return the label.
+
+  Examples
+  --------
+  >>> label = dailymed_spl.spl_label("https://dailymed.nlm.nih.gov/dailymed/drugInfo.cfm?setid=939b5d1f-9fb2-4499-80ef-0607aa6b114e")
+  >>> biomarker_extraction.section_content(label, section = 'INDICATIONS AND USAGE')
+
+  """
+
+  setid = parse_qs(urlparse(dailyMedURL).query).get('setid')
+  if not setid:
+    raise ValueError("The URL link " + dailyMedURL + " has no setid.")
+  return SPLLabel(http_cache.fetch(SPL_SERVICE_URL % setid[0]))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import csv
+from collections import Counter
+
+GENES = ['ABL1', 'AKT1', 'ALK', 'AR', 'ATM', 'BCL2', 'BCR', 'BRAF', 'BRCA1', 'BRCA2', 'BTK', 'CDK4', 'CDK6', 'CTLA4',
+         'EGFR', 'ERBB2', 'ESR1', 'EZH2', 'FGFR1', 'FGFR2', 'FGFR3', 'FLT3', 'HER2', 'HRAS', 'IDH1', 'IDH2', 'JAK1', 'JAK2',
+         'KIT', 'KRAS', 'MEK', 'MET', 'MTOR', 'NF1', 'NRAS', 'NTRK', 'NTRK1', 'NTRK2', 'NTRK3', 'PDGFRA', 'PDGFRB', 'PIK3CA',
+         'PTEN', 'RET', 'ROS1', 'SMO', 'TP53', 'VEGF', 'VEGFA'] # Oncology biomarker genes matched without an HGNC file
+PROTEIN_WORDS = ['antibody', 'antigen', 'enzyme', 'factor', 'hormone', 'immunoglobulin', 'inhibitor', 'interferon', 'interleukin',
+                 'kinase', 'ligand', 'protein', 'receptor', 'estrogen', 'progesterone', 'tyrosine'] # Words of protein names (lower case)
+DRUG_WORDS = ['chemotherapy', 'platinum', 'fluoropyrimidine', 'anthracycline', 'taxane', 'steroid', 'corticosteroid',
+              'prednisone', 'dexamethasone', 'fulvestrant', 'letrozole', 'anastrozole', 'tamoxifen', 'capecitabine',
+              'fluorouracil', 'gemcitabine', 'pemetrexed', 'cytarabine'] # Drug names without a common stem (lower case)
+DRUG_SUFFIXES = ['mab', 'nib', 'lib', 'parib', 'ciclib', 'degib', 'zomib', 'platin', 'taxel', 'rubicin', 'mycin', 'tecan',
+                 'mustine', 'trexate', 'stat', 'tide', 'leukin', 'cept', 'rolimus', 'tinib', 'zumab', 'ximab'] # Stems of drug names (lower case)
+GENE_SHAPE = re.compile(r'^(?=[A-Z0-9-]*[A-Z])(?=[A-Z0-9-]*\d)[A-Z0-9-]{2,}$') # Upper-case tokens with a digit, e.g. 'HER2', 'V600E', 'PD-L1'
+TOKEN_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9-]*') # Words and symbols; hyphenated names stay one token
+
+def tokenize(text):
+  """Return the words and symbols of a text, e.g. ['PD-L1', 'expression'] for 'PD-L1 expression.'."""
+
+  return TOKEN_PATTERN.findall(text)
+
+
+def load_hgnc(path):
+  """Read the gene symbols and names of a local HGNC file.
+
+  The file is the tab-separated HGNC complete set (e.g. hgnc_complete_set.txt from https://www.genenames.org/download/). The approved symbols, alias symbols and previous symbols are gene symbols; the approved names (e.g. 'epidermal growth factor receptor') are protein names.
+
+  Parameters
+  ----------
+  path : str
+      The HGNC file.
+
+  Returns
+  -------
+  tuple
+      Return the list of gene symbols and the list of names.
+  """
+
+  symbols = []
+  names = []
+  with open(path, 'r', encoding = 'utf-8', newline = '') as fh:
+    for row in csv.DictReader(fh, delimiter = '\t'):
+      for column in ('symbol', 'alias_symbol', 'prev_symbol'):
+        # several symbols are separated by '|'
+        symbols.extend(s.strip('"') for s in (row.get(column) or '').split('|') if len(s.strip('"')) > 1)
+      if row.get('name'):
+        names.append(row['name'])
+  return symbols, names
+
+
+def load_names(path):
+  """Read a list of names, one per line, e.g. drug or protein names. Empty lines and lines starting with '#' are skipped."""
+
+  with open(path, 'r', encoding = 'utf-8') as fh:
+    return [line.strip() for line in fh if line.strip() and not line.startswith('#')]
+
+
+class Gazetteer:
+  """A fast dictionary pre-filter that tells whether a sentence may mention a gene, a protein or a drug.
+
+  Most sentences of an Indications section mention no biomarker at all, but the NER models run on every one of them. A sentence is a candidate if one of its tokens is a gene symbol (case-sensitive) or has the shape of one (upper case with a digit, e.g. 'HER2' or 'V600E'), if it contains a protein or drug name (case-insensitive, one or several words), or if one of its words ends with a drug stem (e.g. '-mab' or '-nib'). gene_protein_chemical and gene_protein_chemical_batch of biomarker_extraction accept a Gazetteer as prefilter and return no entities for the other sentences without running the models.
+  The lists are matched token by token with a dictionary of the first word of every name, so the cost of a sentence does not grow with the size of the lists, and a whole HGNC file can be used.
+
+  In audit mode, the sentences that would be dropped are still run, and the entities found in them are recorded; report tells how much the filter would have missed, so that the lists can be tuned before the filter is turned on.
+
+  Parameters
+  ----------
+  genes : list, optional
+      Gene symbols, by default GENES. See load_hgnc to read a local HGNC file.
+  proteins : list, optional
+      Protein names, by default PROTEIN_WORDS.
+  drugs : list, optional
+      Drug names, by default DRUG_WORDS.
+  suffixes : list, optional
+      Stems that end drug names, by default DRUG_SUFFIXES.
+  shapes : bool, optional
+      Also accept the tokens with the shape of a gene symbol, by default True.
+  audit : bool, optional
+      Run the dropped sentences too and record what they contain, by default False.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import gazetteer, biomarker_extraction
+
+  Example
+
+  >>> genes, names = gazetteer.load_hgnc('/path/to/hgnc_complete_set.txt')
+  >>> prefilter = gazetteer.Gazetteer(genes = genes, proteins = gazetteer.PROTEIN_WORDS + names)
+  >>> prefilter.candidates('Patients with EGFR or ALK genomic tumor aberrations.')
+  [('gene', 'EGFR'), ('gene', 'ALK')]
+  >>> prefilter.has_candidates('This indication is approved under accelerated approval.')
+  False
+  >>> biomarker_extraction.gene_protein_chemical(text = 'This indication is approved under accelerated approval.', prefilter = prefilter)
+  {'gene': [], 'protein': [], 'chemical': []}
+
+  Example (recall audit)
+
+  >>> prefilter = gazetteer.Gazetteer(audit = True)
+  >>> results = list(biomarker_extraction.gene_protein_chemical_batch(sentences, prefilter = prefilter))
+  >>> prefilter.report()
+  {'sentences': 120, 'dropped': 85, 'drop_rate': 0.708, 'with_entities': 31, 'missed_sentences': 2, 'recall': 0.935, 'missed_entities': {'TECENTRIQ': 2}}
+
+  """
+
+  def __init__(self, genes = GENES, proteins = PROTEIN_WORDS, drugs = DRUG_WORDS, suffixes = DRUG_SUFFIXES, shapes = True, audit = False):
+    self.genes = set(genes)
+    self.suffixes = tuple(s.lower() for s in suffixes)
+    self.shapes = shapes
+    self.audit = audit
+    # the names by their first (lower-case) word: {word: [(kind, words), ...]}
+    self._names = {}
+    for kind, names in (('protein', proteins), ('drug', drugs)):
+      for name in names:
+        words = tuple(w.lower() for w in tokenize(name))
+        if len(words) > 0:
+          self._names.setdefault(words[0], []).append((kind, words))
+    self.clear_report()
+
+  def candidates(self, text):
+    """Return the (kind, text) of the candidates found in a text, in order; kind is 'gene', 'protein' or 'drug'.
+
+    Parameters
+    ----------
+    text : str
+        A sentence.
+
+    Returns
+    -------
+    list
+        Return the candidates, or an empty list if the text has none.
+    """
+
+    tokens = tokenize(text)
+    lowers = [t.lower() for t in tokens]
+    found = []
+    end = 0 # the tokens before end are part of a name that was found
+    for i, token in enumerate(tokens):
+      if i < end:
+        continue
+      if token in self.genes or (self.shapes and GENE_SHAPE.match(token)):
+        found.append(('gene', token))
+        continue
+      name = None
+      for kind, words in self._names.get(lowers[i], []):
+        if tuple(lowers[i:i + len(words)]) == words and (name is None or len(words) > len(name[1])):
+          name = (kind, words)
+      if name is not None:
+        found.append((name[0], ' '.join(tokens[i:i + len(name[1])])))
+        end = i + len(name[1])
+      elif len(lowers[i]) > 4 and lowers[i].endswith(self.suffixes):
+        found.append(('drug', token))
+    return found
+
+  def has_candidates(self, text):
+    """Whether the text has at least one candidate (see candidates); the sentences without any are not run by the NER models."""
+
+    return len(self.candidates(text)) > 0
+
+  def record(self, text, geneProteinChemicalDic, kept):
+    """Count a sentence for report. Called by biomarker_extraction with the entities of the sentence and whether the filter kept it."""
+
+    entities = [e for values in geneProteinChemicalDic.values() for e in values]
+    self.sentences += 1
+    if len(entities) > 0:
+      self.withEntities += 1
+    if not kept:
+      self.dropped += 1
+      if len(entities) > 0:
+        self.missed.append((text, geneProteinChemicalDic))
+        self.missedEntities.update(entities)
+
+  def report(self):
+    """Return what the filter dropped since the Gazetteer was created (or since clear_report).
+
+    Returns
+    -------
+    dict
+        Return the numbers of sentences and dropped sentences, the drop rate, the number of sentences with entities, the number of those that were dropped, the recall of the filter on sentences with entities and the count of every missed entity. The dropped sentences with entities and their entities are in the missed attribute; outside of audit mode, the dropped sentences are not run, so nothing is missed.
+    """
+
+    return {'sentences': self.sentences,
+            'dropped': self.dropped,
+            'drop_rate': round(self.dropped / self.sentences, 3) if self.sentences > 0 else 0.0,
+            'with_entities': self.withEntities,
+            'missed_sentences': len(self.missed),
+            'recall': round(1 - len(self.missed) / self.withEntities, 3) if self.withEntities > 0 else 1.0,
+            'missed_entities': dict(self.missedEntities.most_common())}
+
+  def clear_report(self):
+    """Reset the counts of report."""
+
+    self.sentences = 0
+    self.dropped = 0
+    self.withEntities = 0
+    self.missed = []
+    self.missedEntities = Counter()
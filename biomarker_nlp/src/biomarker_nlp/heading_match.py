@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+
+HYPHENS = '‐‑‒–—−' # Dashes that are written as '-'
+NON_PREFIX = r'(?<!non-)(?<!non )(?<!non)' # A disease is not matched right after 'non', e.g. 'Small Cell' in 'Non-Small Cell'
+
+def normalize_heading(text):
+  """Normalize a section heading or a disease name so that they can be compared.
+
+  The text is lower-cased, its dashes are written as '-', its white space (including tabs and new lines) is collapsed to single spaces and a leading section number (e.g. '1.2') is removed.
+
+  Parameters
+  ----------
+  text : str
+      A section heading or a disease name.
+
+  Returns
+  -------
+  str
+      Return the normalized text.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import heading_match
+
+  Example
+
+  >>> heading_match.normalize_heading('1.2\tNon–Small Cell Lung Cancer')
+  'non-small cell lung cancer'
+
+  """
+
+  text = re.sub('[' + HYPHENS + ']', '-', text.lower())
+  text = re.sub(r'\s+', ' ', text).strip()
+  return re.sub(r'^\d+(\.\d+)*\.?\s', '', text)
+
+
+def heading_matches(disease, heading):
+  """Whether a section heading is about a disease.
+
+  The normalized disease must appear in the normalized heading, but not right after 'non', so that 'Small Cell Lung Cancer' does not match a 'Non-Small Cell Lung Cancer' heading. A disease that starts with 'non' is matched anywhere.
+
+  Parameters
+  ----------
+  disease : str
+      The name of a disease.
+  heading : str
+      A section or subsection heading.
+
+  Returns
+  -------
+  bool
+      Return True if the heading is about the disease, otherwise return False.
+
+  Examples
+  --------
+  >>> heading_match.heading_matches('Small Cell Lung Cancer', '1.2 Non-Small Cell Lung Cancer')
+  False
+  >>> heading_match.heading_matches('Small Cell Lung Cancer', '1.3 Small Cell Lung Cancer')
+  True
+
+  """
+
+  disease = normalize_heading(disease)
+  heading = normalize_heading(heading)
+  if len(disease) == 0:
+    return False
+  if disease.startswith('non'):
+    return disease in heading
+  return re.search(NON_PREFIX + re.escape(disease), heading) is not None
+
+
+def disease_variants(disease):
+  """Return the normalized spellings of a disease name that are searched for in headings.
+
+  Besides the normalized name, the variants are the name without a parenthesized abbreviation (e.g. '(NSCLC)'), with dashes written as spaces, and with a plural last word in the singular (e.g. 'stromal tumors' as 'stromal tumor').
+
+  Parameters
+  ----------
+  disease : str
+      The name of a disease.
+
+  Returns
+  -------
+  list
+      Return a list of unique variants, the normalized name first.
+  """
+
+  names = [normalize_heading(disease), normalize_heading(re.sub(r'\([^)]*\)', ' ', disease))]
+  variants = []
+  for name in names:
+    for variant in [name, name.replace('-', ' ')]:
+      variants.append(variant)
+      if re.search(r'[^siu]s$', variant):
+        variants.append(variant[:-1])
+  return [v for v in dict.fromkeys(variants) if v]
+
+
+class DiseaseMatcher:
+  """An Aho-Corasick automaton of disease names, compiled once and run over each heading in a single pass.
+
+  All the variants of all the diseases (see disease_variants) are searched for at the same time, so matching a heading costs one pass over its characters no matter how many diseases there are.
+  Overlapping matches in a heading are resolved longest first, so a 'Non-Small Cell Lung Cancer' heading belongs to 'Non-Small Cell Lung Cancer' and not to 'Small Cell Lung Cancer'. As in heading_matches, a disease is never matched right after 'non'.
+
+  Parameters
+  ----------
+  diseases : list
+      The names of the diseases, e.g. the diseases of therapy_disease.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import heading_match
+
+  Example
+
+  >>> matcher = heading_match.DiseaseMatcher(['Non-small cell lung cancer', 'Small cell lung cancer', 'Colorectal cancer'])
+  >>> matcher.search('1.2 First-Line Non-Squamous Non–Small Cell Lung Cancer')
+  ['Non-small cell lung cancer']
+  >>> matcher.match_headings(['1.1 Metastatic Colorectal Cancer', '1.2 Non-Small Cell Lung Cancer', '1.3 Small Cell Lung Cancer'])
+  {'Non-small cell lung cancer': [1], 'Small cell lung cancer': [2], 'Colorectal cancer': [0]}
+
+  """
+
+  def __init__(self, diseases):
+    self.diseases = list(dict.fromkeys(diseases))
+    # the trie: transitions, failure links and the (length, disease) of the patterns ending at each state
+    self._goto = [{}]
+    self._fail = [0]
+    self._out = [[]]
+    for disease in self.diseases:
+      for variant in disease_variants(disease):
+        self._add(variant, disease)
+    self._build()
+
+  def _add(self, pattern, disease):
+    state = 0
+    for char in pattern:
+      if char not in self._goto[state]:
+        self._goto.append({})
+        self._fail.append(0)
+        self._out.append([])
+        self._goto[state][char] = len(self._goto) - 1
+      state = self._goto[state][char]
+    self._out[state].append((len(pattern), disease))
+
+  def _build(self):
+    # breadth-first failure links; each state also reports the patterns of its failure state
+    queue = list(self._goto[0].values())
+    while queue:
+      state = queue.pop(0)
+      for char, nextState in self._goto[state].items():
+        queue.append(nextState)
+        fail = self._fail[state]
+        while fail and char not in self._goto[fail]:
+          fail = self._fail[fail]
+        self._fail[nextState] = self._goto[fail].get(char, 0) if self._goto[fail].get(char, 0) != nextState else 0
+        self._out[nextState] = self._out[nextState] + self._out[self._fail[nextState]]
+
+  def _matches(self, text):
+    # every (start, end, disease) found in the text
+    matches = []
+    state = 0
+    for i, char in enumerate(text):
+      while state and char not in self._goto[state]:
+        state = self._fail[state]
+      state = self._goto[state].get(char, 0)
+      for length, disease in self._out[state]:
+        matches.append((i + 1 - length, i + 1, disease))
+    return matches
+
+  def search(self, heading):
+    """Return the diseases a heading is about, in the order of the disease list.
+
+    Parameters
+    ----------
+    heading : str
+        A section or subsection heading.
+
+    Returns
+    -------
+    list
+        Return the matched diseases. Overlapping matches are resolved longest first and matches right after 'non' are skipped.
+    """
+
+    heading = normalize_heading(heading)
+    found = set()
+    taken = []
+    for start, end, disease in sorted(self._matches(heading), key = lambda m: (m[0] - m[1], m[0])):
+      # the same span can be the name of two diseases that are written alike (e.g. 'Melanoma' and 'melanoma')
+      if (start, end) not in taken and any(start < e and s < end for s, e in taken):
+        continue
+      taken.append((start, end))
+      if re.search(r'non[- ]?$', heading[:start]) and not normalize_heading(disease).startswith('non'):
+        continue
+      found.add(disease)
+    return [d for d in self.diseases if d in found]
+
+  def match_headings(self, headings):
+    """Match every heading of a label in one pass and return the headings of each disease.
+
+    Parameters
+    ----------
+    headings : list
+        The section or subsection headings of a label.
+
+    Returns
+    -------
+    dict
+        Return the diseases mapped to the indices of their headings, in document order. A disease without a heading is mapped to an empty list.
+    """
+
+    matched = {d: [] for d in self.diseases}
+    for i, heading in enumerate(headings):
+      for disease in self.search(heading):
+        matched[disease].append(i)
+    return matched
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+from biomarker_nlp import http_session
+
+CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE) # The charset declared in the HTML of a page
+
+def page_encoding(headers, content):
+  """Return the encoding of a page: the charset of its Content-Type header, else the charset declared in its HTML, else 'utf-8'.
+
+  The pages requested with requests (http_cache.fetch) and with aiohttp (crawler) are decoded with this one rule, so a page is cached and served the same way whichever of them requested it.
+
+  Parameters
+  ----------
+  headers : dict
+      The response headers.
+  content : bytes
+      The body of the response.
+
+  Returns
+  -------
+  str
+      Return the name of the encoding.
+  """
+
+  contentType = headers.get('Content-Type') or ''
+  for param in contentType.split(';')[1:]:
+    name, _, value = param.partition('=')
+    if name.strip().lower() == 'charset' and value.strip(' "\''):
+      return value.strip(' "\'')
+  match = CHARSET_PATTERN.search(content[:4096])
+  if match:
+    return match.group(1).decode('ascii')
+  return 'utf-8'
+
+
+def decode(content, encoding):
+  """Return the text of a body in an encoding, or in utf-8 if the encoding is unknown."""
+
+  try:
+    return content.decode(encoding, errors = 'replace')
+  except LookupError:
+    return content.decode('utf-8', errors = 'replace')
+
+
+class HTTPCache:
+  """A persistent on-disk cache of the NCI and DailyMed pages.
+
+  Each page is stored under the SHA-256 hash of its URL link as two files: the body of the response and a small JSON record with its ETag, Last-Modified and download time.
+  A page younger than the time-to-live is served from disk. An older page is revalidated with a conditional request (If-None-Match / If-Modified-Since), so an unchanged page costs a "304 Not Modified" instead of a full download.
+  In offline mode the network is never used: every cached page is served regardless of its age and a page that was never cached raises a LookupError.
+
+  Parameters
+  ----------
+  cacheDir : str, optional
+      The directory where the pages are stored, by default '.biomarker_nlp_cache'. It is created if it does not exist.
+  ttl : int or None, optional
+      The number of seconds a cached page is served without revalidation, by default 86400 (one day).
+      0: always revalidate. None: never revalidate.
+  offline : bool, optional
+      Never use the network, by default False.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import http_cache, biomarker_extraction
+
+  Example (cache every page requested by biomarker_extraction)
+
+  >>> http_cache.set_default_cache(http_cache.HTTPCache(cacheDir = '/path/to/cache', ttl = 7 * 86400))
+  >>> url_nci = "https://www.cancer.gov/about-cancer/treatment/types/targeted-therapies/targeted-therapies-fact-sheet"
+  >>> therapies = biomarker_extraction.targeted_therapy_url(url = url_nci) # downloaded
+  >>> therapies = biomarker_extraction.targeted_therapy_url(url = url_nci) # served from disk
+
+  Example (rerun without network access)
+
+  >>> http_cache.set_default_cache(http_cache.HTTPCache(cacheDir = '/path/to/cache', offline = True))
+
+  """
+
+  def __init__(self, cacheDir = '.biomarker_nlp_cache', ttl = 86400, offline = False):
+    self.cacheDir = cacheDir
+    self.ttl = ttl
+    self.offline = offline
+    os.makedirs(cacheDir, exist_ok = True)
+
+  def _paths(self, url):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    subDir = os.path.join(self.cacheDir, key[:2])
+    return os.path.join(subDir, key + '.body'), os.path.join(subDir, key + '.json')
+
+  def _read(self, url):
+    bodyPath, metaPath = self._paths(url)
+    try:
+      with open(metaPath, 'r', encoding = 'utf-8') as fh:
+        meta = json.load(fh)
+      with open(bodyPath, 'rb') as fh:
+        body = fh.read()
+    except (OSError, ValueError):
+      return None, None
+    return meta, body
+
+  def _write(self, url, meta, body = None):
+    bodyPath, metaPath = self._paths(url)
+    os.makedirs(os.path.dirname(metaPath), exist_ok = True)
+    # write to a temporary file first so a crashed run never leaves a truncated page behind
+    items = [(metaPath, json.dumps(meta).encode('utf-8'))]
+    if body is not None:
+      items.insert(0, (bodyPath, body))
+    for path, data in items:
+      fd, tmpPath = tempfile.mkstemp(dir = os.path.dirname(path))
+      with os.fdopen(fd, 'wb') as fh:
+        fh.write(data)
+      os.replace(tmpPath, path)
+
+  def _is_fresh(self, meta):
+    if self.ttl is None:
+      return True
+    return time.time() - meta['fetched'] < self.ttl
+
+  def cached(self, url):
+    """Return the cached text of the page if it can be served without a request.
+
+    Parameters
+    ----------
+    url : str
+        An URL link to a NCI or DailyMed page.
+
+    Returns
+    -------
+    None or str
+        Return the text of the page if it is fresh, or cached at all in offline mode. 
+        Return None if the page has to be requested (or revalidated).
+    """
+
+    meta, body = self._read(url)
+    if meta is not None and (self.offline or self._is_fresh(meta)):
+      return decode(body, meta['encoding'])
+    if self.offline:
+      raise LookupError("The page " + url + " is not in the cache and the cache is offline.")
+    return None
+
+  def revalidation_headers(self, url):
+    """Return the conditional request headers (If-None-Match / If-Modified-Since) of a cached page, or an empty dict."""
+
+    meta, body = self._read(url)
+    headers = {}
+    if meta is not None:
+      if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+      if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    return headers
+
+  def update(self, url, statusCode, headers, content, encoding = None):
+    """Store a response to a (conditional) request and return the text of the page.
+
+    Parameters
+    ----------
+    url : str
+        An URL link to a NCI or DailyMed page.
+    statusCode : int
+        The HTTP status code of the response.
+    headers : dict
+        The response headers.
+    content : bytes
+        The body of the response.
+    encoding : str, optional
+        The encoding of the body, by default None. If None, it is found with page_encoding.
+
+    Returns
+    -------
+    str
+        Return the text of the page. For "304 Not Modified", the cached text is returned.
+    """
+
+    meta, body = self._read(url)
+    if statusCode == 304 and meta is not None:
+      meta['fetched'] = time.time()
+      self._write(url, meta)
+      return decode(body, meta['encoding'])
+
+    if encoding is None:
+      encoding = page_encoding(headers, content)
+    # only successful responses are kept
+    if statusCode == 200:
+      meta = {'url': url,
+              'etag': headers.get('ETag'),
+              'last_modified': headers.get('Last-Modified'),
+              'encoding': encoding,
+              'fetched': time.time()}
+      self._write(url, meta, content)
+    return decode(content, encoding)
+
+  def fetch(self, url):
+    """Return the text of the page at the URL link, from disk when possible.
+
+    Parameters
+    ----------
+    url : str
+        An URL link to a NCI or DailyMed page.
+
+    Returns
+    -------
+    str
+        Return the text of the page.
+    """
+
+    text = self.cached(url)
+    if text is not None:
+      return text
+
+    # revalidate the cached page, or download the page for the first time
+    rp = http_session.get(url, headers = self.revalidation_headers(url))
+    return self.update(url, rp.status_code, rp.headers, rp.content)
+
+
+default_cache = None
+
+def set_default_cache(cache):
+  """Set the HTTPCache used by every page request in biomarker_nlp.
+
+  Parameters
+  ----------
+  cache : HTTPCache or None
+      The cache to use. None turns caching off, which is the default.
+  """
+
+  global default_cache
+  default_cache = cache
+
+
+def fetch(url):
+  """Return the text of the page at the URL link.
+
+  All the NCI and DailyMed pages requested by biomarker_nlp go through this function. The page is served by the default HTTPCache if one was set with set_default_cache; otherwise it is downloaded through the shared session of http_session.
+
+  Parameters
+  ----------
+  url : str
+      An URL link to a NCI or DailyMed page.
+
+  Returns
+  -------
+  str
+      Return the text of the page.
+  """
+
+  if default_cache is not None:
+    return default_cache.fetch(url)
+  rp = http_session.get(url)
+  return decode(rp.content, page_encoding(rp.headers, rp.content))
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = 10 # Number of keep-alive connections kept per host
+RETRIES = 5 # Number of times a failed request is retried
+BACKOFF_FACTOR = 0.5 # Retries wait BACKOFF_FACTOR * 2 ** (retry - 1) seconds
+RETRY_STATUS = (429, 500, 502, 503, 504)
+RATE_PER_HOST = 5.0 # Requests per second to one host
+BURST_PER_HOST = 5 # Requests that can be sent at once to an idle host
+TIMEOUT = 60
+
+class TokenBucket:
+  """A thread-safe token bucket that limits how fast requests are sent.
+
+  The bucket holds at most burst tokens and gains rate tokens per second. Every request takes one token; when the bucket is empty, the request waits until the next token arrives.
+
+  Parameters
+  ----------
+  rate : float
+      The number of tokens added per second.
+  burst : int
+      The maximum number of tokens in the bucket.
+  """
+
+  def __init__(self, rate, burst):
+    self.rate = rate
+    self.burst = burst
+    self.tokens = burst
+    self.updated = time.monotonic()
+    self._lock = threading.Lock()
+
+  def delay(self):
+    """Take a token and return the number of seconds to wait before the request may be sent."""
+
+    with self._lock:
+      now = time.monotonic()
+      self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+      self.updated = now
+      self.tokens -= 1
+      if self.tokens >= 0:
+        return 0.0
+      return -self.tokens / self.rate
+
+
+class RateLimiter:
+  """One TokenBucket per host, so that each of NCI and DailyMed gets its own request rate.
+
+  Parameters
+  ----------
+  rate : float, optional
+      The number of requests per second to one host, by default RATE_PER_HOST. None turns the limit off.
+  burst : int, optional
+      The number of requests that can be sent at once to an idle host, by default BURST_PER_HOST.
+  """
+
+  def __init__(self, rate = RATE_PER_HOST, burst = BURST_PER_HOST):
+    self.rate = rate
+    self.burst = burst
+    self._buckets = {}
+    self._lock = threading.Lock()
+
+  def _delay(self, url):
+    if self.rate is None:
+      return 0.0
+    host = urlparse(url).netloc
+    with self._lock:
+      if host not in self._buckets:
+        self._buckets[host] = TokenBucket(self.rate, self.burst)
+      bucket = self._buckets[host]
+    return bucket.delay()
+
+  def wait(self, url):
+    """Block until a request to the host of the URL link may be sent."""
+
+    delay = self._delay(url)
+    if delay > 0:
+      time.sleep(delay)
+
+  async def async_wait(self, url):
+    """Wait, without blocking the event loop, until a request to the host of the URL link may be sent."""
+
+    delay = self._delay(url)
+    if delay > 0:
+      await asyncio.sleep(delay)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+  """An HTTPAdapter that waits for the host's rate limit before every attempt of a request, the retries included.
+
+  The retries of urllib3 are sent from inside the adapter, out of reach of the rate limiter, so under throttling (429 and 503), when the limit matters most, they would exceed it. This adapter retries the GET requests itself instead: each attempt takes a token of rate_limiter, after an exponential backoff that honours the Retry-After header of the server.
+
+  Parameters
+  ----------
+  retries : int, optional
+      The number of times a failed request is retried, by default RETRIES.
+  backoffFactor : float, optional
+      Retries wait backoffFactor * 2 ** (retry - 1) seconds, by default BACKOFF_FACTOR.
+  retryStatus : tuple, optional
+      The HTTP status codes that are retried, by default RETRY_STATUS.
+  **kwargs
+      The other parameters of HTTPAdapter, e.g. pool_connections and pool_maxsize.
+  """
+
+  def __init__(self, retries = RETRIES, backoffFactor = BACKOFF_FACTOR, retryStatus = RETRY_STATUS, **kwargs):
+    self.retries = retries
+    self.backoffFactor = backoffFactor
+    self.retryStatus = retryStatus
+    super().__init__(max_retries = 0, **kwargs)
+
+  def send(self, request, **kwargs):
+    for retry in range(self.retries + 1):
+      delay = self.backoffFactor * 2 ** retry
+      rate_limiter.wait(request.url)
+      last = retry == self.retries or request.method != 'GET'
+      try:
+        rp = super().send(request, **kwargs)
+      except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        if last:
+          raise
+      else:
+        if last or rp.status_code not in self.retryStatus:
+          return rp
+        retryAfter = rp.headers.get('Retry-After', '')
+        if retryAfter.isdigit():
+          delay = max(delay, int(retryAfter))
+        rp.close()
+      time.sleep(delay)
+
+
+def make_session(poolSize = POOL_SIZE, retries = RETRIES, backoffFactor = BACKOFF_FACTOR, retryStatus = RETRY_STATUS):
+  """Create a requests session that reuses connections and retries failed requests.
+
+  The session keeps up to poolSize keep-alive connections per host, so consecutive pages from NCI or DailyMed do not pay for a new TCP and TLS handshake. Connection errors and the status codes in retryStatus (429 and 5xx by default) are retried with exponential backoff, honouring the Retry-After header of the server. Every attempt, the retries included, waits for the per-host rate limit (see RateLimitedAdapter).
+
+  Parameters
+  ----------
+  poolSize : int, optional
+      The number of connections kept per host, by default POOL_SIZE.
+  retries : int, optional
+      The number of times a failed request is retried, by default RETRIES.
+  backoffFactor : float, optional
+      Retries wait backoffFactor * 2 ** (retry - 1) seconds, by default BACKOFF_FACTOR.
+  retryStatus : tuple, optional
+      The HTTP status codes that are retried, by default RETRY_STATUS.
+
+  Returns
+  -------
+  requests.Session
+      Return the session.
+  """
+
+  adapter = RateLimitedAdapter(retries = retries, backoffFactor = backoffFactor, retryStatus = retryStatus,
+                               pool_connections = poolSize, pool_maxsize = poolSize)
+  session = requests.Session()
+  session.mount('http://', adapter)
+  session.mount('https://', adapter)
+  return session
+
+
+default_session = None
+rate_limiter = RateLimiter()
+_session_lock = threading.Lock()
+
+def set_default_session(session = None, rate = RATE_PER_HOST, burst = BURST_PER_HOST):
+  """Set the session and the per-host rate limit used by every page request in biomarker_nlp.
+
+  Parameters
+  ----------
+  session : requests.Session, optional
+      The session to use, by default None. If None, a new session is created with make_session.
+  rate : float, optional
+      The number of requests per second to one host, by default RATE_PER_HOST. None turns the limit off.
+  burst : int, optional
+      The number of requests that can be sent at once to an idle host, by default BURST_PER_HOST.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import http_session
+
+  Example (8 connections per host, 10 retries, at most 2 requests per second to each host)
+
+  >>> http_session.set_default_session(http_session.make_session(poolSize = 8, retries = 10), rate = 2)
+
+  """
+
+  global default_session, rate_limiter
+  with _session_lock:
+    default_session = session if session is not None else make_session()
+    rate_limiter = RateLimiter(rate, burst)
+
+
+def get(url, headers = None):
+  """Send a GET request through the shared session, waiting for the host's rate limit before every attempt.
+
+  Parameters
+  ----------
+  url : str
+      An URL link to a NCI or DailyMed page.
+  headers : dict, optional
+      Additional request headers, by default None.
+
+  Returns
+  -------
+  requests.Response
+      Return the response.
+  """
+
+  global default_session
+  # the session is shared by the threads of the crawler and the pools, and created once
+  with _session_lock:
+    if default_session is None:
+      default_session = make_session()
+    session = default_session
+  # the sessions of make_session wait for the rate limit on every attempt; any other session waits once
+  if not isinstance(session.get_adapter(url), RateLimitedAdapter):
+    rate_limiter.wait(url)
+  return session.get(url, headers = headers, timeout = TIMEOUT)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import gc
+import importlib
+import threading
+from biomarker_nlp import result_cache
+
+GENE_MODEL = 'en_ner_craft_md' # Entities labeled "GGP" are genes
+PROTEIN_MODEL = 'en_ner_jnlpba_md' # Entities labeled "PROTEIN" are proteins
+CHEMICAL_MODEL = 'en_ner_bionlp13cg_md' # Entities labeled "SIMPLE_CHEMICAL" are drugs; also parses sentences for sent_subtree
+MODELS = [GENE_MODEL, PROTEIN_MODEL, CHEMICAL_MODEL]
+
+class ModelRegistry:
+  """Load the scispacy NER models on first use, and release them on request.
+
+  Importing biomarker_extraction does not load any model. Each model is loaded (with its package's load function) the first time a function needs it, and is then shared by every later call. Scraping-only callers (e.g. ndc_code or drug_brand_label) never pay for a model.
+  Models can be loaded in advance with warm, e.g. before a long loop or before forking workers, and dropped with release when they are no longer needed.
+  The registry is thread-safe: a model requested by several threads at once is loaded only once.
+
+  By default, the full pipelines of the models run, as in earlier versions. In NER-only mode, the functions that only read the entities of a text run the models' entity recognizer alone, without the tagger and parser that run before it, and gene_protein_chemical_batch tokenizes each text once for the three models. See ner_disabled, and benchmarks/ner_only_benchmark.py to compare both modes on your sentences.
+
+  The md models each carry their own copy of the same word-vector table. With share_vectors, the models whose vectors have the same name (e.g. 'en_core_sci_md.vectors') are given the table of the first one that is loaded, and the other copies are freed. With vector_rows, the table is pruned to its most frequent rows, and the words that are dropped are mapped to their closest remaining vector (see prune_vectors of spacy's Vocab). Both lower the memory of a process, so that more workers fit on a node; pruning can change some entities, see benchmarks/vectors_report.py.
+
+  Parameters
+  ----------
+  models : list, optional
+      The names of the model packages that can be loaded, by default MODELS.
+  ner_only : bool, optional
+      Run only the components that entity extraction needs, by default False.
+  share_vectors : bool, optional
+      Share one word-vector table between the models that use the same vectors, by default False.
+  vector_rows : int, optional
+      Prune the word vectors to this number of rows, by default None (the vectors are kept whole).
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import model_registry
+
+  Example
+
+  >>> model_registry.registry.loaded()
+  []
+  >>> model_registry.registry.warm(model_registry.GENE_MODEL)
+  >>> model_registry.registry.loaded()
+  ['en_ner_craft_md']
+  >>> model_registry.registry.release()
+
+  """
+
+  def __init__(self, models = MODELS, ner_only = False, share_vectors = False, vector_rows = None):
+    self.models = list(models)
+    self.ner_only = ner_only
+    self.share_vectors = share_vectors
+    self.vector_rows = vector_rows
+    self._loaded = {}
+    self._identities = {}
+    self._vectors = {} # the shared word-vector tables by name
+    self._lock = threading.Lock()
+    self._vectorsLock = threading.Lock()
+
+  def _load(self, name):
+    # scispacy registers its components with spacy before a model is loaded
+    importlib.import_module('scispacy')
+    return self.apply_vectors(importlib.import_module(name).load())
+
+  def apply_vectors(self, nlp):
+    """Share and prune the word vectors of a model as set by share_vectors and vector_rows.
+
+    The models of the registry go through it when they are loaded. Other models of the same family (e.g. en_ner_bc5cdr_md) can be given to it after they are loaded, to use the same table.
+
+    Parameters
+    ----------
+    nlp : spacy.language.Language
+        A loaded model.
+
+    Returns
+    -------
+    spacy.language.Language
+        Return the model.
+    """
+
+    vectors = nlp.vocab.vectors
+    if (not self.share_vectors and self.vector_rows is None) or vectors.name is None or vectors.shape[0] == 0:
+      return nlp
+    from spacy._ml import link_vectors_to_models
+    with self._vectorsLock:
+      shared = self._vectors.get(vectors.name)
+      if self.share_vectors and shared is not None and shared.shape[1] == vectors.shape[1]:
+        nlp.vocab.vectors = shared
+      else:
+        if self.vector_rows is not None and vectors.shape[0] > self.vector_rows:
+          nlp.vocab.prune_vectors(self.vector_rows)
+        if self.share_vectors:
+          self._vectors[vectors.name] = nlp.vocab.vectors
+      # the lexemes of the model point to the rows of its (new) table
+      link_vectors_to_models(nlp.vocab)
+    return nlp
+
+  def get(self, name):
+    """Return the model, loading it if it is not loaded yet.
+
+    Parameters
+    ----------
+    name : str
+        The name of the model package, e.g. GENE_MODEL.
+
+    Returns
+    -------
+    spacy.language.Language
+        Return the loaded model.
+    """
+
+    if name not in self.models:
+      raise ValueError("Unknown model " + name + ". Please choose one of " + ', '.join(self.models) + ".")
+    with self._lock:
+      if name not in self._loaded:
+        self._loaded[name] = self._load(name)
+      return self._loaded[name]
+
+  def identity(self, name):
+    """Return the identity of the model for the result cache, e.g. 'spacy:en_ner_craft_md-0.3.0'.
+
+    The version is read from the installed package, so the model is not loaded. If it cannot be read, the model is loaded and model_identity of result_cache is used. In NER-only mode, 'ner_only' is added, and with pruned vectors, the number of rows, e.g. 'spacy:en_ner_craft_md-0.3.0:ner_only:vectors=20000', so that the results of each setting are cached apart.
+    """
+
+    if name not in self._identities:
+      try:
+        from importlib.metadata import version
+        self._identities[name] = 'spacy:' + name + '-' + version(name)
+      except ImportError:
+        self._identities[name] = result_cache.model_identity(self.get(name))
+    identity = self._identities[name]
+    if self.ner_only:
+      identity += ':ner_only'
+    if self.vector_rows is not None:
+      identity += ':vectors=' + str(self.vector_rows)
+    return identity
+
+  def disabled(self, name, keep):
+    """Return the pipeline components of the model that are not in keep, to be passed as the disable argument of the model.
+
+    Parameters
+    ----------
+    name : str
+        The name of the model package, e.g. GENE_MODEL.
+    keep : list
+        The components that have to run, e.g. ['ner'] or ['parser'].
+
+    Returns
+    -------
+    list
+        Return the names of the other components.
+    """
+
+    return [pipe for pipe in self.get(name).pipe_names if pipe not in keep]
+
+  def ner_disabled(self, name):
+    """Return the components to disable when only the entities of a text are read: all but 'ner' in NER-only mode, none otherwise."""
+
+    if not self.ner_only:
+      return []
+    return self.disabled(name, ['ner'])
+
+  def warm(self, *names):
+    """Load the models now (all the models if no name is given)."""
+
+    for name in (names or self.models):
+      self.get(name)
+
+  def release(self, *names):
+    """Drop the models (all the models if no name is given) so that their memory can be freed. They are loaded again on their next use."""
+
+    with self._lock:
+      for name in (names or list(self._loaded)):
+        self._loaded.pop(name, None)
+      if len(self._loaded) == 0:
+        self._vectors = {}
+    gc.collect()
+
+  def loaded(self):
+    """Return the names of the models that are loaded."""
+
+    return [name for name in self.models if name in self._loaded]
+
+
+registry = ModelRegistry()
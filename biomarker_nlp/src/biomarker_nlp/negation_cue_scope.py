@@ -2,8 +2,9 @@
 # -*- coding: utf-8 -*-
 
 from biomarker_nlp.negation_negbert import *
+from biomarker_nlp import result_cache
 
-def negation_detect(text, modelCue):
+def negation_detect(text, modelCue, backend = None):
   """Detect if a sentence contains any negation cues.
 
   This function predicts if a sentence contains any negation words by using a pre-trained negation detection model that was pre-trained through Aditya and Suraj's (2020) NegBERT transfer learning program. 
@@ -18,6 +19,9 @@ def negation_detect(text, modelCue):
   modelCue : torch model
       pre-trained negation cue detection model
 
+  backend : str, optional
+      None to run the model as it is, 'torch' to run its torch module or 'onnx' to run its exported ONNX graph with ONNX Runtime (see export_onnx and onnx_model of negation_negbert), by default None.
+
   Returns
   -------
   bool
@@ -30,11 +34,12 @@ def negation_detect(text, modelCue):
 
   Notes
   -----
-  NVIDIA GPU will be required. Make sure your machine brings NVIDIA GPU or set GPU as Hardware accelerator if using Colab notebook.
+  If a ResultCache was set with set_default_cache of result_cache, the result of a sentence that was already seen is served from the cache.
+  The models run on the GPU when there is one and on the CPU otherwise (see select_device of negation_negbert). Load them with load_model of negation_negbert to map them onto the CPU.
   
   Examples
   --------
-  Install the necessary packages, and make sure to turn the GPU Hardware accelerator on. 
+  Install the necessary packages. 
   
   >>> If using Colab Notebook, use !pip instead pip.
   $ pip install biomarker_nlp
@@ -46,7 +51,7 @@ def negation_detect(text, modelCue):
 
   >>> from biomarker_nlp import negation_cue_scope
   >>> from biomarker_nlp.negation_negbert import * # This code MUST be run before loading the pre-trained negation models
-  >>> modelCue = torch.load('/path/to/negation/cue/detection/model') # path to the location where the model file is placed
+  >>> modelCue = load_model('/path/to/negation/cue/detection/model') # path to the location where the model file is placed
  
   
   Examples (predict negation)
@@ -63,18 +68,29 @@ def negation_detect(text, modelCue):
 
   """
 
+  modelCue = use_backend(modelCue, backend)
+
+  # serve the result from the sentence cache if there is one (see result_cache)
+  cache = result_cache.default_cache
+  if cache is not None:
+    identity = result_cache.model_identity(modelCue)
+    negationCue = cache.get('negation_detect', identity, text)
+    if negationCue is not None:
+      return negationCue
+
   # perform negation cue detection
   mydata = CustomData([text])
   dl = mydata.get_cue_dataloader()
   cueIndex = modelCue.predict(dl)
 
   # check if negation is detected
-  if 1 in cueIndex[0][0]:
-    return True
-  else: return False
+  negationCue = 1 in cueIndex[0][0]
+  if cache is not None:
+    cache.put('negation_detect', identity, text, negationCue)
+  return negationCue
 
 
-def negation_scope(text, modelCue, modelScope):
+def negation_scope(text, modelCue, modelScope, backend = None):
   """Extract the scope of negation in a sentence.
 
   This function predicts the negation cues and their scope in a sentence by using two pre-trained negation models that were pre-trained through Aditya and Suraj's (2020) NegBERT transfer learning program. 
@@ -93,6 +109,9 @@ def negation_scope(text, modelCue, modelScope):
   modelScopre : torch model
       pre-trained negation scope prediction model
 
+  backend : str, optional
+      None to run the models as they are, 'torch' to run their torch modules or 'onnx' to run their exported ONNX graphs with ONNX Runtime (see export_onnx and onnx_model of negation_negbert), by default None.
+
   Returns
   -------
   list
@@ -105,11 +124,12 @@ def negation_scope(text, modelCue, modelScope):
   Notes
   -----
   The negation cue will not be extracted.
-  NVIDIA GPU will be required. Make sure your machine brings NVIDIA GPU or set GPU as Hardware accelerator if using Colab notebook.
+  If a ResultCache was set with set_default_cache of result_cache, the result of a sentence that was already seen is served from the cache.
+  The models run on the GPU when there is one and on the CPU otherwise (see select_device of negation_negbert). Load them with load_model of negation_negbert to map them onto the CPU.
   
   Examples
   --------
-  Install the necessary packages, and make sure to turn the GPU Hardware accelerator on. 
+  Install the necessary packages. 
   
   >>> If using Colab Notebook, use !pip instead pip.
   $ pip install biomarker_nlp
@@ -121,8 +141,8 @@ def negation_scope(text, modelCue, modelScope):
 
   >>> from biomarker_nlp import negation_cue_scope
   >>> from biomarker_nlp.negation_negbert import * # This code MUST be run before loading the pre-trained negation models
-  >>> modelCue = torch.load('/path/to/negation/cue/detection/model') # path to the location where the model file is placed
-  >>> modelScope = torch.load('/path/to/negation/scope/detection/model') # path to the location where the model file is placed
+  >>> modelCue = load_model('/path/to/negation/cue/detection/model') # path to the location where the model file is placed
+  >>> modelScope = load_model('/path/to/negation/scope/detection/model') # path to the location where the model file is placed
   
   Examples (predict negation scope)
   
@@ -133,36 +153,109 @@ def negation_scope(text, modelCue, modelScope):
   >>> negation_cue_scope.negation_scope(text = txt, modelCue = modelCue, modelScope = modelScope)
   ['KEYTRUDA is', 'recommended for treatment of patients with PMBCL who']
 
+  Examples (with ONNX Runtime, after the models were exported once)
+
+  >>> export_onnx(modelCue, '/path/to/modelCue.onnx')
+  '/path/to/modelCue.onnx'
+  >>> export_onnx(modelScope, '/path/to/modelScope.onnx')
+  '/path/to/modelScope.onnx'
+  >>> negation_cue_scope.negation_scope(text = txt, modelCue = modelCue, modelScope = modelScope, backend = 'onnx')
+  ['KEYTRUDA is', 'recommended for treatment of patients with PMBCL who']
+
   """
 
-  # perform negation cue detection
-  mydata = CustomData([text])
-  dl = mydata.get_cue_dataloader()
-  cueIndex = modelCue.predict(dl)
+  return negation_scope_batch([text], modelCue, modelScope, backend = backend)[0]
 
-  # string of the scope
-  negationScope = []
 
-  # check if negation is detected.
-  if 1 in cueIndex[0][0]:
-    
-    # perform negation scope resolution
-    mydata = CustomData([text], cues = cueIndex[0])
-    dl = mydata.get_scope_dataloader()
-    scopeIndex = modelScope.predict(dl)
-
-    # extract the negated string of the scope
-    if len(scopeIndex[0][0]) == len(text.split()):
-      scopeSubstr = ''
-      for i in range(len(text.split())):
-        if scopeIndex[0][0][i] == 1 and i != len(text.split())-1:
-          scopeSubstr += " " + text.split()[i]
-        elif i == len(text.split())-1 and scopeIndex[0][0][i] == 1:
-          scopeSubstr += " " + text.split()[i]
+def negation_scope_batch(sentences, modelCue, modelScope, batch_size = 32, backend = None):
+  """Extract the scope of negation in many sentences, with batched cue detection and scope resolution.
+
+  The cues of all the sentences are predicted in batches of batch_size, then the scopes of the sentences with a negation cue are predicted together, also in batches. The results are the same as calling negation_scope on each sentence, with far fewer forward passes of the models.
+
+  Parameters
+  ----------
+  sentences : list
+      The sentences.
+  modelCue : torch model
+      pre-trained negation cue prediction model
+  modelScope : torch model
+      pre-trained negation scope prediction model
+  batch_size : int, optional
+      The number of sentences in a forward pass of a model, by default 32.
+  backend : str, optional
+      None, 'torch' or 'onnx' (see negation_scope), by default None.
+
+  Returns
+  -------
+  list
+      a list with the negated clauses of every sentence (see negation_scope), in the order of the sentences. A sentence without negation has an empty list.
+
+  See Also
+  --------
+  negation_scope
+
+  Notes
+  -----
+  If a ResultCache was set with set_default_cache of result_cache, the sentences that were already seen are served from the cache and only the others are run.
+
+  Examples
+  --------
+  >>> sentences = ["TECENTRIQ is not indicated for use in combination with paclitaxel for the treatment of adult patients with unresectable locally advanced or metastatic TNBC.",
+  ...              "KEYTRUDA is indicated for the treatment of adult patients with relapsed or refractory classical Hodgkin lymphoma (cHL)."]
+  >>> negation_cue_scope.negation_scope_batch(sentences, modelCue = modelCue, modelScope = modelScope, batch_size = 32)
+  [['TECENTRIQ is', 'indicated for use in combination with paclitaxel for'], []]
+
+  """
+
+  sentences = list(sentences)
+  modelCue = use_backend(modelCue, backend)
+  modelScope = use_backend(modelScope, backend)
+  negationScopes = [None] * len(sentences)
+
+  # serve the results from the sentence cache if there is one (see result_cache)
+  cache = result_cache.default_cache
+  if cache is not None:
+    identity = result_cache.model_identity(modelCue) + '|' + result_cache.model_identity(modelScope)
+    for i, text in enumerate(sentences):
+      negationScopes[i] = cache.get('negation_scope', identity, text)
+  missing = [i for i, negationScope in enumerate(negationScopes) if negationScope is None]
+  if len(missing) == 0:
+    return negationScopes
+
+  # perform negation cue detection, all the sentences in batches
+  mydata = CustomData([sentences[i] for i in missing])
+  dl = mydata.get_cue_dataloader(batch_size = batch_size)
+  cueIndex = [cues for batch in modelCue.predict(dl) for cues in batch]
+
+  # perform negation scope resolution on the sentences where negation is detected
+  negated = [j for j, cues in enumerate(cueIndex) if 1 in cues]
+  scopeIndex = {}
+  if len(negated) > 0:
+    mydata = CustomData([sentences[missing[j]] for j in negated], cues = [cueIndex[j] for j in negated])
+    dl = mydata.get_scope_dataloader(batch_size = batch_size)
+    scopeIndex = dict(zip(negated, [scope for batch in modelScope.predict(dl) for scope in batch]))
+
+  for j, i in enumerate(missing):
+    negationScopes[i] = _scope_clauses(sentences[i], scopeIndex[j]) if j in scopeIndex else []
+    if cache is not None:
+      cache.put('negation_scope', identity, sentences[i], negationScopes[i])
+  return negationScopes
+
+
+def _scope_clauses(text, scope):
+  # the negated clauses of a sentence: its runs of words predicted in the scope (1)
+  words = text.split()
+  negationScope = []
+  if len(scope) == len(words):
+    scopeSubstr = ''
+    for i in range(len(words)):
+      if scope[i] == 1 and i != len(words)-1:
+        scopeSubstr += " " + words[i]
+      elif i == len(words)-1 and scope[i] == 1:
+        scopeSubstr += " " + words[i]
+        negationScope.append(scopeSubstr.lstrip())
+      else: 
+        if len(scopeSubstr) > 0:
           negationScope.append(scopeSubstr.lstrip())
-        else: 
-          if len(scopeSubstr) > 0:
-            negationScope.append(scopeSubstr.lstrip())
-            scopeSubstr = ''
-  
+          scopeSubstr = ''
   return negationScope
@@ -3,7 +3,7 @@ This is part of Aditya Khandelwal & Suraj Sawant's (2020) NegBERT program, it is
 For more information about the NegBERT program, please see https://github.com/adityak6798/Transformers-For-Negation-and-Speculation. 
 Referece: Khandelwal, A. & Sawant, S. (2020). NegBERT: A Transfer Learning Approach for Negation Detection and Scope Resolution. The 12th Language Resources and Evaluation Conference (LREC 2020). https://aclanthology.org/2020.lrec-1.704.pdf
 """
-import os, re, torch, html, tempfile, copy, json, math, shutil, tarfile, tempfile, sys, random, pickle
+import os, re, torch, html, tempfile, copy, json, math, shutil, tarfile, tempfile, sys, random, pickle, threading, weakref, inspect
 from torch import nn
 from torch.nn import functional as F
 from torch.nn import CrossEntropyLoss, ReLU
@@ -66,7 +66,31 @@ TF_WEIGHTS_NAME = 'model.ckpt'
 CONFIG_NAME = "config.json"
 WEIGHTS_NAME = "pytorch_model.bin"
 
-device = torch.device("cuda")
+def select_device(device = None):
+    '''Return the torch device the negation models run on.
+    device: 'cpu', 'cuda' or e.g. 'cuda:1'. If None, the NEGBERT_DEVICE environment variable is used, and if it is not set, 'cuda' when a GPU is available and 'cpu' otherwise.'''
+    if device is None:
+        device = os.environ.get('NEGBERT_DEVICE') or ('cuda' if torch.cuda.is_available() else 'cpu')
+    return torch.device(device)
+
+def load_pickle(path):
+    '''Load a file saved with torch.save onto the CPU, e.g. a whole pickled CueModel or ScopeModel or its torch module.
+    Since torch 2.6, torch.load only loads tensors by default (weights_only), and the NegBERT models are pickled objects, so they are loaded with weights_only=False. Only load files from a trusted source.'''
+    options = {}
+    if 'weights_only' in inspect.signature(torch.load).parameters:
+        options['weights_only'] = False
+    return torch.load(path, map_location='cpu', **options)
+
+def set_threads(intra_op = None, inter_op = None):
+    '''Set the number of threads torch uses on the CPU.
+    intra_op: the threads of one operation (e.g. a matrix product), by default the number of cores.
+    inter_op: the threads that run independent operations; it must be set before the models run anything.'''
+    if intra_op is not None:
+        torch.set_num_threads(intra_op)
+    if inter_op is not None:
+        torch.set_num_interop_threads(inter_op)
+
+device = select_device()
 n_gpu = torch.cuda.device_count()
 
 class Data:
@@ -696,20 +720,32 @@ class Data:
 
         return train_dataloader, val_dataloaders, test_dataloaders
 
+_tokenizers = {}
+_tokenizers_lock = threading.Lock()
+
+def get_tokenizer(model_name):
+    '''Return the tokenizer of a transformer, e.g. CUE_MODEL or SCOPE_MODEL.
+    The tokenizer is loaded from its vocabulary files the first time it is asked for, and is then shared by every later call and every thread of the process.'''
+    with _tokenizers_lock:
+        if model_name not in _tokenizers:
+            do_lower_case = 'uncased' in model_name
+            if 'xlnet' in model_name:
+                tokenizer = XLNetTokenizer.from_pretrained(model_name, do_lower_case=do_lower_case, cache_dir='xlnet_tokenizer')
+            elif 'roberta' in model_name:
+                tokenizer = RobertaTokenizer.from_pretrained(model_name, do_lower_case=do_lower_case, cache_dir='roberta_tokenizer')
+            elif 'bert' in model_name:
+                tokenizer = BertTokenizer.from_pretrained(model_name, do_lower_case=do_lower_case, cache_dir='bert_tokenizer')
+            else:
+                raise ValueError("No tokenizer for " + model_name)
+            _tokenizers[model_name] = tokenizer
+        return _tokenizers[model_name]
+
 class CustomData:
     def __init__(self, sentences, cues = None):
         self.sentences = sentences
         self.cues = cues
-    def get_cue_dataloader(self):
-        do_lower_case = True
-        if 'uncased' not in CUE_MODEL:
-            do_lower_case = False
-        if 'xlnet' in CUE_MODEL:
-            tokenizer = XLNetTokenizer.from_pretrained(CUE_MODEL, do_lower_case=do_lower_case, cache_dir='xlnet_tokenizer')
-        elif 'roberta' in CUE_MODEL:
-            tokenizer = RobertaTokenizer.from_pretrained(CUE_MODEL, do_lower_case=do_lower_case, cache_dir='roberta_tokenizer')
-        elif 'bert' in CUE_MODEL:
-            tokenizer = BertTokenizer.from_pretrained(CUE_MODEL, do_lower_case=do_lower_case, cache_dir='bert_tokenizer')
+    def get_cue_dataloader(self, batch_size = None):
+        tokenizer = get_tokenizer(CUE_MODEL)
         
         dl_sents = self.sentences    
         sentences = dl_sents # sentences = [" ".join(sent) for sent in dl_sents]
@@ -717,7 +753,7 @@ class CustomData:
         mytexts = []
         mylabels = []
         mymasks = []
-        if do_lower_case == True:
+        if 'uncased' in CUE_MODEL:
             sentences_clean = [sent.lower() for sent in sentences]
         else:
             sentences_clean = sentences
@@ -747,25 +783,17 @@ class CustomData:
         mymasks = torch.LongTensor(mymasks)
 
         data = TensorDataset(inputs, masks, mymasks)
-        dataloader = DataLoader(data, batch_size=bs)
+        dataloader = DataLoader(data, batch_size=batch_size or bs)
 
         return dataloader
     
-    def get_scope_dataloader(self, cues = None):
+    def get_scope_dataloader(self, cues = None, batch_size = None):
         if cues != None:
             self.cues = cues
         if self.cues == None:
             raise ValueError("Need Cues Data to Generate the Scope Dataloader")
         method = SCOPE_METHOD
-        do_lower_case = True
-        if 'uncased' not in SCOPE_MODEL:
-            do_lower_case = False
-        if 'xlnet' in SCOPE_MODEL:
-            tokenizer = XLNetTokenizer.from_pretrained(SCOPE_MODEL, do_lower_case=do_lower_case, cache_dir='xlnet_tokenizer')
-        elif 'roberta' in SCOPE_MODEL:
-            tokenizer = RobertaTokenizer.from_pretrained(SCOPE_MODEL, do_lower_case=do_lower_case, cache_dir='roberta_tokenizer')
-        elif 'bert' in SCOPE_MODEL:
-            tokenizer = BertTokenizer.from_pretrained(SCOPE_MODEL, do_lower_case=do_lower_case, cache_dir='bert_tokenizer')
+        tokenizer = get_tokenizer(SCOPE_MODEL)
         dl_sents = self.sentences
         dl_cues = self.cues
         
@@ -773,7 +801,7 @@ class CustomData:
         mytexts = []
         mycues = []
         mymasks = []
-        if do_lower_case == True:
+        if 'uncased' in SCOPE_MODEL:
             sentences_clean = [sent.lower() for sent in sentences]
         else:
             sentences_clean = sentences
@@ -848,7 +876,7 @@ class CustomData:
         final_masks = torch.LongTensor(final_masks)
 
         data = TensorDataset(inputs, masks, final_masks)
-        dataloader = DataLoader(data, batch_size=bs)
+        dataloader = DataLoader(data, batch_size=batch_size or bs)
         #print(final_sentences, mycues)
 
         return dataloader
@@ -2273,7 +2301,7 @@ class XLNetForTokenClassification(XLNetPreTrainedModel):
         return (logits,)
 
 class CueModel:
-    def __init__(self, full_finetuning = True, train = False, pretrained_model_path = 'Cue_Detection.pickle', device = 'cuda', learning_rate = 3e-5, class_weight = [100, 100, 100, 1, 0], num_labels = 5):
+    def __init__(self, full_finetuning = True, train = False, pretrained_model_path = 'Cue_Detection.pickle', device = None, learning_rate = 3e-5, class_weight = [100, 100, 100, 1, 0], num_labels = 5):
         self.model_name = CUE_MODEL
         self.task = TASK
         if train == True:
@@ -2286,15 +2314,12 @@ class CueModel:
             else:
                 raise ValueError("Supported model types are: xlnet, roberta, bert")
         else:
-            self.model = torch.load(pretrained_model_path)
-        self.device = torch.device(device)
+            self.model = load_pickle(pretrained_model_path)
+        self.device = select_device(device)
         self.class_weight = class_weight
         self.learning_rate = learning_rate
         self.num_labels = num_labels
-        if device == 'cuda':
-            self.model.cuda()
-        else:
-            self.model.cpu()
+        self.model.to(self.device)
             
         if full_finetuning:
             param_optimizer = list(self.model.named_parameters())
@@ -2469,7 +2494,7 @@ class CueModel:
             pred_flat = [int(i!=3) for i in pred_flat]
             print("F1-Score Cue_No Cue: {}".format(f1_score(labels_flat,pred_flat, average='weighted')))
             
-        self.model.load_state_dict(torch.load('checkpoint.pt'))
+        self.model.load_state_dict(torch.load('checkpoint.pt', map_location=self.device))
         plt.xlabel("Iteration")
         plt.ylabel("Train Loss")
         plt.plot([i for i in range(len(train_loss))], train_loss)
@@ -2655,7 +2680,7 @@ class CueModel:
         return predictions
 
 class ScopeModel:
-    def __init__(self, full_finetuning = True, train = False, pretrained_model_path = 'Scope_Resolution_Augment.pickle', device = 'cuda', learning_rate = 3e-5):
+    def __init__(self, full_finetuning = True, train = False, pretrained_model_path = 'Scope_Resolution_Augment.pickle', device = None, learning_rate = 3e-5):
         self.model_name = SCOPE_MODEL
         self.task = TASK
         self.num_labels = 2
@@ -2669,12 +2694,9 @@ class ScopeModel:
             else:
                 raise ValueError("Supported model types are: xlnet, roberta, bert")
         else:
-            self.model = torch.load(pretrained_model_path)
-        self.device = torch.device(device)
-        if device=='cuda':
-            self.model.cuda()
-        else:
-            self.model.cpu()
+            self.model = load_pickle(pretrained_model_path)
+        self.device = select_device(device)
+        self.model.to(self.device)
 
         if full_finetuning:
             param_optimizer = list(self.model.named_parameters())
@@ -2844,7 +2866,7 @@ class ScopeModel:
                 print("Early stopping")
                 break
         
-        self.model.load_state_dict(torch.load('checkpoint.pt'))
+        self.model.load_state_dict(torch.load('checkpoint.pt', map_location=self.device))
         plt.xlabel("Iteration")
         plt.ylabel("Train Loss")
         plt.plot([i for i in range(len(train_loss))], train_loss)
@@ -3038,3 +3060,176 @@ class ScopeModel:
                 predictions.append(actual_logits)
         return predictions
 
+def load_model(path, device = None):
+    '''Load a saved CueModel or ScopeModel (e.g. modelCue or modelScope) onto a device.
+    path: the file the model was saved to with torch.save.
+    device: see select_device. The models are loaded onto the CPU then moved onto the device, so the models saved on a GPU load on a CPU-only machine. The quantized and ONNX Runtime models (see quantize_model and onnx_model) always stay on the CPU.'''
+    # the model is unpickled on the CPU, as the int8 packed weights of a quantized model cannot be mapped onto a GPU
+    model = load_pickle(path)
+    if getattr(model, 'quantized', False) or getattr(model, 'backend', None) == 'onnx':
+        # the int8 kernels of dynamic quantization only run on the CPU, and ONNX Runtime takes its inputs on the CPU
+        device = torch.device('cpu')
+    else:
+        device = select_device(device)
+    model.device = device
+    model.model.to(device)
+    return model
+
+def quantize_model(model):
+    '''Return a copy of a CueModel or ScopeModel (e.g. modelCue or modelScope) whose Linear layers are quantized to int8 with dynamic quantization, for inference on a CPU.
+    The weights of the Linear layers are stored in int8 and their activations are quantized on the fly, so the model is several times smaller (the optimizer state is not kept either) and runs faster on a CPU, at a small cost in F1 (see benchmarks/quantization_check.py).
+    The model given is not changed. The quantized model runs on the CPU only and cannot be trained. Save it with torch.save and load it with load_model, then use it with negation_detect, negation_scope and negation_scope_batch as the fp32 model.'''
+    quantized = copy.copy(model)
+    quantized.model = torch.quantization.quantize_dynamic(copy.deepcopy(model.model).cpu(), {nn.Linear}, dtype=torch.qint8)
+    quantized.model.eval()
+    quantized.device = torch.device('cpu')
+    quantized.quantized = True
+    # the optimizer holds the fp32 parameters, which would be saved with the model
+    quantized.optimizer = None
+    return quantized
+
+_onnx_sessions = {}
+_onnx_sessions_lock = threading.Lock()
+_onnx_models = weakref.WeakKeyDictionary()
+_onnx_models_lock = threading.Lock()
+
+class _OnnxExport(nn.Module):
+    '''The forward pass of predict, with the inputs and the output of the exported graphs.'''
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids, token_type_ids=None, attention_mask=attention_mask)[0]
+
+def _onnx_inputs(batch_size, seq_len):
+    # random tokens, with the last sentence padded as CustomData does
+    input_ids = torch.randint(5, 1000, (batch_size, seq_len), dtype=torch.long)
+    attention_mask = torch.ones(batch_size, seq_len, dtype=torch.long)
+    input_ids[-1, seq_len // 2:] = 0
+    attention_mask[-1, seq_len // 2:] = 0
+    return input_ids, attention_mask
+
+def onnx_session(path, providers = None):
+    '''Return the ONNX Runtime session of an exported graph, created once per process for a path and providers.
+    providers: the ONNX Runtime execution providers, by default the CPU. The session uses as many threads as torch (see set_threads).'''
+    import onnxruntime
+    providers = list(providers or ['CPUExecutionProvider'])
+    key = (os.path.abspath(path), tuple(providers))
+    with _onnx_sessions_lock:
+        if key not in _onnx_sessions:
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = torch.get_num_threads()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            _onnx_sessions[key] = onnxruntime.InferenceSession(path, options, providers=providers)
+        return _onnx_sessions[key]
+
+class OnnxModule:
+    '''Run an exported graph with ONNX Runtime in place of the torch module of a CueModel or ScopeModel (see onnx_model).
+    It is called as the torch module is in predict, and returns the logits as a torch tensor. It is saved with its path only, and the session is created again when it is loaded.'''
+    def __init__(self, path, providers = None):
+        self.path = path
+        self.providers = providers
+        self.session = onnx_session(path, providers)
+
+    def __call__(self, input_ids, token_type_ids=None, attention_mask=None):
+        logits = self.session.run(['logits'], {'input_ids': input_ids.cpu().numpy(),
+                                               'attention_mask': attention_mask.cpu().numpy()})[0]
+        return (torch.from_numpy(logits),)
+
+    def eval(self):
+        return self
+
+    def to(self, *args, **kwargs):
+        return self
+
+    def __getstate__(self):
+        return {'path': self.path, 'providers': self.providers}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['providers'])
+
+def export_onnx(model, path, opset_version = 14, check = True):
+    '''Export the torch module of a CueModel or ScopeModel (e.g. modelCue or modelScope) to an ONNX graph, to run it with ONNX Runtime (see onnx_model).
+    path: the file the graph is written to. It is also kept as model.onnx_path.
+    opset_version: the ONNX opset. The einsums of XLNet need 12 or later, and the scaled dot-product attention of recent transformers versions 14 or later.
+    check: check that the graph gives the same logits as the torch module (see check_onnx).
+    The graph takes input_ids and attention_mask and returns logits, with dynamic batch and sequence axes. The model given is not changed, except for onnx_path, and the export runs on the CPU. The quantized models (see quantize_model) cannot be exported.'''
+    if getattr(model, 'quantized', False) or getattr(model, 'backend', None) == 'onnx':
+        raise ValueError("Only the fp32 torch models can be exported to ONNX.")
+    module = _OnnxExport(copy.deepcopy(model.model).cpu()).eval()
+    axes = {0: 'batch', 1: 'sequence'}
+    options = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # the TorchScript exporter, which the dynamic_axes are given for
+        options['dynamo'] = False
+    with torch.no_grad():
+        torch.onnx.export(module, _onnx_inputs(2, 16), path,
+                          input_names=['input_ids', 'attention_mask'], output_names=['logits'],
+                          dynamic_axes={'input_ids': axes, 'attention_mask': axes, 'logits': axes},
+                          opset_version=opset_version, do_constant_folding=True, **options)
+    model.onnx_path = path
+    # a graph exported again to the same path gets new sessions and copies
+    with _onnx_sessions_lock:
+        for key in [key for key in _onnx_sessions if key[0] == os.path.abspath(path)]:
+            del _onnx_sessions[key]
+    with _onnx_models_lock:
+        _onnx_models.pop(model, None)
+    if check:
+        check_onnx(model, path)
+    return path
+
+def check_onnx(model, path = None, atol = 1e-4, rtol = 1e-3):
+    '''Check that an exported graph gives the same logits as the torch module of a CueModel or ScopeModel, within atol and rtol, and raise a ValueError if not.
+    path: the graph, by default model.onnx_path.
+    The inputs have another batch size and sequence length than those of the export (MAX_LEN), so that the axes are checked to be dynamic.
+    Returns the largest absolute difference.'''
+    session = onnx_session(path or model.onnx_path)
+    module = _OnnxExport(model.model).eval()
+    input_ids, attention_mask = _onnx_inputs(3, MAX_LEN)
+    with torch.no_grad():
+        expected = module(input_ids.to(model.device), attention_mask.to(model.device)).cpu().numpy()
+    actual = session.run(['logits'], {'input_ids': input_ids.numpy(), 'attention_mask': attention_mask.numpy()})[0]
+    if actual.shape != expected.shape:
+        raise ValueError("The ONNX graph returns logits of shape " + str(actual.shape) + " instead of " + str(expected.shape) + ". Are its axes dynamic?")
+    difference = float(np.abs(actual - expected).max())
+    if not np.allclose(actual, expected, atol=atol, rtol=rtol):
+        raise ValueError("The ONNX graph does not match the torch model: the largest difference of the logits is " + str(difference) + ".")
+    return difference
+
+def onnx_model(model, path = None, providers = None):
+    '''Return a copy of a CueModel or ScopeModel (e.g. modelCue or modelScope) that runs its exported graph with ONNX Runtime, for inference.
+    path: the graph (see export_onnx), by default model.onnx_path.
+    providers: see onnx_session.
+    The copy is used with negation_detect, negation_scope and negation_scope_batch as the torch model; it cannot be trained or evaluated. It can be saved with torch.save, without the torch weights, and loaded with load_model (the graph must stay at its path).'''
+    path = path or getattr(model, 'onnx_path', None)
+    if path is None:
+        raise ValueError("The model has no ONNX graph. Please export it first with export_onnx.")
+    onnxModel = copy.copy(model)
+    onnxModel.model = OnnxModule(path, providers)
+    onnxModel.device = torch.device('cpu')
+    onnxModel.backend = 'onnx'
+    onnxModel.onnx_path = path
+    # the optimizer holds the torch parameters, which would be saved with the model
+    onnxModel.optimizer = None
+    return onnxModel
+
+def use_backend(model, backend = None):
+    '''Return the model to run with a backend: None for the model as it is, 'torch' for its torch module or 'onnx' for its exported graph with ONNX Runtime (see onnx_model).
+    The ONNX Runtime copy of a model is made once per graph and kept as long as the model, so it can be asked for on every call.'''
+    if backend is None:
+        return model
+    if backend == 'onnx':
+        if getattr(model, 'backend', None) == 'onnx':
+            return model
+        path = getattr(model, 'onnx_path', None)
+        with _onnx_models_lock:
+            copies = _onnx_models.setdefault(model, {})
+            if path not in copies:
+                copies[path] = onnx_model(model, path)
+            return copies[path]
+    if backend == 'torch':
+        if getattr(model, 'backend', None) == 'onnx':
+            raise ValueError("The model runs with ONNX Runtime only. Please use the torch model it was exported from.")
+        return model
+    raise ValueError("Unknown backend " + str(backend) + ". Please choose one of torch, onnx.")
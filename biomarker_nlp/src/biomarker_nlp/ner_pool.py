@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import itertools
+import multiprocessing
+from biomarker_nlp import biomarker_extraction
+from biomarker_nlp import model_registry
+from biomarker_nlp import result_cache
+
+CHUNK_SIZE = 64 # Sentences sent to a worker at a time
+
+def _init_worker(nerOnly, shareVectors, vectorRows, preloaded):
+  # each worker runs its models directly; the parent process looks up and fills the sentence cache
+  result_cache.set_default_cache(None)
+  # the workers load their models as the parent does, so that their results match the identities the parent caches them under
+  model_registry.registry.ner_only = nerOnly
+  model_registry.registry.share_vectors = shareVectors
+  model_registry.registry.vector_rows = vectorRows
+  if not preloaded:
+    model_registry.registry.warm()
+
+
+def _run_chunk(args):
+  # the entities of one chunk of sentences, in a worker
+  texts, gene, protein, chemical = args
+  return list(biomarker_extraction.gene_protein_chemical_batch(texts, gene = gene, protein = protein, chemical = chemical, batch_size = len(texts)))
+
+
+def _chunks(texts, size):
+  texts = iter(texts)
+  chunk = list(itertools.islice(texts, size))
+  while len(chunk) > 0:
+    yield chunk
+    chunk = list(itertools.islice(texts, size))
+
+
+class NERPool:
+  """A pool of worker processes that run gene_protein_chemical over many sentences, each worker with its own models.
+
+  NER is CPU-bound and a Python process runs it on one core, so a whole SPL catalog is spread over several processes. Every worker loads the three scispacy models once and keeps them for all its chunks. With preload (and the 'fork' start method, the default on Linux), the models are loaded in the parent before the workers are started, so the workers share the model memory copy-on-write instead of each loading its own copy.
+  Sentences are sent to the workers chunksize at a time and the results come back in the order of the sentences. Larger chunks cost less inter-process traffic, smaller chunks balance the load better at the end of a run.
+  If a ResultCache was set with set_default_cache of result_cache, the parent process looks the sentences up and only the misses are sent to the workers.
+
+  Parameters
+  ----------
+  workers : int, optional
+      The number of worker processes, by default the number of CPUs.
+  chunksize : int, optional
+      The number of sentences sent to a worker at a time, by default CHUNK_SIZE.
+  preload : bool, optional
+      Load the models in the parent before starting the workers, by default True. Only useful with the 'fork' start method.
+  start_method : str, optional
+      The multiprocessing start method ('fork', 'spawn' or 'forkserver'), by default 'fork' where available.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import ner_pool
+
+  Example
+
+  >>> sentences = ["Patients with EGFR or ALK genomic tumor aberrations should have disease progression on FDA-approved therapy for NSCLC harboring these aberrations prior to receiving TECENTRIQ."]
+  >>> with ner_pool.NERPool(workers = 8, chunksize = 64) as pool:
+  ...   results = list(pool.map(sentences, gene= 1, protein = 1, chemical = 0))
+  >>> results
+  [{'gene': ['EGFR', 'ALK genomic'], 'protein': ['EGFR', 'TECENTRIQ']}]
+
+  """
+
+  def __init__(self, workers = None, chunksize = CHUNK_SIZE, preload = True, start_method = None):
+    self.workers = workers or os.cpu_count() or 1
+    self.chunksize = chunksize
+    if start_method is None:
+      start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    self.start_method = start_method
+    self.preload = preload and start_method == 'fork'
+    if self.preload:
+      model_registry.registry.warm()
+    context = multiprocessing.get_context(start_method)
+    registry = model_registry.registry
+    self._pool = context.Pool(self.workers, initializer = _init_worker,
+                              initargs = (registry.ner_only, registry.share_vectors, registry.vector_rows, self.preload))
+
+  def _run(self, texts, gene, protein, chemical):
+    # the results of the workers, in order
+    tasks = ((chunk, gene, protein, chemical) for chunk in _chunks(texts, self.chunksize))
+    for results in self._pool.imap(_run_chunk, tasks):
+      for geneProteinChemicalDic in results:
+        yield geneProteinChemicalDic
+
+  def map(self, texts, gene = 1, protein = 1, chemical = 1):
+    """Extract gene, protein, and drug labels from many strings in the worker processes.
+
+    Parameters
+    ----------
+    texts : iterable
+        The strings, e.g. the sentences of all the labels. They are read lazily.
+    gene : int, optional
+        Extract genes, by default 1.
+    protein : int, optional
+        Extract proteins, by default 1.
+    chemical : int, optional
+        Extract simple chemicals, by default 1.
+
+    Yields
+    ------
+    dic
+        One dictionary per text, in the order of the texts, as returned by gene_protein_chemical of biomarker_extraction.
+    """
+
+    if result_cache.default_cache is None:
+      for geneProteinChemicalDic in self._run(texts, gene, protein, chemical):
+        yield geneProteinChemicalDic
+      return
+
+    # with the sentence cache, enough texts to keep every worker busy are looked up at a time
+    for block in _chunks(texts, self.chunksize * self.workers * 4):
+      compute = lambda missing, **flags: list(self._run(missing, flags['gene'], flags['protein'], flags['chemical']))
+      for geneProteinChemicalDic in biomarker_extraction._cached_entities(block, gene, protein, chemical, compute):
+        yield geneProteinChemicalDic
+
+  def close(self):
+    """Stop the worker processes once they have finished their chunks."""
+
+    self._pool.close()
+    self._pool.join()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+MAX_SIZE = 100000 # Number of results kept in memory
+
+def normalize_sentence(text):
+  """Return the sentence with its white space collapsed, so that the same sentence laid out differently gets the same key."""
+
+  return re.sub(r'\s+', ' ', text).strip()
+
+
+def model_identity(model):
+  """Return a string that identifies a model, to be part of the cache keys of its results.
+
+  A spacy model is identified by its name and version. A NegBERT CueModel or ScopeModel is identified by its class, its transformer, its task and the datasets it was trained on, and by 'int8' if it is quantized and 'onnx' if it runs with ONNX Runtime (see negation_negbert.quantize_model and onnx_model). Any other model is identified by its class name.
+
+  Parameters
+  ----------
+  model : object
+      A spacy model, a NegBERT model or any other model.
+
+  Returns
+  -------
+  str
+      Return the identity, e.g. 'spacy:en_ner_craft_md-0.3.0' or 'CueModel:xlnet-base-cased:negation:bioscope_abstracts_bioscope_full_papers'.
+  """
+
+  meta = getattr(model, 'meta', None)
+  if isinstance(meta, dict) and 'name' in meta:
+    return 'spacy:' + meta.get('lang', '') + '_' + meta['name'] + '-' + str(meta.get('version', ''))
+  parts = [type(model).__name__]
+  for attribute in ('model_name', 'task', 'train_dl_name'):
+    if hasattr(model, attribute):
+      parts.append(str(getattr(model, attribute)))
+  if getattr(model, 'quantized', False):
+    parts.append('int8')
+  if getattr(model, 'backend', None) == 'onnx':
+    parts.append('onnx')
+  return ':'.join(parts)
+
+
+class ResultCache:
+  """A two-tier cache of sentence-level results: an in-memory LRU in front of an optional SQLite file.
+
+  FDA labels repeat the same indication sentences across generics, strengths and revisions, so the NER and negation results of a sentence are kept and served again instead of running the models. A result is stored under the SHA-256 hash of its kind (e.g. 'ner:GGP' or 'negation_scope'), the identity of the model(s) that produced it and the normalized sentence, so results of another model or model version are never mixed up.
+  Lookups try the memory first, then the SQLite file; a result found on disk is brought back into memory. The counters of memory hits, disk hits and misses are available with stats.
+  The cache is thread-safe. Results must be JSON serializable. They are kept serialized, in memory as on disk, and every hit returns a new copy, so a caller that changes a result it got does not change the cached one (and a memory hit is the same as a disk hit).
+
+  Parameters
+  ----------
+  path : str, optional
+      The SQLite file where results are stored across runs, by default None (memory only). It is created if it does not exist.
+  maxsize : int, optional
+      The number of results kept in memory, by default MAX_SIZE. The least recently used results are dropped first.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import result_cache, biomarker_extraction
+
+  Example (cache the results of gene_protein_chemical, negation_detect and negation_scope)
+
+  >>> cache = result_cache.ResultCache(path = '/path/to/results.sqlite') # a new file
+  >>> result_cache.set_default_cache(cache)
+  >>> txt = "Patients with EGFR or ALK genomic tumor aberrations should have disease progression on FDA-approved therapy for NSCLC harboring these aberrations prior to receiving TECENTRIQ."
+  # the genes, proteins and chemicals are three lookups: three misses, and the models run
+  >>> biomarker_extraction.gene_protein_chemical(text = txt)
+  {'gene': ['EGFR', 'ALK genomic'], 'protein': ['EGFR', 'TECENTRIQ'], 'chemical': []}
+  # three memory hits
+  >>> biomarker_extraction.gene_protein_chemical(text = txt)
+  {'gene': ['EGFR', 'ALK genomic'], 'protein': ['EGFR', 'TECENTRIQ'], 'chemical': []}
+  >>> cache.stats()
+  {'memory_hits': 3, 'disk_hits': 0, 'misses': 3, 'hit_rate': 0.5}
+  # in a later run, with the same file, the first call has three disk hits
+
+  """
+
+  def __init__(self, path = None, maxsize = MAX_SIZE):
+    self.path = path
+    self.maxsize = maxsize
+    self._memory = OrderedDict()
+    self._lock = threading.Lock()
+    self._db = None
+    if path is not None:
+      self._db = sqlite3.connect(path, check_same_thread = False, isolation_level = None)
+      self._db.execute('PRAGMA journal_mode=WAL')
+      self._db.execute('PRAGMA synchronous=NORMAL')
+      self._db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+    self.clear_stats()
+
+  def _key(self, kind, identity, text):
+    return hashlib.sha256('\0'.join([kind, identity, normalize_sentence(text)]).encode('utf-8')).hexdigest()
+
+  def _remember(self, key, value):
+    self._memory[key] = value
+    self._memory.move_to_end(key)
+    while len(self._memory) > self.maxsize:
+      self._memory.popitem(last = False)
+
+  def get(self, kind, identity, text):
+    """Return the cached result of a sentence, or None if it was never stored.
+
+    Parameters
+    ----------
+    kind : str
+        The kind of result, e.g. 'ner:GGP' or 'negation_scope'.
+    identity : str
+        The identity of the model(s), see model_identity.
+    text : str
+        The sentence.
+
+    Returns
+    -------
+    None or object
+        Return a copy of the result, or None on a miss.
+    """
+
+    key = self._key(kind, identity, text)
+    with self._lock:
+      if key in self._memory:
+        self._memory.move_to_end(key)
+        self.memory_hits += 1
+        return json.loads(self._memory[key])
+      if self._db is not None:
+        row = self._db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+          self._remember(key, row[0])
+          self.disk_hits += 1
+          return json.loads(row[0])
+      self.misses += 1
+      return None
+
+  def put(self, kind, identity, text, value):
+    """Store the result of a sentence in memory and, if the cache has a file, on disk. See get for the parameters."""
+
+    key = self._key(kind, identity, text)
+    # the result is serialized now, so that later changes to it by the caller are not cached
+    value = json.dumps(value)
+    with self._lock:
+      self._remember(key, value)
+      if self._db is not None:
+        self._db.execute('INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)', (key, value))
+
+  def stats(self):
+    """Return the numbers of memory hits, disk hits and misses since the cache was created (or since clear_stats), and the hit rate."""
+
+    lookups = self.memory_hits + self.disk_hits + self.misses
+    return {'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups > 0 else 0.0}
+
+  def clear_stats(self):
+    """Reset the hit and miss counters."""
+
+    self.memory_hits = 0
+    self.disk_hits = 0
+    self.misses = 0
+
+  def close(self):
+    """Close the SQLite file. The results kept in memory are still served."""
+
+    if self._db is not None:
+      self._db.close()
+      self._db = None
+
+
+default_cache = None
+
+def set_default_cache(cache):
+  """Set the ResultCache used by gene_protein_chemical, gene_protein_chemical_batch, negation_detect and negation_scope.
+
+  Parameters
+  ----------
+  cache : ResultCache or None
+      The cache to use. None turns caching off, which is the default.
+  """
+
+  global default_cache
+  default_cache = cache
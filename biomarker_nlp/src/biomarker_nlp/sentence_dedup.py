@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+from collections import OrderedDict
+from biomarker_nlp import result_cache
+
+class SentenceDedup:
+  """Collect the sentences of a batch of labels, run the NLP once per unique sentence and fan the results back out.
+
+  The indication sentences of a therapy are often identical across its DailyMed labels (setids) and across its disease subsections. The sentences are added as they are met, then run is given a function over the unique sentences (e.g. NER and negation) and each copy of a unique sentence gets its own copy of the result. Sentences are compared after their white space is collapsed (see normalize_sentence of result_cache); the copies of a sentence get the result of its first spelling.
+  stats tells how much work was saved.
+
+  Examples
+  --------
+  Import the module
+
+  >>> from biomarker_nlp import sentence_dedup, biomarker_extraction
+
+  Example
+
+  >>> dedup = sentence_dedup.SentenceDedup()
+  >>> for st in ['BRAF V600E mutation-positive melanoma.', 'BRAF  V600E mutation-positive melanoma.', 'EGFR exon 19 deletions.']:
+  ...   dedup.add(st)
+  >>> results = dedup.run(lambda sentences: list(biomarker_extraction.gene_protein_chemical_batch(sentences)))
+  >>> dedup.result('BRAF V600E mutation-positive melanoma.')
+  {'gene': ['BRAF V600E'], 'protein': [], 'chemical': []}
+  >>> dedup.stats()
+  {'sentences': 3, 'unique': 2, 'dedup_ratio': 1.5, 'saved': 0.333}
+
+  """
+
+  def __init__(self):
+    self._keys = [] # the normalized sentence of every added sentence, in order
+    self._unique = OrderedDict() # the first spelling of every normalized sentence
+    self._results = {}
+
+  def add(self, sentence):
+    """Add a sentence to the batch and return its position, the index of its result in the list returned by run."""
+
+    key = result_cache.normalize_sentence(sentence)
+    self._unique.setdefault(key, sentence)
+    self._keys.append(key)
+    return len(self._keys) - 1
+
+  def unique(self):
+    """Return the unique sentences that were added and not run yet, in the order they were first added."""
+
+    return [sentence for key, sentence in self._unique.items() if key not in self._results]
+
+  def run(self, function):
+    """Run a function once over the unique sentences and return the result of every added sentence.
+
+    Parameters
+    ----------
+    function : callable
+        A function that takes a list of sentences and returns a list of results, one per sentence and in the same order.
+
+    Returns
+    -------
+    list
+        Return the results of all the added sentences, in the order they were added. Sentences that were run by an earlier call of run are not run again. Every added sentence gets its own copy of the result, so the results of duplicate sentences can be changed independently.
+    """
+
+    sentences = self.unique()
+    if len(sentences) > 0:
+      for sentence, result in zip(sentences, function(sentences)):
+        self._results[result_cache.normalize_sentence(sentence)] = result
+    return [copy.deepcopy(self._results[key]) for key in self._keys]
+
+  def result(self, sentence):
+    """Return a copy of the result of an added sentence, once run has been called."""
+
+    return copy.deepcopy(self._results[result_cache.normalize_sentence(sentence)])
+
+  def stats(self):
+    """Return the numbers of added and unique sentences, the dedup ratio (added sentences per unique sentence) and the share of the sentences that were not run."""
+
+    sentences = len(self._keys)
+    unique = len(self._unique)
+    return {'sentences': sentences,
+            'unique': unique,
+            'dedup_ratio': round(sentences / unique, 3) if unique > 0 else 1.0,
+            'saved': round(1 - unique / sentences, 3) if sentences > 0 else 0.0}
+
+  def clear(self):
+    """Drop the sentences and their results to start a new batch."""
+
+    self._keys = []
+    self._unique = OrderedDict()
+    self._results = {}
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""The SPL labels of dailymed_spl, against the DailyMed pages of biomarker_extraction."""
+
+import io
+import re
+import zipfile
+import pytest
+from biomarker_nlp import biomarker_extraction
+from biomarker_nlp import dailymed_spl
+
+SETID = '939b5d1f-9fb2-4499-80ef-0607aa6b114e'
+URL = 'https://dailymed.nlm.nih.gov/dailymed/drugInfo.cfm?setid=' + SETID
+
+CERVICAL = 'Avastin, in combination with paclitaxel and cisplatin or paclitaxel and topotecan, is indicated for the treatment of patients with persistent, recurrent, or metastatic cervical cancer.'
+NSCLC = 'Avastin, in combination with carboplatin and paclitaxel, is indicated for the first-line treatment of patients with unresectable, locally advanced, recurrent or metastatic non–squamous non–small cell lung cancer (NSCLC).'
+GBM = 'Avastin is indicated for the treatment of recurrent glioblastoma (GBM) in adults.'
+LIMITATION = 'Limitations of Use: Avastin is not indicated for adjuvant treatment of colon cancer.'
+
+
+def spl(version = 1, setid = SETID):
+  """Return the SPL XML of a short Avastin label."""
+
+  return '''<?xml version="1.0" encoding="UTF-8"?>
+<document xmlns="urn:hl7-org:v3">
+  <setId root="%s"/>
+  <versionNumber value="%d"/>
+  <component>
+    <structuredBody>
+      <component>
+        <section>
+          <code code="48780-1" codeSystem="2.16.840.1.113883.6.1"/>
+          <subject>
+            <manufacturedProduct>
+              <manufacturedProduct>
+                <name>Avastin</name>
+                <formCode code="C42945" displayName="INJECTION, SOLUTION"/>
+                <asEntityWithGeneric><genericMedicine><name>bevacizumab</name></genericMedicine></asEntityWithGeneric>
+                <asContent><containerPackagedProduct><code code="50242-060-01" codeSystem="2.16.840.1.113883.6.69"/></containerPackagedProduct></asContent>
+                <asContent><containerPackagedProduct><code code="50242-061-01" codeSystem="2.16.840.1.113883.6.69"/></containerPackagedProduct></asContent>
+              </manufacturedProduct>
+            </manufacturedProduct>
+          </subject>
+        </section>
+      </component>
+      <component>
+        <section>
+          <code code="34067-9" codeSystem="2.16.840.1.113883.6.1"/>
+          <title>1 INDICATIONS AND USAGE</title>
+          <component>
+            <section>
+              <code code="42229-5" codeSystem="2.16.840.1.113883.6.1"/>
+              <title>1.2 Non-Squamous Non-Small Cell Lung Cancer (NSCLC)</title>
+              <text><paragraph>%s</paragraph></text>
+            </section>
+          </component>
+          <component>
+            <section>
+              <code code="42229-5" codeSystem="2.16.840.1.113883.6.1"/>
+              <title>1.3 Recurrent Glioblastoma</title>
+              <text>
+                <paragraph>%s</paragraph>
+                <list><item>%s</item></list>
+              </text>
+            </section>
+          </component>
+          <component>
+            <section>
+              <code code="42229-5" codeSystem="2.16.840.1.113883.6.1"/>
+              <title>1.5 Persistent, Recurrent, or Metastatic
+                Cervical Cancer</title>
+              <text><paragraph>%s</paragraph></text>
+            </section>
+          </component>
+        </section>
+      </component>
+    </structuredBody>
+  </component>
+</document>''' % (setid, version, NSCLC, GBM, LIMITATION, CERVICAL)
+
+
+# the same label as DailyMed renders it: the heading of each section in a link, its text in a div, one block per line
+HTML = '''<html><body>
+<span id="drug-label">AVASTIN- bevacizumab injection, solution</span>
+<span id="item-code-s">50242-060-01, 50242-061-01</span>
+<ul>
+<li><a href="#">1 INDICATIONS AND USAGE</a><div>
+<div class="Section">
+<h2>1.2 Non-Squamous Non-Small Cell Lung Cancer (NSCLC)</h2>
+<p>%s</p>
+</div>
+<div class="Section">
+<h2>1.3 Recurrent Glioblastoma</h2>
+<p>%s</p>
+<ul><li>%s</li></ul>
+</div>
+<div class="Section">
+<h2>1.5 Persistent, Recurrent, or Metastatic Cervical Cancer</h2>
+<p>%s</p>
+</div>
+</div></li>
+</ul>
+</body></html>''' % (NSCLC, GBM, LIMITATION, CERVICAL)
+
+DISEASES = ['Non-small cell lung cancer', 'Small cell lung cancer', 'Glioblastoma', 'Cervical cancer', 'Melanoma']
+
+
+@pytest.fixture
+def labels():
+  return biomarker_extraction.LabelPage(URL, html = HTML), dailymed_spl.SPLLabel(spl())
+
+
+def test_label_header():
+  label = dailymed_spl.SPLLabel(spl(version = 7).encode('utf-8'))
+  assert label.setid == SETID
+  assert label.version == 7
+  assert [section['code'] for section in label.sections] == ['48780-1', '34067-9']
+
+
+@pytest.mark.parametrize('header', [False, True])
+def test_disease_contents_match_page(labels, header):
+  page, label = labels
+  expected = biomarker_extraction.disease_contents(page, DISEASES, header = header)
+  assert biomarker_extraction.disease_contents(label, DISEASES, header = header) == expected
+  for disease in DISEASES:
+    assert biomarker_extraction.disease_content(label, disease, header = header) == expected[disease]
+  assert expected['Small cell lung cancer'] is None
+  if header:
+    assert expected['Cervical cancer'] == '1.5 Persistent, Recurrent, or Metastatic Cervical Cancer\n' + CERVICAL
+  else:
+    assert expected['Cervical cancer'] == '\n' + CERVICAL
+    assert expected['Glioblastoma'] == '\n' + GBM + '\n' + LIMITATION
+
+
+def test_section_content_matches_page(labels):
+  page, label = labels
+  # the page also has the line breaks of the markup between its subsections
+  expected = re.sub(r'\n+', '\n', biomarker_extraction.section_content(page, section = 'INDICATIONS AND USAGE'))
+  assert biomarker_extraction.section_content(label, section = 'INDICATIONS AND USAGE') == expected
+  assert label.section_content('34067-9') == expected
+  assert expected.startswith('1.2 Non-Squamous Non-Small Cell Lung Cancer (NSCLC)\n' + NSCLC + '\n1.3 Recurrent Glioblastoma\n')
+  assert biomarker_extraction.section_content(label, section = 'BOXED WARNING') is None
+
+
+def test_brand_label_and_ndc_code_match_page(labels):
+  page, label = labels
+  assert biomarker_extraction.drug_brand_label(dailyMedURL = label) == biomarker_extraction.drug_brand_label(dailyMedURL = page)
+  assert biomarker_extraction.ndc_code(dailyMedURL = label) == biomarker_extraction.ndc_code(dailyMedURL = page)
+
+
+def zipped(members):
+  """Return the bytes of a ZIP file of the (name, bytes) members."""
+
+  buffer = io.BytesIO()
+  with zipfile.ZipFile(buffer, 'w') as archive:
+    for name, data in members:
+      archive.writestr(name, data)
+  return buffer.getvalue()
+
+
+def test_read_header():
+  assert dailymed_spl._read_header(io.BytesIO(spl(version = 12).encode('utf-8'))) == (SETID, 12)
+  assert dailymed_spl._read_header(io.BytesIO(b'<document xmlns="urn:hl7-org:v3"/>')) == (None, None)
+
+
+def test_archive_of_nested_zips(tmp_path):
+  other = 'a2b7e5f0-0000-4000-8000-000000000001'
+  # a release archive of single-label ZIP files, as DailyMed publishes them, and an update with a later version of one label
+  release = tmp_path / 'dm_spl_release_human_rx_part1.zip'
+  release.write_bytes(zipped([('prescription/20210601_' + SETID + '.zip', zipped([(SETID + '.xml', spl(version = 3)), ('avastin-01.jpg', b'\xff\xd8')])),
+                              ('prescription/20210601_' + other + '.zip', zipped([(other + '.xml', spl(version = 1, setid = other))]))]))
+  update = tmp_path / 'dm_spl_daily_update.zip'
+  update.write_bytes(zipped([('prescription/20210627_' + SETID + '.zip', zipped([(SETID + '.xml', spl(version = 4))]))]))
+
+  archive = dailymed_spl.SPLArchive([str(release), str(update)])
+  assert len(archive) == 2
+  assert sorted(archive.setids()) == sorted([SETID, other])
+  # the highest version wins, whichever archive it is in
+  assert archive.index[SETID] == (4, str(update), 'prescription/20210627_' + SETID + '.zip', SETID + '.xml')
+  assert archive.label(SETID).version == 4
+  assert {label.setid: label.version for label in archive.labels()} == {SETID: 4, other: 1}
+  # an earlier version given last does not replace it
+  assert dailymed_spl.SPLArchive([str(update), str(release)]).label(SETID).version == 4
+
+
+def test_archive_of_xml_documents(tmp_path):
+  path = tmp_path / 'labels.zip'
+  path.write_bytes(zipped([('a/' + SETID + '_v2.xml', spl(version = 2)), ('b/' + SETID + '_v5.xml', spl(version = 5)), ('README.txt', b'not a label')]))
+  archive = dailymed_spl.SPLArchive(str(path))
+  assert archive.index == {SETID: (5, str(path), 'b/' + SETID + '_v5.xml', None)}
+  label = archive.label(SETID)
+  assert biomarker_extraction.disease_content(label, disease = 'Cervical Cancer') == '\n' + CERVICAL
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Parity of gene_protein_chemical_batch, whose NER-only path tokenizes each text once and runs the entity recognizers on copies of the tokens, with gene_protein_chemical on label sentences.
+
+Skipped when spacy, scispacy or the three scispacy models are not installed.
+"""
+
+import pytest
+
+pytest.importorskip('spacy')
+pytest.importorskip('scispacy')
+for name in ['en_ner_craft_md', 'en_ner_jnlpba_md', 'en_ner_bionlp13cg_md']:
+  pytest.importorskip(name)
+
+from biomarker_nlp import biomarker_extraction
+from biomarker_nlp import model_registry
+
+SENTENCES = ["Patients with EGFR or ALK genomic tumor aberrations should have disease progression on FDA-approved therapy for NSCLC harboring these aberrations prior to receiving TECENTRIQ.",
+             "TECENTRIQ, in combination with cobimetinib and vemurafenib, is indicated for the treatment of patients with BRAF V600 mutation-positive unresectable or metastatic melanoma.",
+             "KEYTRUDA is indicated for the treatment of patients with metastatic NSCLC whose tumors express PD-L1 (TPS ≥1%) as determined by an FDA-approved test, with no EGFR or ALK genomic tumor aberrations.",
+             "SUTENT is indicated for the treatment of gastrointestinal stromal tumor (GIST) after disease progression on or intolerance to imatinib mesylate.",
+             "Avastin, in combination with carboplatin and paclitaxel, is indicated for the first-line treatment of patients with unresectable, locally advanced, recurrent or metastatic non–squamous non–small cell lung cancer (NSCLC).",
+             "This indication is approved under accelerated approval based on tumor response rate and durability of response."]
+
+
+@pytest.fixture
+def registry():
+  nerOnly = model_registry.registry.ner_only
+  yield model_registry.registry
+  model_registry.registry.ner_only = nerOnly
+
+
+def test_batch_matches_single(registry):
+  registry.ner_only = False
+  expected = [biomarker_extraction.gene_protein_chemical(text = st, gene= 1, protein = 1, chemical = 1) for st in SENTENCES]
+
+  assert list(biomarker_extraction.gene_protein_chemical_batch(SENTENCES, batch_size = 4)) == expected
+  registry.ner_only = True
+  assert [biomarker_extraction.gene_protein_chemical(text = st, gene= 1, protein = 1, chemical = 1) for st in SENTENCES] == expected
+  # the shared tokenization and the copies of the tokens
+  assert list(biomarker_extraction.gene_protein_chemical_batch(SENTENCES, batch_size = 4)) == expected
+
+
+def test_entity_spans_match_single(registry):
+  registry.ner_only = False
+  for st in SENTENCES:
+    expected = biomarker_extraction.gene_protein_chemical(text = st, gene= 1, protein = 1, chemical = 1)
+    spans = biomarker_extraction.entity_spans(st)
+    assert all(st[span['start']:span['end']] == span['text'] for span in spans)
+    for key, model, label in biomarker_extraction.ENTITY_MODELS:
+      assert sorted(span['text'] for span in spans if span['label'] == label) == sorted(expected[key])
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""The Gazetteer pre-filter of gazetteer, and its audit mode in biomarker_extraction."""
+
+import pytest
+from biomarker_nlp import gazetteer
+
+MISSED = 'This indication is approved under accelerated approval prior to receiving TECENTRIQ.'
+
+
+def test_genes_and_gene_shapes():
+  prefilter = gazetteer.Gazetteer()
+  assert prefilter.candidates('Patients with EGFR or ALK genomic tumor aberrations.') == [('gene', 'EGFR'), ('gene', 'ALK')]
+  # the shape of a symbol: upper case with a digit
+  assert prefilter.candidates('BRAF V600E mutation-positive tumors that express PD-L1 or CD20.') == [('gene', 'BRAF'), ('gene', 'V600E'), ('gene', 'PD-L1'), ('gene', 'CD20')]
+  # symbols are case-sensitive, and years and plain capitals are not symbols
+  assert prefilter.candidates('Met in 2021 by the FDA.') == []
+  assert gazetteer.Gazetteer(shapes = False).candidates('BRAF V600E') == [('gene', 'BRAF')]
+
+
+def test_drug_suffixes():
+  prefilter = gazetteer.Gazetteer()
+  assert prefilter.candidates('Bevacizumab with carboplatin, then osimertinib.') == [('drug', 'Bevacizumab'), ('drug', 'carboplatin'), ('drug', 'osimertinib')]
+  # the word must be longer than the stem
+  assert prefilter.candidates('The stat results.') == []
+  assert gazetteer.Gazetteer(suffixes = []).candidates('Bevacizumab') == []
+
+
+def test_multi_word_names():
+  prefilter = gazetteer.Gazetteer(proteins = ['epidermal growth factor receptor', 'factor', 'PD-L1 protein'], drugs = ['platinum', 'platinum-based chemotherapy'])
+  # the longest name at a position wins, whatever its case
+  assert prefilter.candidates('Epidermal Growth Factor Receptor and factor VIII.') == [('protein', 'Epidermal Growth Factor Receptor'), ('protein', 'factor')]
+  assert prefilter.candidates('After platinum-based chemotherapy or platinum.') == [('drug', 'platinum-based chemotherapy'), ('drug', 'platinum')]
+  # a gene symbol is taken before the names that start with it
+  assert prefilter.candidates('PD-L1 protein') == [('gene', 'PD-L1')]
+  assert prefilter.candidates('growth factor') == [('protein', 'factor')]
+  assert not prefilter.has_candidates('Epidermal growth')
+
+
+def test_load_lists(tmp_path):
+  hgnc = tmp_path / 'hgnc_complete_set.txt'
+  hgnc.write_text('hgnc_id\tsymbol\tname\talias_symbol\tprev_symbol\n'
+                  'HGNC:3236\tEGFR\tepidermal growth factor receptor\tERBB|ERBB1|HER1\t\n'
+                  'HGNC:3430\tERBB2\terb-b2 receptor tyrosine kinase 2\t"NEU|HER-2|CD340|HER2|MLN 19"\tNGL\n'
+                  'HGNC:1\tX\t\t\t\n', encoding = 'utf-8')
+  symbols, names = gazetteer.load_hgnc(str(hgnc))
+  assert symbols == ['EGFR', 'ERBB', 'ERBB1', 'HER1', 'ERBB2', 'NEU', 'HER-2', 'CD340', 'HER2', 'MLN 19', 'NGL']
+  assert names == ['epidermal growth factor receptor', 'erb-b2 receptor tyrosine kinase 2']
+  drugs = tmp_path / 'drugs.txt'
+  drugs.write_text('# drugs\nTECENTRIQ\n\nKEYTRUDA\n', encoding = 'utf-8')
+  assert gazetteer.load_names(str(drugs)) == ['TECENTRIQ', 'KEYTRUDA']
+  prefilter = gazetteer.Gazetteer(genes = symbols, drugs = gazetteer.load_names(str(drugs)), suffixes = [], shapes = False)
+  assert prefilter.candidates('NEU-positive tumors after Tecentriq.') == [('drug', 'Tecentriq')]
+  assert prefilter.candidates('NEU positive tumors.') == [('gene', 'NEU')]
+
+
+@pytest.fixture
+def extraction(monkeypatch):
+  # gene_protein_chemical and gene_protein_chemical_batch, with the models replaced by a lookup of the entities
+  biomarker_extraction = pytest.importorskip('biomarker_nlp.biomarker_extraction')
+  from biomarker_nlp import result_cache
+  entities = {MISSED: {'gene': [], 'protein': ['TECENTRIQ'], 'chemical': []},
+              'Patients with EGFR mutations.': {'gene': ['EGFR'], 'protein': ['EGFR'], 'chemical': []}}
+  runs = []
+  def run(text, gene = 1, protein = 1, chemical = 1):
+    runs.append(text)
+    return dict(entities.get(text, {'gene': [], 'protein': [], 'chemical': []}))
+  def run_batch(texts, gene = 1, protein = 1, chemical = 1, batch_size = 256, n_process = 1):
+    for text in texts:
+      yield run(text)
+  monkeypatch.setattr(biomarker_extraction, '_gene_protein_chemical', run)
+  monkeypatch.setattr(biomarker_extraction, '_gene_protein_chemical_batch', run_batch)
+  monkeypatch.setattr(result_cache, 'default_cache', None)
+  return biomarker_extraction, runs
+
+
+def test_prefilter_skips_sentences(extraction):
+  biomarker_extraction, runs = extraction
+  prefilter = gazetteer.Gazetteer()
+  assert biomarker_extraction.gene_protein_chemical(MISSED, prefilter = prefilter) == {'gene': [], 'protein': [], 'chemical': []}
+  assert runs == []
+  assert biomarker_extraction.gene_protein_chemical('Patients with EGFR mutations.', gene = 1, protein = 0, chemical = 0, prefilter = prefilter) == {'gene': ['EGFR'], 'protein': ['EGFR'], 'chemical': []}
+  assert prefilter.report() == {'sentences': 2, 'dropped': 1, 'drop_rate': 0.5, 'with_entities': 1, 'missed_sentences': 0, 'recall': 1.0, 'missed_entities': {}}
+
+
+def test_audit_reports_missed_entities(extraction):
+  biomarker_extraction, runs = extraction
+  # TECENTRIQ is a brand name: no symbol shape, no drug stem, not in the lists
+  prefilter = gazetteer.Gazetteer(audit = True)
+  assert not prefilter.has_candidates(MISSED)
+  sentences = [MISSED, 'Patients with EGFR mutations.', 'Limitations of Use: not for adjuvant treatment.', MISSED]
+  results = list(biomarker_extraction.gene_protein_chemical_batch(sentences, batch_size = 3, prefilter = prefilter))
+  assert results[0] == results[3] == {'gene': [], 'protein': ['TECENTRIQ'], 'chemical': []}
+  assert runs == sentences
+  assert prefilter.report() == {'sentences': 4, 'dropped': 3, 'drop_rate': 0.75, 'with_entities': 3, 'missed_sentences': 2, 'recall': 0.333, 'missed_entities': {'TECENTRIQ': 2}}
+  assert prefilter.missed[0] == (MISSED, {'gene': [], 'protein': ['TECENTRIQ'], 'chemical': []})
+
+  # the missed name added to the lists
+  prefilter = gazetteer.Gazetteer(drugs = gazetteer.DRUG_WORDS + ['TECENTRIQ'], audit = True)
+  list(biomarker_extraction.gene_protein_chemical_batch(sentences, prefilter = prefilter))
+  assert prefilter.report()['recall'] == 1.0
+  prefilter.clear_report()
+  assert prefilter.report()['sentences'] == 0
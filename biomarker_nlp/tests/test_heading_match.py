@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""The DiseaseMatcher of heading_match, against heading_matches."""
+
+import pytest
+from biomarker_nlp import heading_match
+
+HEADINGS = ['1.1 Metastatic Colorectal Cancer (mCRC)',
+            '1.2 First-Line Non-Squamous Non–Small Cell Lung Cancer (NSCLC)',
+            '1.3 Small Cell Lung Cancer',
+            '1.4\tRecurrent Glioblastoma',
+            '1.5 Persistent, Recurrent, or Metastatic Cervical Cancer',
+            '1.6 Epithelial Ovarian, Fallopian Tube, or Primary Peritoneal Cancer',
+            '1.7 Non-Hodgkin Lymphoma',
+            '1.8 Hodgkin Lymphoma',
+            '1.9 Non Small Cell Lung Cancer and Lung Cancer Screening',
+            '2 DOSAGE AND ADMINISTRATION']
+
+DISEASES = ['Colorectal cancer', 'Non-small cell lung cancer', 'Small cell lung cancer', 'Lung cancer', 'Glioblastoma', 'Cervical cancer',
+            'Ovarian cancer', 'Peritoneal cancer', 'Non-Hodgkin lymphoma', 'Hodgkin lymphoma', 'Lymphoma', 'Melanoma']
+
+
+def test_normalize_heading():
+  assert heading_match.normalize_heading('1.2\tNon–Small  Cell\nLung Cancer ') == 'non-small cell lung cancer'
+  assert heading_match.normalize_heading('14. CLINICAL STUDIES') == 'clinical studies'
+  assert heading_match.normalize_heading('Stage 1.2 disease') == 'stage 1.2 disease'
+
+
+@pytest.mark.parametrize('disease', DISEASES)
+def test_single_disease_matches_heading_matches(disease):
+  # with one disease there is nothing to overlap, so the matcher finds the headings that heading_matches finds for one of its variants
+  variants = heading_match.disease_variants(disease)
+  matched = heading_match.DiseaseMatcher([disease]).match_headings(HEADINGS)
+  assert matched == {disease: [i for i, heading in enumerate(HEADINGS) if any(heading_match.heading_matches(v, heading) for v in variants)]}
+
+
+def test_overlapping_names():
+  matcher = heading_match.DiseaseMatcher(['Lung cancer', 'Non-small cell lung cancer', 'Small cell lung cancer'])
+  # the longest name wins a heading; 'lung cancer' only has the heading where it is not part of a longer name
+  assert matcher.search('1.2 Non-Small Cell Lung Cancer') == ['Non-small cell lung cancer']
+  assert matcher.search('1.3 Small Cell Lung Cancer') == ['Small cell lung cancer']
+  assert matcher.search('1.4 Lung Cancer') == ['Lung cancer']
+  assert matcher.match_headings(HEADINGS) == {'Lung cancer': [8], 'Non-small cell lung cancer': [1, 8], 'Small cell lung cancer': [2]}
+  # heading_matches looks at one disease at a time, and gives the heading of the longer name to the shorter one as well
+  assert heading_match.heading_matches('Lung cancer', '1.2 Non-Small Cell Lung Cancer')
+
+
+@pytest.mark.parametrize('heading', ['1.2 Non-Small Cell Lung Cancer', '1.2 Non Small Cell Lung Cancer', '1.2 Nonsmall Cell Lung Cancer', '1.2 Non–Small Cell Lung Cancer'])
+def test_non_exclusion(heading):
+  assert heading_match.DiseaseMatcher(['Small cell lung cancer']).search(heading) == []
+  assert not heading_match.heading_matches('Small cell lung cancer', heading)
+  # a disease that starts with 'non' is matched
+  assert heading_match.DiseaseMatcher(['Non-small cell lung cancer']).search(heading.replace('Nonsmall', 'Non-Small')) == ['Non-small cell lung cancer']
+
+
+def test_non_exclusion_only_before_the_match():
+  matcher = heading_match.DiseaseMatcher(['Small cell lung cancer', 'Hodgkin lymphoma'])
+  assert matcher.search('1.2 Non-Small Cell Lung Cancer after Small Cell Lung Cancer') == ['Small cell lung cancer']
+  assert matcher.search('1.7 Non-Hodgkin Lymphoma') == []
+  assert matcher.search('1.8 Classical Hodgkin Lymphoma (cHL)') == ['Hodgkin lymphoma']
+
+
+def test_variants():
+  assert heading_match.disease_variants('Gastrointestinal Stromal Tumors (GIST)') == ['gastrointestinal stromal tumors (gist)', 'gastrointestinal stromal tumors', 'gastrointestinal stromal tumor']
+  assert heading_match.disease_variants('Non-small cell lung cancer') == ['non-small cell lung cancer', 'non small cell lung cancer']
+  matcher = heading_match.DiseaseMatcher(['Gastrointestinal Stromal Tumors (GIST)', 'Non-small cell lung cancer (NSCLC)'])
+  assert matcher.match_headings(['1.1 Gastrointestinal Stromal Tumor', '1.2 Non Small Cell Lung Cancer', '1.3 Melanoma']) == \
+    {'Gastrointestinal Stromal Tumors (GIST)': [0], 'Non-small cell lung cancer (NSCLC)': [1]}
+
+
+def test_duplicate_and_empty_diseases():
+  matcher = heading_match.DiseaseMatcher(['Melanoma', 'melanoma', 'Melanoma', ''])
+  assert matcher.diseases == ['Melanoma', 'melanoma', '']
+  assert matcher.match_headings(['1.1 Unresectable or Metastatic Melanoma']) == {'Melanoma': [0], 'melanoma': [0], '': []}
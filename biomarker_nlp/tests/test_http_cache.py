@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""The HTTPCache of http_cache, with a stub session in place of the network."""
+
+import pytest
+from biomarker_nlp import http_cache
+from biomarker_nlp import http_session
+
+URL = 'https://dailymed.nlm.nih.gov/dailymed/drugInfo.cfm?setid=939b5d1f-9fb2-4499-80ef-0607aa6b114e'
+ETAG = '"5f2b-1a"'
+LAST_MODIFIED = 'Sun, 27 Jun 2021 10:00:00 GMT'
+
+
+class Response:
+
+  def __init__(self, statusCode, content = b'', headers = None):
+    self.status_code = statusCode
+    self.content = content
+    self.headers = headers or {}
+
+
+class Session:
+  """Answer the requests with the given responses, in order, and record their headers."""
+
+  def __init__(self, *responses):
+    self.responses = list(responses)
+    self.requests = []
+
+  def get_adapter(self, url):
+    return None
+
+  def get(self, url, headers = None, timeout = None):
+    self.requests.append((url, dict(headers or {})))
+    return self.responses.pop(0)
+
+
+@pytest.fixture
+def session(monkeypatch):
+  def use(*responses):
+    session = Session(*responses)
+    monkeypatch.setattr(http_session, 'default_session', session)
+    monkeypatch.setattr(http_session, 'rate_limiter', http_session.RateLimiter(rate = None))
+    return session
+  return use
+
+
+def page(text = 'AVASTIN'):
+  return Response(200, ('<html><body>' + text + '</body></html>').encode('utf-8'), {'ETag': ETAG, 'Last-Modified': LAST_MODIFIED, 'Content-Type': 'text/html'})
+
+
+def test_fresh_page_is_served_from_disk(session, tmp_path):
+  stub = session(page())
+  cache = http_cache.HTTPCache(cacheDir = str(tmp_path))
+  assert cache.fetch(URL) == '<html><body>AVASTIN</body></html>'
+  assert stub.requests == [(URL, {})]
+  # another instance on the same directory, e.g. the next run
+  assert http_cache.HTTPCache(cacheDir = str(tmp_path)).fetch(URL) == '<html><body>AVASTIN</body></html>'
+  assert len(stub.requests) == 1
+
+
+def test_revalidation_headers_and_304(session, tmp_path):
+  stub = session(page(), Response(304))
+  cache = http_cache.HTTPCache(cacheDir = str(tmp_path), ttl = 0)
+  cache.fetch(URL)
+  meta, body = cache._read(URL)
+  # the 304 has no body; the cached one is served and the page is fresh again
+  assert cache.fetch(URL) == '<html><body>AVASTIN</body></html>'
+  assert stub.requests[1] == (URL, {'If-None-Match': ETAG, 'If-Modified-Since': LAST_MODIFIED})
+  revalidated, body = cache._read(URL)
+  assert body == b'<html><body>AVASTIN</body></html>'
+  assert revalidated['fetched'] >= meta['fetched']
+  assert revalidated['etag'] == ETAG
+
+
+def test_changed_page_replaces_the_cached_one(session, tmp_path):
+  stub = session(page(), Response(200, b'<html><body>AVASTIN 2</body></html>', {'ETag': '"5f2b-1b"'}))
+  cache = http_cache.HTTPCache(cacheDir = str(tmp_path), ttl = 0)
+  cache.fetch(URL)
+  assert cache.fetch(URL) == '<html><body>AVASTIN 2</body></html>'
+  assert cache.revalidation_headers(URL) == {'If-None-Match': '"5f2b-1b"'}
+
+
+def test_errors_are_not_cached(session, tmp_path):
+  stub = session(Response(503, b'Service Unavailable'), page())
+  cache = http_cache.HTTPCache(cacheDir = str(tmp_path))
+  assert cache.fetch(URL) == 'Service Unavailable'
+  assert cache.fetch(URL) == '<html><body>AVASTIN</body></html>'
+  # the second request was not conditional, since nothing was cached
+  assert stub.requests[1] == (URL, {})
+
+
+def test_offline(session, tmp_path):
+  stub = session(page())
+  http_cache.HTTPCache(cacheDir = str(tmp_path)).fetch(URL)
+  cache = http_cache.HTTPCache(cacheDir = str(tmp_path), ttl = 0, offline = True)
+  # a stale page is served without a request
+  assert cache.fetch(URL) == '<html><body>AVASTIN</body></html>'
+  with pytest.raises(LookupError):
+    cache.fetch(URL + '&audience=consumer')
+  assert len(stub.requests) == 1
+
+
+def test_encoding(session, tmp_path):
+  content = '<html><body>Mélanome</body></html>'.encode('latin-1')
+  session(Response(200, content, {'Content-Type': 'text/html; charset=ISO-8859-1'}))
+  cache = http_cache.HTTPCache(cacheDir = str(tmp_path))
+  assert cache.fetch(URL) == '<html><body>Mélanome</body></html>'
+  assert http_cache.HTTPCache(cacheDir = str(tmp_path)).fetch(URL) == '<html><body>Mélanome</body></html>'
+  assert http_cache.page_encoding({}, b'<meta charset="windows-1252"><html>') == 'windows-1252'
+  assert http_cache.page_encoding({'Content-Type': 'text/html'}, b'<html>') == 'utf-8'
+
+
+def test_module_fetch_uses_the_default_cache(session, tmp_path, monkeypatch):
+  stub = session(page(), page('AVASTIN 2'))
+  monkeypatch.setattr(http_cache, 'default_cache', http_cache.HTTPCache(cacheDir = str(tmp_path)))
+  assert http_cache.fetch(URL) == http_cache.fetch(URL) == '<html><body>AVASTIN</body></html>'
+  monkeypatch.setattr(http_cache, 'default_cache', None)
+  assert http_cache.fetch(URL) == '<html><body>AVASTIN 2</body></html>'
+  assert len(stub.requests) == 2
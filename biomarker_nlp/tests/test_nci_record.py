@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""The records of nci_drug_record and nci_record, on an NCI drug page fixture."""
+
+import lxml.html
+from biomarker_nlp import biomarker_extraction
+from biomarker_nlp import http_cache
+
+URL = 'https://www.cancer.gov/about-cancer/treatment/drugs/atezolizumab'
+DAILYMED = 'https://dailymed.nlm.nih.gov/dailymed/drugInfo.cfm?setid=6fa682c9-a312-4932-9831-f286908660ee&audience=consumer'
+
+# the layout of an NCI drug page: the diseases of 'Use in Cancer' are in bold text, but for a few
+HTML = '''<html><body><article>
+<div><h1>Atezolizumab</h1></div>
+<div>
+<h2>Use in Cancer</h2>
+<p>Atezolizumab is approved to treat:</p>
+<ul>
+<li><strong>Hepatocellular carcinoma</strong> that cannot be removed by surgery or has metastasized.</li>
+<li><strong>Melanoma.</strong> It is used with cobimetinib and vemurafenib in patients whose cancer has the BRAF V600 mutation.</li>
+<li><strong>Non-small cell lung cancer</strong>. It is used in adults.</li>
+<li>Urothelial carcinoma that is locally advanced or has metastasized.</li>
+<li>Melanoma whose cancer cannot be removed by surgery.</li>
+</ul>
+<p><a href="%s">FDA label information for this drug is available at DailyMed.</a></p>
+</div>
+</article></body></html>''' % DAILYMED
+
+BOLD = ['Hepatocellular carcinoma', 'Melanoma', 'Non-small cell lung cancer']
+
+
+def test_record_has_bold_diseases_by_default(monkeypatch):
+  monkeypatch.setattr(http_cache, 'fetch', lambda url: HTML)
+  record = biomarker_extraction.nci_drug_record(url = URL)
+  assert record == {'url': URL, 'name': 'Atezolizumab', 'diseases': BOLD, 'dailyMed': [DAILYMED]}
+  # the same diseases as therapy_disease
+  assert record['diseases'] == biomarker_extraction.therapy_disease(url = URL)
+
+
+def test_record_with_non_bold_diseases():
+  record = biomarker_extraction.nci_record(URL, lxml.html.fromstring(HTML), nonBold = True)
+  # the leading words of the other items are added once, after the bold ones
+  assert record['diseases'] == BOLD + ['Urothelial carcinoma']
+  assert biomarker_extraction.nci_record(URL, lxml.html.fromstring(HTML))['diseases'] == BOLD
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Parity of the ONNX Runtime backend of negation_negbert with the torch models, on small randomly initialized BERT and XLNet models.
+
+Skipped when torch, onnxruntime or the other dependencies of negation_negbert are not installed.
+"""
+
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('onnxruntime')
+negation_negbert = pytest.importorskip('biomarker_nlp.negation_negbert')
+transformers = pytest.importorskip('transformers')
+
+VOCAB_SIZE = 1000
+
+
+class Model:
+  """The attributes of a CueModel or ScopeModel that the ONNX backend uses."""
+
+  def __init__(self, module):
+    self.model = module.eval()
+    self.device = torch.device('cpu')
+    self.model_name = type(module).__name__
+    self.task = 'negation'
+
+
+def bert():
+  config = transformers.BertConfig(vocab_size = VOCAB_SIZE, hidden_size = 32, num_hidden_layers = 2, num_attention_heads = 2,
+                                   intermediate_size = 64, num_labels = 5)
+  return Model(transformers.BertForTokenClassification(config))
+
+
+def xlnet():
+  config = negation_negbert.XLNetConfig(VOCAB_SIZE, d_model = 32, n_layer = 2, n_head = 2, d_inner = 64, num_labels = 2)
+  return Model(negation_negbert.XLNetForTokenClassification(config))
+
+
+def inputs(batchSize, seqLen):
+  torch.manual_seed(0)
+  inputIds = torch.randint(5, VOCAB_SIZE, (batchSize, seqLen), dtype = torch.long)
+  attentionMask = torch.ones(batchSize, seqLen, dtype = torch.long)
+  inputIds[0, seqLen // 3:] = 0
+  attentionMask[0, seqLen // 3:] = 0
+  return inputIds, attentionMask
+
+
+@pytest.mark.parametrize('make', [bert, xlnet], ids = ['bert', 'xlnet'])
+def test_export_matches_torch(make, tmp_path):
+  torch.manual_seed(0)
+  model = make()
+  path = str(tmp_path / 'model.onnx')
+  assert negation_negbert.export_onnx(model, path) == path
+  assert model.onnx_path == path
+  assert negation_negbert.check_onnx(model) < 1e-4
+
+  # other batch sizes and sequence lengths than those of the export and of check_onnx
+  onnxModel = negation_negbert.onnx_model(model)
+  for batchSize, seqLen in [(1, 7), (5, 40)]:
+    inputIds, attentionMask = inputs(batchSize, seqLen)
+    with torch.no_grad():
+      expected = model.model(inputIds, token_type_ids = None, attention_mask = attentionMask)[0]
+    actual = onnxModel.model(inputIds, token_type_ids = None, attention_mask = attentionMask)[0]
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol = 1e-4, rtol = 1e-3)
+
+
+def test_use_backend(tmp_path):
+  torch.manual_seed(0)
+  model = bert()
+  with pytest.raises(ValueError):
+    negation_negbert.use_backend(model, 'onnx')
+  negation_negbert.export_onnx(model, str(tmp_path / 'model.onnx'))
+
+  onnxModel = negation_negbert.use_backend(model, 'onnx')
+  assert onnxModel.backend == 'onnx'
+  # the copy is made once per model and graph
+  assert negation_negbert.use_backend(model, 'onnx') is onnxModel
+  assert negation_negbert.use_backend(onnxModel, 'onnx') is onnxModel
+  assert negation_negbert.use_backend(model, 'torch') is model
+  assert negation_negbert.use_backend(model) is model
+  with pytest.raises(ValueError):
+    negation_negbert.use_backend(onnxModel, 'torch')
+  with pytest.raises(ValueError):
+    negation_negbert.use_backend(model, 'tensorrt')
+
+
+def test_onnx_model_is_saved_without_weights(tmp_path):
+  torch.manual_seed(0)
+  model = bert()
+  negation_negbert.export_onnx(model, str(tmp_path / 'model.onnx'))
+  path = str(tmp_path / 'model_onnx')
+  torch.save(negation_negbert.onnx_model(model), path)
+
+  loaded = negation_negbert.load_model(path, device = 'cpu')
+  assert loaded.backend == 'onnx'
+  inputIds, attentionMask = inputs(2, 12)
+  with torch.no_grad():
+    expected = model.model(inputIds, token_type_ids = None, attention_mask = attentionMask)[0]
+  assert torch.allclose(loaded.model(inputIds, attention_mask = attentionMask)[0], expected, atol = 1e-4, rtol = 1e-3)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""The ResultCache of result_cache, and the cache keys of the NER models."""
+
+import pytest
+from biomarker_nlp import result_cache
+from biomarker_nlp import model_registry
+
+TXT = "Patients with EGFR or ALK genomic tumor aberrations should have disease progression on FDA-approved therapy for NSCLC harboring these aberrations prior to receiving TECENTRIQ."
+ENTITIES = {'gene': ['EGFR', 'ALK genomic'], 'protein': ['EGFR', 'TECENTRIQ'], 'chemical': []}
+
+
+def test_lru_eviction():
+  cache = result_cache.ResultCache(maxsize = 2)
+  cache.put('ner:GGP', 'm', 'a', ['A'])
+  cache.put('ner:GGP', 'm', 'b', ['B'])
+  # 'a' is used, so 'b' is the least recently used result when 'c' comes in
+  assert cache.get('ner:GGP', 'm', 'a') == ['A']
+  cache.put('ner:GGP', 'm', 'c', ['C'])
+  assert cache.get('ner:GGP', 'm', 'b') is None
+  assert cache.get('ner:GGP', 'm', 'a') == ['A']
+  assert cache.get('ner:GGP', 'm', 'c') == ['C']
+  assert cache.stats() == {'memory_hits': 3, 'disk_hits': 0, 'misses': 1, 'hit_rate': 0.75}
+
+
+def test_sqlite_persistence(tmp_path):
+  path = str(tmp_path / 'results.sqlite')
+  cache = result_cache.ResultCache(path = path, maxsize = 1)
+  cache.put('negation_scope', 'm', 'a', [[0, 1]])
+  cache.put('negation_scope', 'm', 'b', [])
+  # 'a' was dropped from memory but is still on disk
+  assert cache.get('negation_scope', 'm', 'a') == [[0, 1]]
+  assert cache.stats()['disk_hits'] == 1
+  cache.close()
+
+  cache = result_cache.ResultCache(path = path)
+  assert cache.get('negation_scope', 'm', 'a') == [[0, 1]]
+  assert cache.get('negation_scope', 'm', 'b') == []
+  assert cache.get('negation_scope', 'm', 'a') == [[0, 1]]
+  assert cache.get('negation_scope', 'm', 'c') is None
+  assert cache.stats() == {'memory_hits': 1, 'disk_hits': 2, 'misses': 1, 'hit_rate': 0.75}
+  cache.close()
+
+
+def test_key_normalization():
+  cache = result_cache.ResultCache()
+  cache.put('ner:GGP', 'm', ' EGFR  mutations\nin NSCLC ', ['EGFR'])
+  assert cache.get('ner:GGP', 'm', 'EGFR mutations in NSCLC') == ['EGFR']
+  assert cache.get('ner:GGP', 'm', 'EGFR mutations in nsclc') is None
+  # the kind and the identity are part of the key
+  assert cache.get('ner:PROTEIN', 'm', 'EGFR mutations in NSCLC') is None
+  assert cache.get('ner:GGP', 'other', 'EGFR mutations in NSCLC') is None
+
+
+def test_hits_are_copies():
+  cache = result_cache.ResultCache()
+  value = ['EGFR']
+  cache.put('ner:GGP', 'm', TXT, value)
+  value.append('ALK')
+  hit = cache.get('ner:GGP', 'm', TXT)
+  assert hit == ['EGFR']
+  hit.append('ALK')
+  assert cache.get('ner:GGP', 'm', TXT) == ['EGFR']
+
+
+def test_model_identity_settings(monkeypatch):
+  import importlib.metadata
+  monkeypatch.setattr(importlib.metadata, 'version', lambda name: '0.3.0')
+  registry = model_registry.ModelRegistry()
+  assert registry.identity(model_registry.GENE_MODEL) == 'spacy:en_ner_craft_md-0.3.0'
+  registry.ner_only = True
+  assert registry.identity(model_registry.GENE_MODEL) == 'spacy:en_ner_craft_md-0.3.0:ner_only'
+  registry.vector_rows = 20000
+  assert registry.identity(model_registry.GENE_MODEL) == 'spacy:en_ner_craft_md-0.3.0:ner_only:vectors=20000'
+  registry.ner_only = False
+  assert registry.identity(model_registry.GENE_MODEL) == 'spacy:en_ner_craft_md-0.3.0:vectors=20000'
+
+
+def test_gene_protein_chemical_stats(monkeypatch, tmp_path):
+  # the example of ResultCache, with the models replaced by their result
+  biomarker_extraction = pytest.importorskip('biomarker_nlp.biomarker_extraction')
+  calls = []
+  def run(text, gene = 1, protein = 1, chemical = 1):
+    calls.append(text)
+    return {key: list(value) for key, value in ENTITIES.items()}
+  monkeypatch.setattr(biomarker_extraction, '_gene_protein_chemical', run)
+  monkeypatch.setattr(model_registry.registry, 'identity', lambda name: 'spacy:' + name + '-0.3.0')
+  path = str(tmp_path / 'results.sqlite')
+  cache = result_cache.ResultCache(path = path)
+  monkeypatch.setattr(result_cache, 'default_cache', cache)
+
+  assert biomarker_extraction.gene_protein_chemical(text = TXT) == ENTITIES
+  assert biomarker_extraction.gene_protein_chemical(text = TXT) == ENTITIES
+  assert cache.stats() == {'memory_hits': 3, 'disk_hits': 0, 'misses': 3, 'hit_rate': 0.5}
+  assert len(calls) == 1
+  cache.close()
+
+  cache = result_cache.ResultCache(path = path)
+  monkeypatch.setattr(result_cache, 'default_cache', cache)
+  assert biomarker_extraction.gene_protein_chemical(text = TXT) == ENTITIES
+  assert cache.stats() == {'memory_hits': 0, 'disk_hits': 3, 'misses': 0, 'hit_rate': 1.0}
+  assert len(calls) == 1
+  cache.close()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""The SentenceDedup of sentence_dedup."""
+
+from biomarker_nlp import sentence_dedup
+
+BRAF = 'BRAF V600E mutation-positive melanoma.'
+EGFR = 'EGFR exon 19 deletions.'
+
+
+def annotate(calls):
+  # a function over the unique sentences that records its calls
+  def function(sentences):
+    calls.append(list(sentences))
+    return [{'gene': sentence.split()[:1], 'length': len(sentence)} for sentence in sentences]
+  return function
+
+
+def test_run_once_per_unique_sentence():
+  dedup = sentence_dedup.SentenceDedup()
+  calls = []
+  assert [dedup.add(st) for st in [BRAF, 'BRAF  V600E\nmutation-positive melanoma. ', EGFR, BRAF]] == [0, 1, 2, 3]
+  assert dedup.unique() == [BRAF, EGFR]
+  results = dedup.run(annotate(calls))
+  assert calls == [[BRAF, EGFR]]
+  # the copies get the result of the first spelling
+  assert results == [{'gene': ['BRAF'], 'length': len(BRAF)}] * 2 + [{'gene': ['EGFR'], 'length': len(EGFR)}, {'gene': ['BRAF'], 'length': len(BRAF)}]
+  assert dedup.result(' BRAF V600E mutation-positive melanoma.') == results[0]
+  assert dedup.unique() == []
+  assert dedup.stats() == {'sentences': 4, 'unique': 2, 'dedup_ratio': 2.0, 'saved': 0.5}
+
+
+def test_results_are_copies():
+  dedup = sentence_dedup.SentenceDedup()
+  for st in [BRAF, BRAF]:
+    dedup.add(st)
+  results = dedup.run(annotate([]))
+  results[0]['gene'].append('V600E')
+  assert results[1] == {'gene': ['BRAF'], 'length': len(BRAF)}
+  dedup.result(BRAF)['gene'].append('V600E')
+  assert dedup.result(BRAF) == {'gene': ['BRAF'], 'length': len(BRAF)}
+
+
+def test_later_runs_only_run_new_sentences():
+  dedup = sentence_dedup.SentenceDedup()
+  calls = []
+  dedup.add(BRAF)
+  dedup.run(annotate(calls))
+  dedup.add(EGFR)
+  dedup.add(BRAF)
+  # a generator of results is read as a list
+  results = dedup.run(lambda sentences: (result for result in annotate(calls)(sentences)))
+  assert calls == [[BRAF], [EGFR]]
+  assert [result['gene'] for result in results] == [['BRAF'], ['EGFR'], ['BRAF']]
+  # nothing new: the function is not called
+  dedup.run(annotate(calls))
+  assert len(calls) == 2
+
+
+def test_clear_and_empty_stats():
+  dedup = sentence_dedup.SentenceDedup()
+  assert dedup.stats() == {'sentences': 0, 'unique': 0, 'dedup_ratio': 1.0, 'saved': 0.0}
+  assert dedup.run(annotate([])) == []
+  dedup.add(BRAF)
+  dedup.run(annotate([]))
+  dedup.clear()
+  assert dedup.unique() == []
+  assert dedup.stats()['sentences'] == 0
+  dedup.add(BRAF)
+  assert dedup.unique() == [BRAF]